@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark of DBArrayInserter with a simulated database round-trip latency and per-row cost, comparing synchronous
+inserts with the background writer thread while db_uploader parses the input data, and fixed batch sizes with the
+adaptive one.
+"""
+import argparse
+import time
+from unittest.mock import patch
+
+import common
+from etl import config
+from etl.handlers import db_uploader
+from db_uploader import make_data, _MAPPINGS_DELIMITED
+
+
+class LatencyCursor(object):
+    """Cursor that sleeps on every batch insert, as if waiting for the database."""
+
+    def __init__(self, latency: float, row_cost: float):
+        self.latency = latency
+        self.row_cost = row_cost
+
+    def executemany(self, statement, rows):
+        time.sleep(self.latency + self.row_cost * len(rows))
+
+    def close(self):
+        pass
+
+
+class LatencyConnection(object):
+    """Minimal DBConnection stand-in with a simulated insert latency."""
+
+    NUMBER = float
+    supports_bulk_load = False
+
+    def __init__(self, latency: float, row_cost: float):
+        self.latency = latency
+        self.row_cost = row_cost
+
+    def commit(self):
+        pass
+
+    def cursor(self, array_bind_size: int=None, input_sizes: list=None):
+        return LatencyCursor(self.latency, self.row_cost)
+
+    def get_datetime_expression(self, value, fmt):
+        return value
+
+    def get_param_placeholder(self, param_id):
+        return '?'
+
+
+def run_handler(conf: config.Config, conn: LatencyConnection):
+    """Run the handler against the connection, and return the batch size it has used."""
+    sizes = []
+    with patch('etl.context.db_connection', return_value=common.NullContext(conn)), \
+            patch('etl.handlers.db_uploader.profiler.set_info', lambda name, value: sizes.append(value)):
+        db_uploader.Handler().run(conf)
+    return sizes[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100000, help='number of rows to process')
+    parser.add_argument('--latency', type=float, default=0.002, help='simulated latency per batch, in seconds')
+    parser.add_argument('--row-cost', type=float, default=0.000002, help='simulated time per row, in seconds')
+    args = parser.parse_args()
+
+    data = make_data(args.rows, False)
+    conn = LatencyConnection(args.latency, args.row_cost)
+    for background, batch_size in [(b, s) for s in (100, 1000, 'auto') for b in (False, True)]:
+        conf = config.Config({
+            'format':            'delimited',
+            'delimiter':         ',',
+            'data':              data,
+            'target_database':   'bench',
+            'target_table':      'BENCH',
+            'background_insert': background,
+            'batch_size':        batch_size,
+            'column_mappings':   [config.Config(m) for m in _MAPPINGS_DELIMITED],
+        })
+        elapsed = common.measure(run_handler, conf, conn)
+        used_size = run_handler(conf, conn)
+        common.report(
+            'db_uploader, background_insert={}, batch_size={} ({})'.format(background, batch_size, used_size),
+            args.rows,
+            elapsed)
+
+
+if __name__ == '__main__':
+    main()
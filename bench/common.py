@@ -0,0 +1,60 @@
+"""
+Shared helpers for the benchmark scripts. The scripts are meant to be run from the project root, e.g.:
+
+    python3 bench/db_uploader.py [--rows N]
+
+They don't require any database server or network access.
+"""
+import os
+import sys
+import time
+
+# Make the etl package importable without installing it
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pkg'))
+
+# Keep the handlers' informational messages out of the results
+from etl import logger  # noqa: E402
+logger.minimum_severity = logger.WARNING
+
+
+class NullContext(object):
+    """Context manager returning the given value and doing nothing else, e.g. to stand for context.db_connection(). It
+    can be entered any number of times. An equivalent of contextlib.nullcontext(), which isn't available before Python
+    3.7."""
+
+    def __init__(self, value=None):
+        """Constructor.
+        :param value: Value to return on entering the context.
+        """
+        self.value = value
+
+    def __enter__(self):
+        return self.value
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+def measure(func, *args, repeat: int=3, **kwargs) -> float:
+    """Run the function the given number of times and return the best wall-clock time, in seconds.
+    :param func: Function to run.
+    :param repeat: Number of runs.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def report(title: str, count: int, seconds: float, unit: str='rows'):
+    """Output a single benchmark result line.
+    :param title: Name of the measured case.
+    :param count: Number of processed items.
+    :param seconds: Time spent processing the items.
+    :param unit: Name of the items.
+    """
+    print('{:<64} {:>10} {} in {:8.3f} s = {:>12,.0f} {}/s'.format(title, count, unit, seconds, count / seconds, unit))
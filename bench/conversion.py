@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Benchmark of db_uploader row conversion from a file, comparing the row-by-row conversion with the column-wise batch one,
+for fixed-width and delimited data, with datetime values passed on as strings (for the database to parse) and parsed by
+the handler. Use --rows 10000000 for a 10M-line file, and --format to only benchmark fixed-width or delimited data.
+"""
+import argparse
+import csv
+import os
+import tempfile
+
+import common
+from etl import config
+from etl.handlers import db_uploader
+from db_uploader import make_data, _MAPPINGS_DELIMITED, _MAPPINGS_FIXED
+
+
+def convert_file(file_name: str, fmt_fixed: bool, batch: bool, parse_datetime: bool):
+    """Convert all lines of the file, discarding the rows."""
+    mappings = [config.Config(m) for m in (_MAPPINGS_FIXED if fmt_fixed else _MAPPINGS_DELIMITED)]
+    extractors = db_uploader.Handler.compile_mappings(mappings, fmt_fixed, not fmt_fixed, parse_datetime)
+    convert_batch = None
+    if batch:
+        convert_batch = db_uploader.Handler.compile_batch_converter(mappings, fmt_fixed, parse_datetime)
+    with open(file_name, encoding='utf-8', newline='') as f:
+        input_data = f if fmt_fixed else csv.reader(f, delimiter=',', strict=True)
+        for _ in db_uploader.Handler.convert_rows(
+                input_data, 1, fmt_fixed, extractors, {}, convert_batch=convert_batch):
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000, help='number of lines in the file')
+    parser.add_argument(
+        '--format', choices=('fixed', 'delimited'), action='append',
+        help='input format to benchmark, can be repeated; by default both are')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for fmt in args.format or ('fixed', 'delimited'):
+            # Generate the file in blocks to limit memory use
+            file_name = os.path.join(tmp_dir, 'bench.txt')
+            with open(file_name, 'w', encoding='utf-8') as f:
+                for start in range(0, args.rows, 100000):
+                    f.write(make_data(min(100000, args.rows - start), fmt == 'fixed'))
+
+            for parse_datetime in (False, True):
+                for batch in (False, True):
+                    common.report(
+                        'db_uploader, format={}, {} conversion, dates by {}'.format(
+                            fmt, 'batch' if batch else 'row', 'handler' if parse_datetime else 'database'),
+                        args.rows,
+                        common.measure(
+                            convert_file, file_name, fmt == 'fixed', batch, parse_datetime,
+                            repeat=1 if args.rows > 1000000 else 3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Benchmark of repeatedly executed single statements (DBConnection.execute() and query_value()), as issued per line by
+handlers, with and without the per-connection cursor cache, against an SQLite database file.
+"""
+import argparse
+import os
+import tempfile
+
+import common
+from etl.db.connection import DBConnection
+
+
+def run_statements(conn: DBConnection, count: int):
+    """Insert the given number of rows one by one, looking up the row count after each insert."""
+    for i in range(count):
+        conn.execute('insert into T(ID, NAME) values(:id, :name)', {'id': i, 'name': 'Name #' + str(i)})
+        conn.query_value('select NAME from T where ID = :id', {'id': i})
+    conn.rollback()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--statements', type=int, default=50000, help='number of insert/select pairs executed')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in (0, DBConnection.DEFAULT_CURSOR_CACHE_SIZE):
+            conn = DBConnection('sqlite:' + os.path.join(tmp_dir, 'bench{}.db'.format(size)), '', '', size)
+            try:
+                conn.execute('create table T(ID integer primary key, NAME text)')
+                conn.commit()
+                seconds = common.measure(run_statements, conn, args.statements)
+                common.report('execute/query_value, cursor_cache_size={}'.format(size), args.statements * 2, seconds,
+                              'statements')
+                if size:
+                    print('  cursor cache: {}'.format(conn.get_cursor_cache_stats()))
+            finally:
+                conn.close()
+
+
+if __name__ == '__main__':
+    main()
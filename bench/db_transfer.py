@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark of copying a table between two SQLite database files: sql_query output as text, parsed and loaded by
+db_uploader, versus db_transfer, which inserts the fetched rows with their native types (with and without background
+inserts).
+"""
+import argparse
+import json
+import os
+import tempfile
+
+import common
+from etl import config
+from etl import context
+from etl.handlers import db_transfer
+from etl.handlers import db_uploader
+from etl.handlers import sql_query
+
+SQL = 'select ID, CODE, AMOUNT, CREATED from SRC'
+
+MAPPINGS = [
+    {'name': 'ID',      'datatype': 'integer', 'source_index': 0, 'target_column': 'ID'},
+    {'name': 'CODE',    'datatype': 'string',  'source_index': 1, 'target_column': 'CODE', 'length': 20},
+    {'name': 'AMOUNT',  'datatype': 'number',  'source_index': 2, 'target_column': 'AMOUNT'},
+    {'name': 'CREATED', 'datatype': 'string',  'source_index': 3, 'target_column': 'CREATED', 'length': 19},
+]
+
+
+def copy_via_text():
+    """Copy the table with sql_query and db_uploader."""
+    data = sql_query.Handler().run(config.Config({'database': 'src', 'field_delimiter': '\t', 'sql': SQL}))['data']
+    db_uploader.Handler().run(config.Config({
+        'data':            data,
+        'format':          'delimited',
+        'delimiter':       '\t',
+        'target_database': 'tgt',
+        'target_table':    'TGT',
+        'truncate_target': True,
+        'batch_size':      1000,
+        'column_mappings': [config.Config(m) for m in MAPPINGS],
+    }))
+
+
+def copy_direct(background: bool):
+    """Copy the table with db_transfer."""
+    db_transfer.Handler().run(config.Config({
+        'source_database':   'src',
+        'sql':               SQL,
+        'target_database':   'tgt',
+        'target_table':      'TGT',
+        'truncate_target':   True,
+        'background_insert': background,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200000, help='number of rows copied')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config_file = os.path.join(tmp_dir, 'bench.json')
+        with open(config_file, 'w') as f:
+            json.dump({
+                'processes': [],
+                'databases': [
+                    {'name': name, 'connection': 'sqlite:' + os.path.join(tmp_dir, name + '.db'), 'username': '',
+                     'password': ''}
+                    for name in ('src', 'tgt')],
+            }, f)
+        context.initialise(config_file, False, False, {})
+        try:
+            with context.db_connection('src', writes=True) as conn:
+                conn.execute('create table SRC(ID integer, CODE text, AMOUNT real, CREATED text)')
+                conn.execute(
+                    "insert into SRC with recursive n(i) as (select 1 union all select i + 1 from n where i < :rows) "
+                    "select i, 'CODE-' || i, i * 1.25, '2024-01-01 12:00:00' from n", {'rows': args.rows})
+                conn.commit()
+            with context.db_connection('tgt', writes=True) as conn:
+                conn.execute('create table TGT(ID integer, CODE text, AMOUNT real, CREATED text)')
+                conn.commit()
+
+            seconds = common.measure(copy_via_text)
+            common.report('sql_query + db_uploader (text)', args.rows, seconds)
+            for background in (False, True):
+                seconds = common.measure(copy_direct, background)
+                common.report('db_transfer, background_insert={}'.format(background), args.rows, seconds)
+        finally:
+            context.teardown()
+
+
+if __name__ == '__main__':
+    main()
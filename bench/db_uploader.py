@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Benchmark of db_uploader row processing (parsing, trimming and conversion) for fixed-width and delimited data. The
+database is first replaced with a no-op inserter, so only the handler's own overhead is measured, and then the data is
+loaded end to end into an SQLite database file, also with the given number of worker processes (--parallel).
+
+With --postgresql, the data is also loaded into a PostgreSQL database, both with COPY and with array inserts. The
+datetime conversion is left to the server there, so that the rows qualify for COPY.
+"""
+import argparse
+import json
+import os
+import tempfile
+from unittest.mock import patch, MagicMock
+
+import common
+from etl import config
+from etl import context
+from etl.db.array_inserter import DBArrayInserter
+from etl.db.connection import DBConnection
+from etl.handlers import db_uploader
+
+
+class NullInserter(object):
+    """Inserter that only counts pushed rows."""
+
+    batch_size = DBArrayInserter.insert_bind_array_size
+
+    def __init__(self, *args, **kwargs):
+        self.count = 0
+
+    def push_row(self, row):
+        self.count += 1
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+_MAPPINGS_FIXED = [
+    {'name': 'id',     'datatype': 'integer',  'source_pos': '1:10',  'target_column': 'ID'},
+    {'name': 'code',   'datatype': 'string',   'source_pos': '11:16', 'target_column': 'CODE', 'length': 6,
+     'source_trim': 'both'},
+    {'name': 'name',   'datatype': 'string',   'source_pos': '17:46', 'target_column': 'NAME', 'length': 30,
+     'source_trim': 'right'},
+    {'name': 'amount', 'datatype': 'number',   'source_pos': '47:58', 'target_column': 'AMOUNT', 'source_trim': 'left'},
+    {'name': 'date',   'datatype': 'datetime', 'source_pos': '59:66', 'target_column': 'DT',
+     'source_format': 'YYYYMMDD'},
+    {'name': 'seq',    'target_column': 'SEQ', 'target_expr': '{rownum}'},
+]
+
+_MAPPINGS_DELIMITED = [
+    {'name': 'id',     'datatype': 'integer',  'source_index': 0, 'target_column': 'ID'},
+    {'name': 'code',   'datatype': 'string',   'source_index': 1, 'target_column': 'CODE', 'length': 6},
+    {'name': 'name',   'datatype': 'string',   'source_index': 2, 'target_column': 'NAME', 'length': 30,
+     'source_trim': 'right'},
+    {'name': 'amount', 'datatype': 'number',   'source_index': 3, 'target_column': 'AMOUNT'},
+    {'name': 'date',   'datatype': 'datetime', 'source_index': 4, 'target_column': 'DT',
+     'source_format': 'YYYYMMDD'},
+    {'name': 'seq',    'target_column': 'SEQ', 'target_expr': '{rownum}'},
+]
+
+
+def make_data(rows: int, fixed: bool) -> str:
+    """Generate input data with the given number of rows."""
+    if fixed:
+        fmt = '{:>9d} {:<5} {:<30}{:>12.4f}{:%Y%m%d}\n'
+    else:
+        fmt = '{},{},{},{:.4f},{:%Y%m%d}\n'
+    import datetime
+    day = datetime.date(2015, 1, 1)
+    return ''.join(fmt.format(i, 'C' + str(i % 1000), 'Name #' + str(i), i * 1.25, day) for i in range(rows))
+
+
+def run_handler(conf: config.Config):
+    """Run the handler with mocked database access."""
+    with patch('etl.handlers.db_uploader.context') as mock_context, \
+            patch('etl.handlers.db_uploader.DBArrayInserter', NullInserter):
+        mock_context.dry_run_mode = False
+        mock_context.dry_run_prefix = ''
+        mock_context.db_connection.return_value.__enter__.return_value = mock_db = MagicMock()
+        mock_db.get_param_placeholder.return_value = '?'
+        mock_db.supports_bulk_load = False
+        mock_db.get_datetime_expression.side_effect = lambda value, fmt: value
+        db_uploader.Handler().run(conf)
+
+
+def run_handler_sqlite(conf: config.Config, db_file: str):
+    """Run the handler against an SQLite database."""
+    conn = DBConnection('sqlite:' + db_file, '', '')
+    conn.execute('create table if not exists BENCH(ID integer, CODE text, NAME text, AMOUNT real, DT text, SEQ integer)')
+    with patch('etl.context.db_connection', return_value=common.NullContext(conn)):
+        db_uploader.Handler().run(conf)
+
+
+def run_handler_sqlite_parallel(conf: config.Config, db_file: str, parallel_degree: int):
+    """Run the handler against an SQLite database on worker processes, which connect to it through the context."""
+    conn = DBConnection('sqlite:' + db_file, '', '')
+    conn.execute(
+        'create table if not exists BENCH(ID integer, CODE text, NAME text, AMOUNT real, DT text, SEQ integer)')
+    conn.commit()
+    config_file = db_file + '.json'
+    with open(config_file, 'w') as f:
+        json.dump(
+            {'databases': [{'name': 'bench', 'connection': 'sqlite:' + db_file, 'username': '', 'password': ''}]}, f)
+    context.initialise(config_file, False, False, {})
+    try:
+        db_uploader.Handler().run(config.Config(conf, parallel_degree=parallel_degree))
+    finally:
+        context.teardown()
+
+
+def run_handler_postgresql(conf: config.Config, conn: DBConnection, bulk: bool):
+    """Run the handler against a PostgreSQL database, using COPY if bulk is True or array inserts otherwise."""
+    with patch('etl.context.db_connection', return_value=common.NullContext(conn)), \
+            patch.object(type(conn), 'supports_bulk_load', bulk):
+        db_uploader.Handler().run(conf)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200000, help='number of rows to process')
+    parser.add_argument('--parallel', type=int, default=4, help='number of worker processes for the parallel load')
+    parser.add_argument(
+        '--postgresql', metavar='HOST:PORT:DBNAME:USER:PASSWORD', help='also load into this PostgreSQL database')
+    args = parser.parse_args()
+
+    pg_conn = None
+    if args.postgresql:
+        host, port, dbname, username, password = args.postgresql.split(':', 4)
+        pg_conn = DBConnection('postgresql:{}:{}:{}'.format(host, port, dbname), username, password)
+        pg_conn.execute(
+            'create temporary table BENCH(ID integer, CODE text, NAME text, AMOUNT numeric, DT date, SEQ integer)')
+        pg_conn.commit()
+
+    for fmt, mappings in (('fixed', _MAPPINGS_FIXED), ('delimited', _MAPPINGS_DELIMITED)):
+        conf = config.Config({
+            'format':          fmt,
+            'delimiter':       ',',
+            'data':            make_data(args.rows, fmt == 'fixed'),
+            'target_database': 'bench',
+            'target_table':    'BENCH',
+            'truncate_target': True,
+            'column_mappings': [config.Config(m) for m in mappings],
+        })
+        common.report('db_uploader, format={}'.format(fmt), args.rows, common.measure(run_handler, conf))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            common.report(
+                'db_uploader, format={}, sqlite'.format(fmt),
+                args.rows,
+                common.measure(run_handler_sqlite, conf, os.path.join(tmp_dir, 'bench.db')))
+            common.report(
+                'db_uploader, format={}, sqlite, datetime_parsing=handler'.format(fmt),
+                args.rows,
+                common.measure(
+                    run_handler_sqlite, config.Config(conf, datetime_parsing='handler'),
+                    os.path.join(tmp_dir, 'bench.db')))
+            if args.parallel > 1:
+                common.report(
+                    'db_uploader, format={}, sqlite, parallel_degree={}'.format(fmt, args.parallel),
+                    args.rows,
+                    common.measure(
+                        run_handler_sqlite_parallel, conf, os.path.join(tmp_dir, 'bench.db'), args.parallel))
+        if pg_conn is not None:
+            conf['column_mappings'] = [
+                config.Config({k: v for k, v in m.items() if k != 'source_format'}) for m in mappings]
+            for bulk in (True, False):
+                common.report(
+                    'db_uploader, format={}, postgresql {}'.format(fmt, 'copy' if bulk else 'insert'),
+                    args.rows,
+                    common.measure(run_handler_postgresql, conf, pg_conn, bulk))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the per-invocation handler dispatch cost in context, both for direct invocations and for a child
+handler driven by line_iterator.
+"""
+import argparse
+import importlib
+
+import common
+from etl import config
+from etl import context
+from etl.handlers import base
+from etl.tests import dummy_handlers
+
+
+def invoke_direct(conf: config.Config, count: int):
+    """Invoke the handler the given number of times."""
+    for _ in range(count):
+        context.invoke_handler(conf, None)
+
+
+def resolve_uncached(conf: config.Config, count: int):
+    """Resolve and instantiate the handler the given number of times, without any caching."""
+    for _ in range(count):
+        handler_class = getattr(importlib.import_module(conf['module']), conf['class'])
+        assert issubclass(handler_class, base.Handler)
+        handler_class()
+
+
+def resolve_cached(conf: config.Config, count: int):
+    """Resolve and instantiate the handler the given number of times, using context's handler cache."""
+    for _ in range(count):
+        context._get_handler(conf, context._get_handler_class(conf['module'], conf['class']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=200000, help='number of handler invocations')
+    parser.add_argument(
+        '--params', type=int, default=0, help='number of global and of pipeline parameters in scope of each invocation')
+    args = parser.parse_args()
+
+    # Put the requested number of parameters in scope
+    context._globals = config.Config({'global_{}'.format(i): i for i in range(args.params)})
+    pipeline_params = config.Config({'pipeline_{}'.format(i): i for i in range(args.params)})
+
+    noop_conf = config.Config({'module': 'etl.tests.dummy_handlers', 'class': 'EmptyHandler'})
+    iterator_conf = [
+        pipeline_params,
+        config.Config({
+            'module':  'line_iterator',
+            'data':    'line\n' * args.count,
+            'handler': noop_conf,
+        }),
+    ]
+    pipeline_conf = [pipeline_params] + [noop_conf] * args.count
+
+    for reusable in (False, True):
+        dummy_handlers.EmptyHandler.reusable = reusable
+        for title, func, func_args in (
+                ('handler resolution, uncached', resolve_uncached, (noop_conf, args.count)),
+                ('handler resolution, cached', resolve_cached, (noop_conf, args.count)),
+                ('direct invocation', invoke_direct, (noop_conf, args.count)),
+                ('pipeline invocation', context.invoke_handler, (pipeline_conf,)),
+                ('line_iterator child invocation', context.invoke_handler, (iterator_conf,))):
+            seconds = common.measure(func, *func_args, repeat=5)
+            common.report(
+                '{}, reusable={}, params={}'.format(title, reusable, args.params), args.count, seconds, 'calls')
+            print('{:<64} {:>10.2f} us/call'.format('', seconds / args.count * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Benchmark of http_loader downloading many small files from a local HTTP server that adds latency to every response,
+with different max_concurrent_downloads settings.
+"""
+import argparse
+from unittest.mock import patch
+
+import common
+from etl import config
+from etl.handlers import http_loader
+from etl.tests import helpers
+
+
+def run_handler(base_url: str, files: list, max_downloads: int):
+    """Download the files and feed them to a no-op child handler."""
+    with patch('etl.handlers.http_loader.context.invoke_handler'):
+        http_loader.Handler().run(config.Config({
+            'base_url': base_url,
+            'max_concurrent_downloads': max_downloads,
+            'file_defs': [config.Config({'name': name, 'handler': {}}) for name in files]
+        }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--files', type=int, default=200, help='number of files to download')
+    parser.add_argument('--size', type=int, default=10000, help='size of each file in bytes')
+    parser.add_argument('--latency', type=float, default=0.01, help='server response delay, in seconds')
+    args = parser.parse_args()
+
+    files = {'file_{}'.format(i): b'x' * args.size for i in range(args.files)}
+    with helpers.http_server(files, args.latency) as base_url:
+        for max_downloads in (1, 4, 16, 32):
+            elapsed = common.measure(run_handler, base_url, list(files), max_downloads)
+            common.report('http_loader, max_concurrent_downloads={}'.format(max_downloads), args.files, elapsed, 'files')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the wall-clock time of a load consisting of independent processes that mostly wait (simulating database
+or HTTP latency), run with different max_parallel settings.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from unittest.mock import patch
+
+import common
+from etl import context
+from etl import loader
+from etl import logger
+
+
+def run_load(config_file: str, max_parallel: int, latency: float) -> float:
+    """Run the load and return the elapsed seconds."""
+    ldr = loader.Loader(config_file, False, False, {}, max_parallel)
+    logger.minimum_severity = logger.WARNING
+    try:
+        with patch.object(context, 'invoke_handler', side_effect=lambda handler_conf: time.sleep(latency)), \
+                patch.object(logger, 'separator'):
+            start = time.perf_counter()
+            assert ldr.run()
+            return time.perf_counter() - start
+    finally:
+        context.teardown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--processes', type=int, default=40, help='number of processes in the load')
+    parser.add_argument('--latency', type=float, default=0.05, help='time each process waits, in seconds')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config_file = os.path.join(tmp_dir, 'config.json')
+        with open(config_file, 'w') as f:
+            json.dump({'processes': [{'name': 'p{}'.format(i), 'handler': {}} for i in range(args.processes)]}, f)
+
+        for max_parallel in (1, 4, 16, args.processes):
+            elapsed = run_load(config_file, max_parallel, args.latency)
+            common.report('load, max_parallel={}'.format(max_parallel), args.processes, elapsed, 'processes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark of repeated sql_query lookups of reference data, as run by line_iterator, with and without the run-scoped
+query result cache. Each lookup fetches a row by a key from a small set from an SQLite database file.
+"""
+import argparse
+import json
+import os
+import tempfile
+
+import common
+from etl import config
+from etl import context
+from etl.handlers import sql_query
+
+
+def run_lookups(count: int, keys: int, cache: bool):
+    """Run the given number of lookups, cycling through the keys."""
+    handler = sql_query.Handler()
+    for i in range(count):
+        handler.run(config.Config({
+            'database': 'bench',
+            'sql':      'select CODE, NAME from REF where ID = :id',
+            'cache':    cache,
+            'params':   [{'name': 'id', 'value': str(i % keys)}],
+        }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--lookups', type=int, default=20000, help='number of lookups')
+    parser.add_argument('--keys', type=int, default=100, help='number of distinct keys looked up')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config_file = os.path.join(tmp_dir, 'bench.json')
+        with open(config_file, 'w') as f:
+            json.dump({
+                'processes': [],
+                'databases': [{
+                    'name':       'bench',
+                    'connection': 'sqlite:' + os.path.join(tmp_dir, 'bench.db'),
+                    'username':   '',
+                    'password':   ''}],
+            }, f)
+        context.initialise(config_file, False, False, {})
+        try:
+            with context.db_connection('bench', writes=True) as conn:
+                conn.execute('create table REF(ID integer primary key, CODE text, NAME text)')
+                conn.execute(
+                    "insert into REF with recursive n(i) as (select 0 union all select i + 1 from n where i < 999) "
+                    "select i, 'C' || i, 'Reference item #' || i from n")
+                conn.commit()
+
+            for cache in (False, True):
+                seconds = common.measure(run_lookups, args.lookups, args.keys, cache)
+                common.report('sql_query lookups, cache={}'.format(cache), args.lookups, seconds, 'lookups')
+        finally:
+            context.teardown()
+
+
+if __name__ == '__main__':
+    main()
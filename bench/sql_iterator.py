@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark of invoking a handler per row of a query result from an SQLite database file: sql_query output as delimited
+text iterated by line_iterator (the child re-splitting each line), versus sql_iterator, which passes the fetched values
+as parameters. The child handler invocation itself is stubbed out, so only the driving overhead is measured, in terms of
+throughput and peak memory use (traced by tracemalloc in a separate run).
+"""
+import argparse
+import os
+import tempfile
+import tracemalloc
+from unittest.mock import patch
+
+import common
+from etl import config
+from etl.db.connection import DBConnection
+from etl.handlers import line_iterator
+from etl.handlers import sql_iterator
+from etl.handlers import sql_query
+
+SQL = 'select ID, CODE, AMOUNT from BENCH'
+
+
+def child_split(own_config, external_config=None):
+    """Stand-in for a child handler that needs the column values of a text line."""
+    external_config['data'].split('\t')
+
+
+def child_params(own_config, external_config=None):
+    """Stand-in for a child handler using the column values passed as parameters."""
+
+
+def run_text():
+    """Run the query and iterate through the lines of its result."""
+    data = sql_query.Handler().run(config.Config({'database': 'bench', 'field_delimiter': '\t', 'sql': SQL}))['data']
+    with patch('etl.context.invoke_handler', child_split):
+        line_iterator.Handler().run(config.Config({'data': data, 'handler': {}}))
+
+
+def run_rows():
+    """Run the query and iterate through its rows."""
+    with patch('etl.context.invoke_handler', child_params):
+        sql_iterator.Handler().run(config.Config({'database': 'bench', 'sql': SQL, 'handler': {}}))
+
+
+def trace(func) -> int:
+    """Run the function and return the peak traced memory size in bytes."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200000, help='number of rows in the table')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conn = DBConnection('sqlite:' + os.path.join(tmp_dir, 'bench.db'), '', '')
+        conn.execute('create table BENCH(ID integer, CODE text, AMOUNT real)')
+        conn.execute(
+            "insert into BENCH with recursive n(i) as (select 1 union all select i + 1 from n where i < {}) "
+            "select i, 'C' || (i % 1000), i * 1.25 from n".format(args.rows))
+        conn.commit()
+
+        with patch('etl.context.db_connection', side_effect=lambda *a, **kw: common.NullContext(conn)):
+            for title, func in (('sql_query + line_iterator', run_text), ('sql_iterator', run_rows)):
+                seconds = common.measure(func)
+                common.report('{}, peak memory {:.1f} MiB'.format(title, trace(func) / 2 ** 20), args.rows, seconds)
+
+
+if __name__ == '__main__':
+    main()
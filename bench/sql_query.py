@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark of sql_query fetching a large result set from an SQLite database file, comparing the result collected into a
+string with the one written into a file and the one streamed to the next handler, as well as the Arrow columnar output
+(if pyarrow is installed), in terms of throughput and peak memory use. The memory is traced by tracemalloc in a separate
+run, as tracing slows the Python code down; it doesn't include the buffers allocated by Arrow itself.
+"""
+import argparse
+import importlib.util
+import os
+import tempfile
+import tracemalloc
+from unittest.mock import patch
+
+import common
+from etl import config
+from etl.db.connection import DBConnection
+from etl.handlers import sql_query
+
+
+def run_query(conn: DBConnection, extra_conf: dict):
+    """Run the handler, consuming the result."""
+    conf = config.Config({
+        'database':        'bench',
+        'field_delimiter': ',',
+        'sql':             'select ID, CODE, NAME, AMOUNT, DT from BENCH',
+    }, **extra_conf)
+    with patch('etl.context.db_connection', return_value=common.NullContext(conn)):
+        result = sql_query.Handler().run(conf)
+        if conf['stream', False]:
+            for _ in result['data']:
+                pass
+
+
+def trace_query(conn: DBConnection, extra_conf: dict) -> int:
+    """Run the handler, consuming the result, and return the peak traced memory size in bytes."""
+    tracemalloc.start()
+    try:
+        run_query(conn, extra_conf)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=500000, help='number of rows in the table')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conn = DBConnection('sqlite:' + os.path.join(tmp_dir, 'bench.db'), '', '')
+        conn.execute('create table BENCH(ID integer, CODE text, NAME text, AMOUNT real, DT text)')
+        conn.execute(
+            "insert into BENCH with recursive n(i) as (select 1 union all select i + 1 from n where i < {}) "
+            "select i, 'C' || (i % 1000), 'Name #' || i, i * 1.25, '2015-01-01' from n".format(args.rows))
+        conn.commit()
+
+        for title, extra_conf in (
+                ('collected', {}),
+                ('output_file', {'output_file': os.path.join(tmp_dir, 'out.txt')}),
+                ('stream', {'stream': True}),
+                ('stream, arraysize=5000', {'stream': True, 'arraysize': 5000}),
+                ('arrow', {'output_format': 'arrow'}),
+                ('arrow, output_file', {'output_format': 'arrow', 'output_file': os.path.join(tmp_dir, 'out.arrow')})):
+            if extra_conf.get('output_format') == 'arrow' and importlib.util.find_spec('pyarrow') is None:
+                print('sql_query, {}: skipped, pyarrow is not installed'.format(title))
+                continue
+            seconds = common.measure(run_query, conn, extra_conf)
+            title = 'sql_query, {}, peak memory {:.1f} MiB'.format(title, trace_query(conn, extra_conf) / 2 ** 20)
+            common.report(title, args.rows, seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark of sql_statement updating rows of an SQLite database file per input data line: once per line, nested under
+line_iterator (binding the whole line), versus batches of lines bound with param_mappings.
+"""
+import argparse
+import json
+import os
+import tempfile
+
+import common
+from etl import config
+from etl import context
+
+
+def make_data(rows: int) -> str:
+    """Generate delimited input data: an ID and a new name per line."""
+    return ''.join('{};Item {:08d}\n'.format(i, i * 7) for i in range(rows))
+
+
+def run_per_line(data: str):
+    """Run the update once per line, splitting the line in SQL."""
+    context.invoke_handler(config.Config({
+        'module':  'line_iterator',
+        'handler': {
+            'module':   'sql_statement',
+            'database': 'bench',
+            'sql':      "update REF set NAME = substr(:line, instr(:line, ';') + 1) "
+                        "where ID = cast(substr(:line, 1, instr(:line, ';') - 1) as integer)",
+            'params':   [{'name': 'line', 'value': '{data}'}]}}),
+        {'data': data})
+
+
+def run_batches(data: str, batch_size: int):
+    """Run the update in batches of lines."""
+    context.invoke_handler(config.Config({
+        'module':         'sql_statement',
+        'database':       'bench',
+        'sql':            'update REF set NAME = :name where ID = :id',
+        'format':         'delimited',
+        'delimiter':      ';',
+        'batch_size':     batch_size,
+        'commit_stmt':    'all',
+        'param_mappings': [
+            config.Config({'name': 'id',   'datatype': 'integer', 'source_index': 0}),
+            config.Config({'name': 'name', 'datatype': 'string',  'source_index': 1, 'length': 20})]}),
+        {'data': data})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=20000, help='number of lines')
+    args = parser.parse_args()
+    data = make_data(args.rows)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config_file = os.path.join(tmp_dir, 'bench.json')
+        with open(config_file, 'w') as f:
+            json.dump({
+                'processes': [],
+                'databases': [{
+                    'name':       'bench',
+                    'connection': 'sqlite:' + os.path.join(tmp_dir, 'bench.db'),
+                    'username':   '',
+                    'password':   ''}],
+            }, f)
+        context.initialise(config_file, False, False, {})
+        try:
+            with context.db_connection('bench', writes=True) as conn:
+                conn.execute('create table REF(ID integer primary key, NAME text)')
+                conn.execute(
+                    "insert into REF with recursive n(i) as (select 0 union all select i + 1 from n where i < {}) "
+                    "select i, 'Item' from n".format(args.rows - 1))
+                conn.commit()
+
+            common.report('sql_statement per line', args.rows, common.measure(run_per_line, data, repeat=1))
+            for batch_size in (100, 1000, 10000):
+                common.report(
+                    'sql_statement, batch_size={}'.format(batch_size), args.rows,
+                    common.measure(run_batches, data, batch_size))
+        finally:
+            context.teardown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Benchmark of peak memory usage and throughput of a file_reader -> line_filter -> str_replacer -> file_writer pipeline,
+with and without line streaming.
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import common
+from etl import config
+from etl import context
+
+
+def run_pipeline(in_file: str, out_file: str, stream: bool, trace: bool):
+    """Run the pipeline and return a tuple of elapsed seconds and peak traced memory in bytes (None unless trace is
+    True; tracing slows the run down considerably, so it's measured separately)."""
+    pipeline = [
+        config.Config({'module': 'file_reader', 'file_name': in_file, 'stream': stream}),
+        config.Config({'module': 'line_filter', 'criteria': config.Config({'search': 'skip', 'negate': True})}),
+        config.Config({'module': 'str_replacer', 'rules': [config.Config({'search': 'line', 'replace': 'LINE'})]}),
+        config.Config({'module': 'file_writer', 'output_file': out_file}),
+    ]
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    context.invoke_handler(pipeline)
+    elapsed = time.perf_counter() - start
+    peak = None
+    if trace:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=500000, help='number of lines in the input file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        in_file  = os.path.join(tmp_dir, 'in.txt')
+        out_file = os.path.join(tmp_dir, 'out.txt')
+        with open(in_file, 'w') as f:
+            for i in range(args.rows):
+                f.write('line {:>10} {}\n'.format(i, 'skip' if i % 10 == 0 else 'keep' * 10))
+        print('Input file size: {:,} bytes'.format(os.path.getsize(in_file)))
+
+        for stream in (False, True):
+            elapsed = run_pipeline(in_file, out_file, stream, False)[0]
+            peak = run_pipeline(in_file, out_file, stream, True)[1]
+            title = 'pipeline, stream={}'.format(stream)
+            common.report(title, args.rows, elapsed, 'lines')
+            print('{:<64} peak memory {:>14,} bytes'.format(title, peak))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,9 +2,24 @@
 Configuration implementation.
 """
 import io
+import collections
 from . import errors
 
 
+def _split_key(key: [str, tuple]) -> tuple:
+    """Split a configuration item key into the key name and the default value.
+    :param key Either a key name (string) or a tuple consisting of the key name and an optional default value.
+    :return Tuple consisting of the key name, the default value and whether the default value was given.
+    """
+    # If key is a tuple, sort the arguments
+    if type(key) is tuple:
+        if len(key) > 1:
+            return key[0], key[1], True
+        return key[0], None, False
+    # If key is not a tuple, consider it a scalar [string] key name
+    return key, None, False
+
+
 class Config(dict):
     """Extension of the standard dict class that overrides item getter to add default value support and a better
     exception message. Based on http://stackoverflow.com/questions/2060972
@@ -20,17 +35,7 @@ class Config(dict):
         :rtype : V
         :return Configuration value corresponfing to the name or the default.
         """
-        # Sort the arguments
-        default = None
-        default_given = False
-        if type(key) is tuple:
-            key_name = key[0]
-            if len(key) > 1:
-                default = key[1]
-                default_given = True
-        # If key is not a tuple, consider it a scalar [string] key name
-        else:
-            key_name = key
+        key_name, default, default_given = _split_key(key)
 
         # Try to fetch a key
         if key_name in self:
@@ -48,11 +53,15 @@ class Config(dict):
             value = Config(value)
         dict.__setitem__(self, key, value)
 
-    def lines(self, key: str) -> io.StringIO:
-        """Return a configuration text value as an StringIO object by given key.
+    def lines(self, key: str):
+        """Return an iterable over lines (including linebreaks) of a configuration text value by given key. The value
+        can either be a string, which is wrapped in a StringIO object, or an iterable of lines, e.g. a LineStream.
         :param key Name of the key to retrieve.
         """
-        return io.StringIO(self[key])
+        value = self[key]
+        if value is None or isinstance(value, str):
+            return io.StringIO(value)
+        return iter(value)
 
     def lines_list(self, key: str) -> list:
         """Return a configuration text value as a list of strings without linebreaks.
@@ -73,3 +82,38 @@ class Config(dict):
         for k, v in kwargs.items():
             self[k] = v
 
+
+class LayeredConfig(collections.ChainMap):
+    """Configuration view combining several layers (mappings) without copying them. Lookups search the layers in order,
+    so the first layer has the highest precedence. Changes are only made in the first layer. Supports the same item
+    access semantics as Config.
+    """
+
+    def __getitem__(self, key: [str, tuple]):
+        """Override the inherited getter. See Config.__getitem__() for details."""
+        key_name, default, default_given = _split_key(key)
+
+        # Find the first layer containing the key
+        for mapping in self.maps:
+            if key_name in mapping:
+                value = mapping[key_name]
+                # Values in layers that aren't Config instances can be plain dicts
+                return Config(value) if type(value) is dict else value
+
+        # We don't have the key. If a default was given, return it
+        if default_given:
+            return default
+        raise errors.ConfigError('The key named "{}" is not found in the configuration.'.format(key_name))
+
+    def __setitem__(self, key, value):
+        """Override the inherited setter to convert incoming dict values into Config instances."""
+        if type(value) is dict:
+            value = Config(value)
+        self.maps[0][key] = value
+
+    def copy(self):
+        """Return a copy of the view. The copy gets its own first layer, so its changes don't affect the original."""
+        return self.new_child()
+
+    lines = Config.lines
+    lines_list = Config.lines_list
@@ -7,16 +7,40 @@ import os
 import importlib
 import json
 import base64
+import collections
+import concurrent.futures
+import threading
+import weakref
+from contextlib import contextmanager
 from . import errors
 from . import logger
+from . import profiler
 from . import config
-from .db.connection import DBConnection
-from .handlers.base import Handler
+from .db.connection import DBConnection, DatabaseError
+from .db.pool import ConnectionPool
+from .db.result_cache import ResultCache
+from .handlers.base import Handler, LineStream, materialise
 
 _config = None           # Private configuration collection
-_connections = {}        # Private database connection pool
+_pools = {}              # Private database connection pools, keyed by database name
 _globals = {}            # Private global configuration object
 _config_file_stack = []  # Stack of loaded config file paths, with at least the main config file at the bottom
+_handler_classes = {}    # Cache of resolved handler classes, keyed by (module name, class name)
+_handler_instances = {}  # Cache of reusable handler instances, keyed by id() of their configuration node
+_thread_data = threading.local()        # Thread-specific data, such as the config file stack of a worker thread
+_connection_lock = threading.Lock()     # Lock guarding the creation of DB connection pools
+_include_cache = {}                     # Cache of parsed include files: {absolute path: ((mtime, size), config)}
+_include_cache_stats = [0, 0]           # Include cache hit and miss counts
+_include_cache_lock = threading.Lock()  # Lock guarding the include cache
+_query_cache = None                     # Run-scoped cache of query results, created on initialisation
+
+# Connection pool defaults, unless overridden in the database definition
+DEFAULT_POOL_MAX_SIZE            = 8
+DEFAULT_POOL_MAX_IDLE_TIME       = 300.0
+DEFAULT_POOL_VALIDATION_INTERVAL = 30.0
+
+# Query result cache defaults, unless overridden in the configuration
+DEFAULT_QUERY_CACHE_MAX_SIZE = 64 * 1024 * 1024
 
 verbose_mode = False     # Verbose mode
 
@@ -24,6 +48,31 @@ dry_run_mode = False     # Dry-run mode
 dry_run_prefix = ''      # Prefix to be used in logging of operations affected by the dry-run flag
 
 
+class _Pipeline(config.LayeredConfig):
+    """Pipeline (dynamic) configuration. It consists of a single layer owned by the pipeline, which published parameters
+    are written into, so that publishing doesn't copy anything and the values replaced by the published ones are
+    released right away. Handler views refer to that layer, hence handlers must fetch their inputs before returning."""
+
+    holds_streams = False
+    """Whether any of the published parameters may be an unconsumed LineStream."""
+
+    def publish(self, params):
+        """Publish the given parameters on the pipeline.
+        :param params: Mapping of parameters to publish.
+        """
+        self.maps[0].update(params)
+        if not self.holds_streams:
+            self.holds_streams = any(isinstance(value, LineStream) for value in params.values())
+
+    def materialise(self):
+        """Replace all unconsumed LineStream values on the pipeline with the strings they represent."""
+        if self.holds_streams:
+            strings = materialise(dict(self))
+            if strings:
+                self.maps[0].update(strings)
+            self.holds_streams = False
+
+
 def _check_initialised(initialised: bool=True):
     """Raises a LogicError if the initialised state is not correct.
 
@@ -59,31 +108,61 @@ def _init_logging(b_verbose: bool):
         logger.minimum_severity = logger.DEBUG
 
 
-def _load_config(config_file_name: str):
+def _get_config_file_stack() -> list:
+    """Return the config file stack of the current thread. Processes running in parallel include files independently,
+    so every thread other than the main one gets its own stack, starting as a copy of the main thread's one.
+    """
+    if threading.current_thread() is threading.main_thread():
+        return _config_file_stack
+    stack = getattr(_thread_data, 'config_file_stack', None)
+    if stack is None:
+        stack = _thread_data.config_file_stack = list(_config_file_stack)
+    return stack
+
+
+def _load_config(config_file_name: str, cached: bool=False):
     """Load, parse and return JSON configuration from a file specified by name.
     :param config_file_name: Name of the JSON configuration file, either absolute or relative to the last loaded file's
         location.
+    :param cached: Whether to use the include cache. If True, the file is only parsed again once its modification time
+        or size changes, and the returned configuration is shared between calls, so it must not be modified.
     """
-    global _config_file_stack
-
     # Convert the file name into an absolute one
     config_file_name = get_absolute_file_name(config_file_name)
 
+    # Look the file up in the cache
+    if cached:
+        stat = os.stat(config_file_name)
+        version = (stat.st_mtime_ns, stat.st_size)
+        with _include_cache_lock:
+            entry = _include_cache.get(config_file_name)
+            if entry is not None and entry[0] == version:
+                _include_cache_stats[0] += 1
+                conf = entry[1]
+            else:
+                _include_cache_stats[1] += 1
+                conf = None
+        if conf is not None:
+            logger.log('Using cached configuration file ' + config_file_name)
+
     # Open and read in the file
-    with open(config_file_name, 'r') as cf:
-        conf = json.load(cf, object_hook=lambda dct: config.Config(dct))
-    logger.log('Loaded configuration file ' + config_file_name)
+    if not cached or conf is None:
+        with open(config_file_name, 'r') as cf:
+            conf = json.load(cf, object_hook=lambda dct: config.Config(dct))
+        logger.log('Loaded configuration file ' + config_file_name)
+        if cached:
+            with _include_cache_lock:
+                _include_cache[config_file_name] = (version, conf)
 
     # Push the name of the file into the stack
-    _config_file_stack.append(config_file_name)
+    _get_config_file_stack().append(config_file_name)
     return conf
 
 
 def _unload_config():
     """Must be called whenever the file last loaded by _load_config() is not needed anymore."""
-    global _config_file_stack
     # Remove the last loaded file's name from the stack
-    _config_file_stack.pop()
+    _get_config_file_stack().pop()
 
 
 def _load_db_connection(file_name: str):
@@ -102,17 +181,54 @@ def _load_db_connection(file_name: str):
     return conf
 
 
+def _get_handler_class(module_name: str, class_name: str):
+    """Return a handler class by its module and class name. The class is only resolved once, and cached afterwards.
+    :param module_name: Fully qualified name of the module containing the handler.
+    :param class_name: Name of the handler class.
+    """
+    key = (module_name, class_name)
+    handler_class = _handler_classes.get(key)
+    if handler_class is None:
+        # Import the corresponding handler module and find handler class object
+        handler_class = getattr(importlib.import_module(module_name), class_name)
+        assert issubclass(handler_class, Handler)
+        _handler_classes[key] = handler_class
+    return handler_class
+
+
+def _get_handler(own_conf: config.Config, handler_class):
+    """Return an instance of the given handler class to run for the specified configuration node. Reusable handlers are
+    only instantiated once per configuration node, others on every invocation.
+    :param own_conf: Own handler configuration.
+    :param handler_class: Class of the handler.
+    """
+    if not handler_class.reusable:
+        return handler_class()
+
+    # Look up an existing instance
+    key = id(own_conf)
+    entry = _handler_instances.get(key)
+    if entry is not None and type(entry[1]) is handler_class:
+        return entry[1]
+
+    # Create a new instance, and make sure it's dropped along with the configuration node
+    handler = handler_class()
+    _handler_instances[key] = (weakref.ref(own_conf, lambda ref: _handler_instances.pop(key, None)), handler)
+    return handler
+
+
 def _run_handler(own_conf, external_conf, pipeline_conf):
     """Load, instantiate and run a handler or a list of handlers according to the specified configurations.
     :param own_conf: Own handler configuration.
     :param external_conf: Configuration passed from the calling code, if any, otherwise None.
-    :param pipeline_conf: Pipeline (dynamic) configuration if the handler is a part of a pipeline, otherwise None.
+    :param pipeline_conf: Pipeline (dynamic) configuration (_Pipeline) if the handler is a part of a pipeline, otherwise
+        None.
     """
     # If config is a string, we assume this is a path to an include-configuration file
     conf_file_loaded = False
     if type(own_conf) is str:
         # Load the referenced file and replace the value of the configuration object by it
-        own_conf = _load_config(own_conf)
+        own_conf = _load_config(own_conf, True)
         conf_file_loaded = True
 
     try:
@@ -127,48 +243,64 @@ def _run_handler(own_conf, external_conf, pipeline_conf):
                     handler_module = 'etl.handlers.' + handler_module
                 handler_clsname = own_conf['class',   'Handler']
                 handler_comment = own_conf['comment', '']
+                handler_label   = handler_module + '.' + handler_clsname
 
-                # Construct an individual config copy for the handler
-                # -- Start with the global items
-                handler_conf = config.Config(_globals)
-                # -- Update it with external items, if any
-                if external_conf is not None:
-                    handler_conf.update(external_conf)
-                # -- Local handler items override them
-                handler_conf.update(own_conf)
+                # Find handler class object
+                handler_class = _get_handler_class(handler_module, handler_clsname)
+
+                # Convert line streams into strings if the handler can't consume them
+                if not handler_class.streaming:
+                    if external_conf is not None:
+                        materialise(external_conf)
+                    if pipeline_conf is not None:
+                        pipeline_conf.materialise()
+
+                # Construct a configuration view for the handler, without copying anything. Layers are listed in order
+                # of precedence:
+                # -- A private layer for changes the handler makes
+                layers = [{}]
                 # -- Pipeline config has the highest precedence since it's dynamic
                 if pipeline_conf is not None:
-                    handler_conf.update(pipeline_conf)
+                    layers.extend(pipeline_conf.maps)
+                # -- Local handler items
+                layers.append(own_conf)
+                # -- External items, if any
+                if external_conf is not None:
+                    layers.append(external_conf)
+                # -- Global items
+                layers.append(_globals)
+                handler_conf = config.LayeredConfig(*layers)
 
                 # Beautify handler's comment, if any
                 if handler_comment != '':
                     handler_comment = ' (' + handler_comment.format(**handler_conf) + ')'
-                logger.log(
-                    'Invoking handler {}.{}{}'.format(handler_module, handler_clsname, handler_comment))
-
-                # Import the corresponding handler module
-                handler_module = importlib.import_module(handler_module)
-
-                # Find handler class object
-                handler_class = getattr(handler_module, handler_clsname)
-                assert issubclass(handler_class, Handler)
+                logger.log('Invoking handler {}{}'.format(handler_label, handler_comment))
 
                 # Construct and run the handler
-                result = handler_class().run(handler_conf)
+                handler = _get_handler(own_conf, handler_class)
+                if profiler.enabled:
+                    # Only the effective input values count: pipeline parameters shadow the external ones
+                    inputs = dict(external_conf) if external_conf is not None else {}
+                    if pipeline_conf is not None:
+                        inputs.update(pipeline_conf)
+                    result = profiler.run_handler(
+                        handler, handler_conf, id(own_conf), handler_label + handler_comment, inputs)
+                else:
+                    result = handler.run(handler_conf)
 
                 # If we're on a pipeline, return output parameter values onto it
                 if pipeline_conf is not None and result is not None:
-                    pipeline_conf.update(result)
+                    pipeline_conf.publish(dict(result))
 
             # Otherwise it's a parameter block: publish its parameters on the pipeline
             elif pipeline_conf is not None:
-                pipeline_conf.update(own_conf)
+                pipeline_conf.publish(own_conf)
 
         # If it's a list of handlers, run them in sequence
         elif type(own_conf) is list:
 
             # If there's no pipeline yet, start a new one here
-            sub_pipeline_conf = pipeline_conf if pipeline_conf is not None else config.Config()
+            sub_pipeline_conf = pipeline_conf if pipeline_conf is not None else _Pipeline()
 
             # Iterate through the child objects
             for sub_conf in own_conf:
@@ -193,7 +325,7 @@ def initialise(config_file_name: str, b_verbose: bool, b_dry_run: bool, global_o
     :param global_overrides: Dictionary of global parameters that take precedence over ones defined in the 'globals'
         config object.
     """
-    global _config, _globals, dry_run_mode, dry_run_prefix
+    global _config, _globals, _query_cache, dry_run_mode, dry_run_prefix
 
     # Make sure the context hasn't been initialised yet
     _check_initialised(False)
@@ -216,6 +348,15 @@ def initialise(config_file_name: str, b_verbose: bool, b_dry_run: bool, global_o
     # Initialise the logger
     _init_logging(b_verbose)
 
+    # Create the query result cache
+    cache_conf = _config['query_cache', config.Config()]
+    try:
+        ttl = cache_conf['ttl', None]
+        _query_cache = ResultCache(
+            int(cache_conf['max_size', DEFAULT_QUERY_CACHE_MAX_SIZE]), None if ttl is None else float(ttl))
+    except (TypeError, ValueError) as e:
+        raise errors.ConfigError('Invalid query_cache settings: {}'.format(e))
+
     # Log basic info
     logger.info('Configuration file: {}'.format(config_file_name))
     if dry_run_mode:
@@ -230,18 +371,26 @@ def get_absolute_file_name(file_name: str) -> str:
     :param file_name: File name to convert to absolute.
     :return Absolute file name.
     """
-    global _config_file_stack
-
     # If the file name is not absolute, it's considered relative to the last loaded config file's location
     if not os.path.isabs(file_name):
         # If no file was loaded before, we've got a problem
-        if len(_config_file_stack) == 0:
+        config_file_stack = _get_config_file_stack()
+        if len(config_file_stack) == 0:
             raise errors.LogicError(
                 'Cannot translate relative file path "{}" out-of-context'.format(file_name))
-        file_name = os.path.realpath(os.path.join(os.path.dirname(_config_file_stack[-1]), file_name))
+        file_name = os.path.realpath(os.path.join(os.path.dirname(config_file_stack[-1]), file_name))
     return file_name
 
 
+def clear_include_cache():
+    """Drop all cached include files, so that they're parsed again when next referenced. Changed files are detected by
+    their modification time and size anyway, so this is only needed to release the memory, or if a file can be replaced
+    without changing either.
+    """
+    with _include_cache_lock:
+        _include_cache.clear()
+
+
 def get_config() -> config.Config:
     """Return the configuration collection associated with the context."""
     _check_initialised()
@@ -249,55 +398,203 @@ def get_config() -> config.Config:
 
 
 def get_db_connection(name: str) -> DBConnection:
-    """Return a ready-for-use DBConnection object by its name. The name must be defined in the configuration, otherwise
-    an exception is raised.
+    """Return a ready-for-use DBConnection object by its name, checked out from the connection pool for the current
+    thread. Repeated calls made by the thread return the same connection, which is only checked in at the end of the
+    enclosing db_connection_scope(), or on teardown if there's none; handlers should rather borrow connections for the
+    duration of their work with db_connection().
+    :param name Name of the database connection as defined in the configuration.
+    """
+    pool = get_db_pool(name)
+    pinned = getattr(_thread_data, 'db_connections', None)
+    if pinned is None:
+        pinned = _thread_data.db_connections = {}
+    # Reuse the connection pinned to the thread, unless it comes from a pool that has been closed since
+    if name not in pinned or pinned[name][0] is not pool:
+        pinned[name] = pool, pool.acquire()
+    return pinned[name][1]
+
+
+def _get_db_conf(name: str) -> config.Config:
+    """Find and return the definition of a database connection by its name, with the parameters from the external
+    connection description file, if any, filled in.
     :param name Name of the database connection as defined in the configuration.
     """
-    global _config, _connections, _globals
+    # Find the connection definition in the config
+    db_name_found = False
+    db_conf = None
+    for db_conf in _config['databases']:
+        # If the configuration is not an object, it's a misconfiguration
+        if type(db_conf) is not config.Config:
+            raise errors.ConfigError(
+                'DB connection configuration must be an object, not "{}"'.format(str(type(db_conf))))
+
+        # Check if that's the connection we're looking for
+        if db_conf['name'] == name:
+            db_name_found = True
+            break
+
+    # Failed to find a connection by the requested name
+    if not db_name_found:
+        raise errors.ConfigError('Database connection named "{}" is not found.'.format(name))
+
+    # If the entry contains 'file_name', it's a path to an external connection description file
+    if 'file_name' in db_conf:
+        # Load the referenced file and replace the config values
+        ext_conf = _load_db_connection(db_conf['file_name'].format(**_globals))
+        for k in ['connection', 'username', 'password']:
+            db_conf[k] = ext_conf[k]
+    return db_conf
+
+
+def _get_db_connection_params(db_conf: config.Config) -> tuple:
+    """Return the parameters of a DBConnection from a database connection definition, decoding the password if needed.
+    :return Tuple (connection string, user name, password).
+    """
+    # Check if the password is encoded
+    password = db_conf['password']
+    if password[0:7] == 'BASE64:':
+        password = base64.b64decode(password[7:]).decode()
+    return db_conf['connection'], db_conf['username'], password
+
+
+def get_db_connection_params(name: str) -> tuple:
+    """Return the parameters required to create a DBConnection to the database by its name, e.g. in another process.
+    :param name Name of the database connection as defined in the configuration.
+    :return Tuple (connection string, user name, password).
+    """
     _check_initialised()
-    # If the DB connection by that name doesn't exist yet
-    if name not in _connections:
-        # Find the connection definition in the config
-        db_name_found = False
-        db_conf = None
-        for db_conf in _config['databases']:
-            # If the configuration is not an object, it's a misconfiguration
-            if type(db_conf) is not config.Config:
-                raise errors.ConfigError(
-                    'DB connection configuration must be an object, not "{}"'.format(str(type(db_conf))))
-
-            # Check if that's the connection we're looking for
-            if db_conf['name'] == name:
-                db_name_found = True
-                break
-
-        # Failed to find a connection by the requested name
-        if not db_name_found:
-            raise errors.ConfigError('Database connection named "{}" is not found.'.format(name))
-
-        # If the entry contains 'file_name', it's a path to an external connection description file
-        if 'file_name' in db_conf:
-            # Load the referenced file and replace the config values
-            ext_conf = _load_db_connection(db_conf['file_name'].format(**_globals))
-            for k in ['connection', 'username', 'password']:
-                db_conf[k] = ext_conf[k]
-
-        # Check if the password is encoded
-        password = db_conf['password']
-        if password[0:7] == 'BASE64:':
-            password = base64.b64decode(password[7:]).decode()
-
-        # Create a new connection
-        conn = DBConnection(db_conf['connection'], db_conf['username'], password)
-        logger.info(
-            'Established DB connection to {}@{} as "{}"'.format(db_conf['username'], db_conf['connection'], name))
-
-        # Store the connection in the pool
-        _connections[name] = conn
-    # Connection already exists
-    else:
-        conn = _connections[name]
-    return conn
+    with _connection_lock:
+        return _get_db_connection_params(_get_db_conf(name))
+
+
+def get_db_pool(name: str) -> ConnectionPool:
+    """Return the connection pool of the database by its name, creating it on first use. The name must be defined in the
+    configuration, otherwise an exception is raised.
+    :param name Name of the database connection as defined in the configuration.
+    """
+    global _config, _pools, _globals
+    _check_initialised()
+    # Processes running in parallel may request the same pool simultaneously
+    with _connection_lock:
+        # If the pool by that name doesn't exist yet
+        if name not in _pools:
+            db_conf = _get_db_conf(name)
+
+            # Connections are created by the pool as needed, each with its own cursor cache
+            connect_string, username, password = _get_db_connection_params(db_conf)
+            cursor_cache_size = db_conf['cursor_cache_size', None]
+            try:
+                cursor_cache_size = None if cursor_cache_size is None else int(cursor_cache_size)
+            except (TypeError, ValueError) as e:
+                raise errors.ConfigError('Invalid cursor_cache_size for database connection "{}": {}'.format(name, e))
+
+            def connect() -> DBConnection:
+                conn = DBConnection(connect_string, username, password, cursor_cache_size)
+                logger.info('Established DB connection to {}@{} as "{}"'.format(username, connect_string, name))
+                return conn
+
+            # Create a new pool, opening pool_min_size connections upfront
+            try:
+                _pools[name] = ConnectionPool(
+                    connect,
+                    min_size=int(db_conf['pool_min_size', 0]),
+                    max_size=int(db_conf['pool_max_size', DEFAULT_POOL_MAX_SIZE]),
+                    max_idle_time=float(db_conf['pool_max_idle_time', DEFAULT_POOL_MAX_IDLE_TIME]),
+                    validation_interval=float(db_conf['pool_validation_interval', DEFAULT_POOL_VALIDATION_INTERVAL]),
+                    timeout=None if db_conf['pool_timeout', None] is None else float(db_conf['pool_timeout']))
+            except (TypeError, ValueError, DatabaseError) as e:
+                raise errors.ConfigError('Invalid pool settings for database connection "{}": {}'.format(name, e))
+        return _pools[name]
+
+
+def get_db_pool_stats() -> dict:
+    """Return the statistics of the connection pools created so far, as a dictionary mapping database names to the
+    dictionaries returned by ConnectionPool.get_stats()."""
+    with _connection_lock:
+        pools = dict(_pools)
+    return {name: pool.get_stats() for name, pool in pools.items()}
+
+
+@contextmanager
+def db_connection(name: str, writes: bool=False):
+    """Context manager borrowing a connection from the pool of the database by its name for the duration of the block.
+    If the current thread already holds a connection to the database, that same connection is used. A connection the
+    block leaves with uncommitted changes (see DBConnection.pending_writes) is kept until the end of the enclosing
+    db_connection_scope(), if any, so that the changes are neither committed by another thread nor lost to idle
+    eviction.
+    :param name Name of the database connection as defined in the configuration.
+    :param writes Whether the block (potentially) modifies the database. If True, the cached query results of the
+        database are invalidated once the block is exited.
+    """
+    pool = get_db_pool(name)
+    try:
+        with pool.connection() as conn:
+            yield conn
+            held = getattr(_thread_data, 'db_connections', None)
+            if conn.pending_writes and held is not None and name not in held:
+                held[name] = pool, pool.acquire()
+    finally:
+        if writes:
+            invalidate_query_cache(name)
+
+
+@contextmanager
+def db_connection_scope():
+    """Context manager delimiting the use of database connections by the current thread, e.g. a process or a worker
+    invocation. The connections the thread keeps within the scope, i.e. the ones returned by get_db_connection() and the
+    ones left with uncommitted changes by db_connection(), are checked in once it's exited, after their changes are
+    committed or, if the scope is exited with an exception, rolled back.
+    """
+    outer = getattr(_thread_data, 'db_connections', None)
+    held = _thread_data.db_connections = {}
+    try:
+        try:
+            yield
+        except BaseException:
+            _release_db_connections(held, False)
+            raise
+        _release_db_connections(held, True)
+    finally:
+        _thread_data.db_connections = outer
+
+
+def _release_db_connections(held: dict, commit: bool):
+    """Check in the connections kept by the current thread, committing or rolling back their pending changes first. A
+    connection failing to do so is discarded, and the first failure to commit is re-raised once all are checked in.
+    :param held: Connections as (pool, connection) tuples, by database name.
+    :param commit: Whether to commit the pending changes rather than roll them back.
+    """
+    error = None
+    for pool, conn in held.values():
+        try:
+            if conn.pending_writes:
+                if commit:
+                    conn.commit()
+                else:
+                    conn.rollback()
+        except Exception as e:
+            pool.release(conn, discard=True)
+            if commit and error is None:
+                error = e
+        else:
+            pool.release(conn)
+    held.clear()
+    if error is not None:
+        raise error
+
+
+def get_query_cache() -> ResultCache:
+    """Return the run-scoped cache of query results."""
+    _check_initialised()
+    return _query_cache
+
+
+def invalidate_query_cache(name: str):
+    """Drop the cached query results of the database by its name, as it's been written to.
+    :param name Name of the database connection as defined in the configuration.
+    """
+    if _query_cache is not None:
+        _query_cache.invalidate(name)
 
 
 def invoke_handler(own_config, external_config=None):
@@ -318,14 +615,123 @@ def invoke_handler(own_config, external_config=None):
     _run_handler(own_config, external_config, None)
 
 
+def log_db_pool_stats():
+    """Log the statistics of the connection pools (in verbose mode only)."""
+    for name, stats in get_db_pool_stats().items():
+        logger.log(
+            'DB connection pool "{}": {created} connections created, {checkouts} checkouts, {waits} waits '
+            '({wait_time:.3f} s), {reconnects} reconnects, {evicted} evicted.'.format(name, **stats))
+
+
+def log_include_cache_stats():
+    """Log the include cache hit and miss counts (in verbose mode only)."""
+    logger.log('Include file cache: {} hits, {} misses.'.format(*_include_cache_stats))
+
+
+def log_query_cache_stats():
+    """Log the query result cache statistics (in verbose mode only), if the cache has been used."""
+    stats = _query_cache.get_stats() if _query_cache is not None else None
+    if stats and stats['hits'] + stats['misses'] > 0:
+        logger.log(
+            'Query result cache: {hits} hits, {misses} misses ({rate:.1%} hit rate), {expired} expired, {evicted} '
+            'evicted, {invalidated} invalidated, {entries} entries ({size} bytes) cached.'.format(
+                rate=stats['hits'] / (stats['hits'] + stats['misses']), **stats))
+
+
+def run_concurrently(
+        func, items, workers: int, ordered: bool=True, max_queued: int=None, max_buffered_size: int=None):
+    """Call the function for each of the items on a bounded pool of worker threads, and yield the results. The log
+    output of every call is buffered and written out as one block when its result is yielded. The first failure is
+    re-raised after the outstanding calls are cancelled, or, if already running, finished.
+    :param func: Function to call, accepting a single item as its argument.
+    :param items: Iterable of items. It's consumed lazily, only a limited number of items is queued at a time.
+    :param workers: Number of worker threads.
+    :param ordered: If True, results (and failures) are yielded in the order of the items; otherwise in the order of
+        completion.
+    :param max_queued: Maximum number of items submitted to the pool and not yet yielded. If None, twice the number of
+        workers is used.
+    :param max_buffered_size: If not None, no further items are submitted while the total len() of the finished, but
+        not yet yielded results reaches this value (the next result to be yielded is always waited for, though).
+    """
+    # Worker threads resolve file names against the current thread's config file stack, and work for the same process
+    config_file_stack = list(_get_config_file_stack())
+    process = profiler.get_current_process()
+    log_prefix = logger.get_prefix()
+
+    def call(item):
+        # Set the thread state up here rather than in an executor initializer, which isn't available before Python 3.7
+        _thread_data.config_file_stack = list(config_file_stack)
+        profiler.set_current_process(process)
+        logger.set_prefix(log_prefix)
+        logger.start_buffering()
+        try:
+            # Connections kept by the call are checked in once it's finished, as the thread may exit afterwards
+            with db_connection_scope():
+                result = func(item)
+            return result, None, logger.stop_buffering()
+        except Exception as e:
+            return None, e, logger.stop_buffering()
+
+    def finish(future):
+        result, exception, output = future.result()
+        logger.flush_buffer(output)
+        if exception is not None:
+            raise exception
+        return result
+
+    def collect():
+        # Wait for the earliest call, or for any call if not ordered, and yield the result(s)
+        if ordered:
+            yield finish(pending.popleft())
+        else:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in [f for f in pending if f in done]:
+                pending.remove(future)
+                yield finish(future)
+
+    def buffered_size():
+        return sum(len(f.result()[0] or ()) for f in pending if f.done())
+
+    if max_queued is None:
+        max_queued = 2 * workers
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    pending = collections.deque()
+    try:
+        for item in items:
+            # Limit the number of queued items and, if required, the size of the buffered results
+            while len(pending) >= max_queued or \
+                    (max_buffered_size is not None and pending and buffered_size() >= max_buffered_size):
+                yield from collect()
+            pending.append(executor.submit(call, item))
+
+        # Collect the remaining results
+        while pending:
+            yield from collect()
+    finally:
+        # Cancel any outstanding calls and wait for the running ones, keeping their log output
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+        for future in pending:
+            if not future.cancelled():
+                logger.flush_buffer(future.result()[2])
+
+
 def teardown():
     """Cleanup procedure for the module."""
-    global _config, _connections, _globals, _config_file_stack
+    global _config, _pools, _globals, _config_file_stack, _query_cache
+    # Drop cached handlers, include files and query results
+    _handler_classes.clear()
+    _handler_instances.clear()
+    clear_include_cache()
+    _include_cache_stats[:] = [0, 0]
+    _query_cache = None
     # If context has been initialised
     if _config is not None:
-        # Delete all created DB connection
-        del _connections
-        _connections = {}
+        # Close all created DB connections
+        for pool in _pools.values():
+            pool.close()
+        _pools = {}
         # Drop the config
         _config = None
         _globals = {}
@@ -1,42 +1,219 @@
 """
 Declares an Bulk DB array inserter class.
 """
+import queue
+import sys
+import threading
+import time
 from . import connection
 
 
+class AdaptiveBatchSize(object):
+    """Tunes the batch size by measuring the insert throughput. Starting with the initial size, the size is multiplied
+    by growth_factor as long as that improves the throughput (rows per second) by at least min_improvement, and then
+    settles at the best size found.
+    """
+
+    growth_factor = 2
+    """Factor the size is multiplied by at each step."""
+
+    min_improvement = 0.05
+    """Minimum relative throughput improvement for a step to be considered successful."""
+
+    samples = 2
+    """Number of batches measured at each step."""
+
+    def __init__(self, initial: int, minimum: int, maximum: int):
+        """Constructor.
+        :param initial: Initial batch size.
+        :param minimum: Minimum batch size.
+        :param maximum: Maximum batch size.
+        """
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.size    = min(max(initial, minimum), self.maximum)
+        self.settled = False
+        self._best_size       = self.size
+        self._best_throughput = 0.0
+        self._rows  = 0
+        self._time  = 0.0
+        self._count = 0
+
+    def limit(self, maximum: int):
+        """Lower the maximum batch size, e.g. to stay within a memory limit.
+        :param maximum: New maximum size; it's never lowered below the minimum one.
+        """
+        self.maximum    = max(self.minimum, min(self.maximum, maximum))
+        self.size       = min(self.size, self.maximum)
+        self._best_size = min(self._best_size, self.maximum)
+
+    def record(self, rows: int, seconds: float):
+        """Record the time taken to insert a batch. Batches smaller than the current size are ignored.
+        :param rows: Number of rows in the batch.
+        :param seconds: Time the insert took.
+        """
+        if self.settled or rows < self.size:
+            return
+        self._rows  += rows
+        self._time  += seconds
+        self._count += 1
+        if self._count < self.samples:
+            return
+        throughput = self._rows / max(self._time, 1e-9)
+        self._rows, self._time, self._count = 0, 0.0, 0
+
+        # Grow further if the throughput has improved enough, otherwise go back to the best size
+        if throughput > self._best_throughput * (1 + self.min_improvement):
+            self._best_size       = self.size
+            self._best_throughput = throughput
+            if self.size >= self.maximum:
+                self.settled = True
+            else:
+                self.size = min(self.size * self.growth_factor, self.maximum)
+        else:
+            self.size    = self._best_size
+            self.settled = True
+
+
 class DBArrayInserter(object):
-    """Bulk DB array inserter class. Allows for performing massive inserts in the most efficient manner."""
+    """Bulk DB array inserter class. Allows for performing massive inserts in the most efficient manner.
+
+    In background mode, full batches of rows are handed over to a writer thread through a bounded queue, so that the
+    caller can fill the next batch while the previous one is being inserted. An error raised by the writer is re-raised
+    by the next push_row() or flush() call.
+    """
 
     insert_bind_array_size = 100
-    """Number of records inserted at once."""
+    """Number of records inserted at once, by default."""
+
+    adaptive_initial_size = 500
+    """Initial number of records inserted at once, in adaptive mode."""
+
+    adaptive_max_size = 50000
+    """Maximum number of records inserted at once, in adaptive mode."""
+
+    adaptive_max_bytes = 32 * 1024 * 1024
+    """Approximate maximum memory taken by a batch, in bytes, in adaptive mode."""
 
     def __init__(
             self, db_connection: connection.DBConnection, statement: str, input_sizes: list,
-            commit_on_flush: bool=False):
+            commit_on_flush: bool=False, background: bool=False, max_queued_batches: int=1, batch_size: int=None,
+            adaptive: bool=False):
         """Constructor.
 
         :param db_connection: Connection to use
         :param statement: The insert statement to use
         :param input_sizes: List specifying data types of the inserted data
         :param commit_on_flush: Whether to commit the changes on each flush
+        :param background: Whether to insert the batches on a background writer thread
+        :param max_queued_batches: Maximum number of full batches waiting for the writer thread, in background mode.
+            When reached, push_row() blocks until the writer catches up
+        :param batch_size: Number of records inserted at once. If None, insert_bind_array_size is used, or
+            adaptive_initial_size in adaptive mode
+        :param adaptive: Whether to tune the batch size by measuring the insert throughput, within adaptive_max_size
+            records and adaptive_max_bytes of memory
         """
         self._connection      = db_connection
         self._statement       = statement
         self._commit_on_flush = commit_on_flush
+        self._row_data       = []
+        self._error          = None
+        self._discard        = False
+        self._queue          = None
+        self._writer         = None
+        self._cursor         = None
+        self._sizer          = None
+        self._memory_limited = False
+
+        # Set up the batch size
+        if adaptive:
+            self._sizer = AdaptiveBatchSize(
+                batch_size or self.adaptive_initial_size, self.insert_bind_array_size, self.adaptive_max_size)
+            self._batch_size = self._sizer.size
+        else:
+            self._batch_size = batch_size or self.insert_bind_array_size
         # Create and set up a cursor
-        self._cursor = self._connection.cursor(array_bind_size=self.insert_bind_array_size, input_sizes=input_sizes)
-        self._row_data = []
+        self._cursor = self._connection.cursor(array_bind_size=self._batch_size, input_sizes=input_sizes)
+
+        # Start the writer thread, if needed
+        if background:
+            self._queue = queue.Queue(max_queued_batches)
+            self._writer = threading.Thread(target=self._write_batches, name='DBArrayInserter writer', daemon=True)
+            self._writer.start()
 
     def __del__(self):
         """Destructor. Destroys the insert statement."""
-        self._cursor.close()
+        self.close()
+
+    @property
+    def batch_size(self) -> int:
+        """Current number of records inserted at once."""
+        return self._batch_size
+
+    def _check_error(self):
+        """Re-raise the error raised by the writer thread, if any."""
+        if self._error is not None:
+            raise self._error
+
+    def _insert(self, row_data: list):
+        """Execute the insert statement with the given rows, and commit the result if required. In adaptive mode, also
+        measure the insert and update the batch size."""
+        if self._sizer is None:
+            self._cursor.executemany(self._statement, row_data)
+        else:
+            start = time.perf_counter()
+            self._cursor.executemany(self._statement, row_data)
+            self._sizer.record(len(row_data), time.perf_counter() - start)
+            self._batch_size = self._sizer.size
+        if self._commit_on_flush:
+            self._connection.commit()
+
+    def _limit_batch_memory(self):
+        """Lower the maximum batch size in adaptive mode so that a batch takes no more than adaptive_max_bytes, judging
+        by the size of the rows pushed so far."""
+        row_bytes = sum(sys.getsizeof(row) + sum(sys.getsizeof(v) for v in row) for row in self._row_data)
+        self._sizer.limit(self.adaptive_max_bytes * len(self._row_data) // max(row_bytes, 1))
+        self._batch_size = self._sizer.size
+        self._memory_limited = True
+
+    def _write_batches(self):
+        """Writer thread body: insert the queued batches until None is dequeued. Once a batch fails, or the inserter is
+        closed, any further ones are discarded."""
+        while True:
+            row_data = self._queue.get()
+            try:
+                if row_data is None:
+                    return
+                if self._error is None and not self._discard:
+                    self._insert(row_data)
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def close(self):
+        """Stop the writer thread, if any, discarding unflushed rows, and destroy the insert statement."""
+        if self._writer is not None:
+            self._discard = True
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+        if self._cursor is not None:
+            self._cursor.close()
+            self._cursor = None
 
     def flush(self):
-        """Executes the insert statement with all the available row data, and commits the result."""
-        if len(self._row_data) > 0:
-            self._cursor.executemany(self._statement, self._row_data)
-            if self._commit_on_flush:
-                self._connection.commit()
+        """Executes the insert statement with all the available row data, and commits the result. In background mode,
+        waits until all the batches have been inserted."""
+        if self._writer is not None:
+            if len(self._row_data) > 0:
+                self._queue.put(self._row_data)
+                self._row_data = []
+            self._queue.join()
+            self._check_error()
+
+        elif len(self._row_data) > 0:
+            self._insert(self._row_data)
             # Free the data
             self._row_data = []
 
@@ -45,7 +222,16 @@ class DBArrayInserter(object):
 
         :param row Tuple of values for insert.
         """
+        self._check_error()
         self._row_data.append(row)
         # Flush the data as soon as we've hit the array size limit
-        if len(self._row_data) == self.insert_bind_array_size:
-            self.flush()
+        if len(self._row_data) >= self._batch_size:
+            # Estimate the memory limit once the first batch is complete
+            if self._sizer is not None and not self._memory_limited:
+                self._limit_batch_memory()
+            # Hand the batch over to the writer thread and start a new one
+            if self._writer is not None:
+                self._queue.put(self._row_data)
+                self._row_data = []
+            else:
+                self.flush()
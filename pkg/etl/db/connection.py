@@ -2,11 +2,15 @@
 Declares a unified database connection class.
 """
 import abc
+import collections
+from contextlib import contextmanager
 from importlib import import_module
 
 # Static map of driver names to their modules
 DRIVER_MAP = {
-    'oracle': 'etl.db.drivers.oracle'
+    'oracle':     'etl.db.drivers.oracle',
+    'postgresql': 'etl.db.drivers.postgresql',
+    'sqlite':     'etl.db.drivers.sqlite',
 }
 
 
@@ -18,6 +22,9 @@ class DatabaseError(Exception):
 class BaseDriver(object, metaclass=abc.ABCMeta):
     """Abstract base class for database drivers."""
 
+    supports_bulk_load = False
+    """Whether the driver implements bulk_load()."""
+
     def __init__(self, connect_string: str, username: str, password: str):
         """Constructor.
         :param connect_string Driver-dependent string describing connection parameters
@@ -46,6 +53,17 @@ class BaseDriver(object, metaclass=abc.ABCMeta):
     def begin(self):
         """Explicitly begin a new transaction in the database."""
 
+    def bulk_load(self, table_name: str, column_names: list, rows) -> int:
+        """Load rows into the table using the most efficient method the database offers. Only available if
+        supports_bulk_load is True.
+        :param table_name: Name of the target table.
+        :param column_names: Names of the target columns.
+        :param rows: Iterable of rows, each being a sequence of values (strings, numbers or None) for the columns. It's
+            consumed lazily.
+        :return Number of loaded rows.
+        """
+        raise NotImplementedError()
+
     @abc.abstractmethod
     def commit(self):
         """Commit any pending transactions to the database."""
@@ -74,6 +92,42 @@ class BaseDriver(object, metaclass=abc.ABCMeta):
         :param param_id: Unique parameter identifier.
         """
 
+    @abc.abstractmethod
+    def get_truncate_statement(self, table_name: str) -> str:
+        """Return a statement that removes all rows from the table.
+        :param table_name: Name of the table to truncate.
+        """
+
+    def query_cursor(self, arraysize: int, prefetch_rows: int):
+        """Create and return a new cursor for fetching the result of a query incrementally, so that the result set
+        doesn't need to fit in memory. The created cursor must be closed after use. The default implementation creates a
+        regular cursor and sets its arraysize.
+        :param arraysize: Number of rows fetched from the database per round-trip. Optional.
+        :param prefetch_rows: Number of rows returned by the database along with the query execution, if the driver
+            supports it. Optional.
+        """
+        cur = self.cursor(None, None)
+        if arraysize is not None:
+            cur.arraysize = arraysize
+        return cur
+
+    def set_statement_cache_size(self, size: int):
+        """Set the number of prepared statements kept by the driver (or the client library) for the connection, so that
+        executing the same SQL text again skips parsing. The default implementation does nothing, for drivers without
+        such a cache.
+        :param size: Number of statements.
+        """
+
+    def ping(self):
+        """Check the connection is alive, raising an exception if it isn't. The default implementation executes a
+        trivial query."""
+        cur = self.cursor(None, None)
+        try:
+            cur.execute('select 1')
+            cur.fetchall()
+        finally:
+            cur.close()
+
     @abc.abstractmethod
     def rollback(self):
         """Rolls back any pending transactions in the database."""
@@ -84,7 +138,18 @@ class BaseDriver(object, metaclass=abc.ABCMeta):
 
 
 class DBConnection():
-    """Unified database connection class."""
+    """Unified database connection class.
+
+    Cursors used by execute() and query_value() are kept open in a bounded per-connection cache keyed by SQL text, so
+    that executing the same statement again reuses the cursor, along with the statement prepared by the database. The
+    least recently used cursors are closed once the cache is full.
+
+    Statements run with execute(), cursor() or bulk_load() are taken as (potentially) modifying the database, and the
+    connection reports pending_writes until the next commit() or rollback().
+    """
+
+    DEFAULT_CURSOR_CACHE_SIZE = 20
+    """Number of cursors kept open, by default."""
 
     # Standard data types
     BINARY   = None
@@ -93,12 +158,14 @@ class DBConnection():
     ROWID    = None
     STRING   = None
 
-    def __init__(self, connect_string: str, username: str, password: str):
+    def __init__(self, connect_string: str, username: str, password: str, cursor_cache_size: int=None):
         """Constructor.
         :param connect_string String describing connection parameters in the format:
             '<driver_name>:<driver_specific_configuration>'
         :param username DB user name
         :param password DB password
+        :param cursor_cache_size Number of cursors kept open for repeated statements, which is also the size of the
+            driver's statement cache, if any. 0 disables caching. If None, DEFAULT_CURSOR_CACHE_SIZE is used
         """
         # Parse the connection string
         conn = connect_string.partition(':')
@@ -134,18 +201,111 @@ class DBConnection():
         self.ROWID    = dtmap['ROWID']
         self.STRING   = dtmap['STRING']
 
+        # Whether the connection may have uncommitted changes
+        self.pending_writes = False
+
+        # Set up the cursor cache
+        self.cursor_cache_size = self.DEFAULT_CURSOR_CACHE_SIZE if cursor_cache_size is None else cursor_cache_size
+        self._cursors = collections.OrderedDict()  # Cached cursors by SQL text, the most recently used last
+        self._cursor_stats = dict.fromkeys(('hits', 'misses', 'evicted'), 0)
+        if self.cursor_cache_size > 0:
+            self._driver.set_statement_cache_size(self.cursor_cache_size)
+
+    @contextmanager
+    def _statement_cursor(self, sql: str):
+        """Context manager providing a cursor for executing the statement: a cached one, if the cursor cache is enabled,
+        otherwise a new one, closed afterwards. A cursor that fails is closed rather than cached.
+        :param sql: SQL text of the statement.
+        """
+        if self.cursor_cache_size <= 0:
+            cur = self._driver.cursor(None, None)
+            try:
+                yield cur
+            finally:
+                cur.close()
+            return
+
+        # Take the cursor out of the cache while it's in use, so that a nested use of the same statement gets another
+        cur = self._cursors.pop(sql, None)
+        if cur is None:
+            self._cursor_stats['misses'] += 1
+            cur = self._driver.cursor(None, None)
+        else:
+            self._cursor_stats['hits'] += 1
+        try:
+            yield cur
+        except BaseException:
+            cur.close()
+            raise
+
+        # Put the cursor back as the most recently used one, closing the least recently used ones over the limit
+        replaced = self._cursors.pop(sql, None)
+        if replaced is not None:
+            replaced.close()
+        self._cursors[sql] = cur
+        while len(self._cursors) > self.cursor_cache_size:
+            self._cursors.popitem(last=False)[1].close()
+            self._cursor_stats['evicted'] += 1
+
+    def clear_cursor_cache(self):
+        """Close all cached cursors."""
+        while self._cursors:
+            self._cursors.popitem()[1].close()
+
+    def get_cursor_cache_stats(self) -> dict:
+        """Return the cursor cache statistics as a dictionary with the following keys:
+            size    -- Number of cached cursors.
+            hits    -- Number of statements executed with a cached cursor.
+            misses  -- Number of statements for which a new cursor was created.
+            evicted -- Number of cursors closed to stay within cursor_cache_size.
+        """
+        return dict(self._cursor_stats, size=len(self._cursors))
+
+    @property
+    def supports_bulk_load(self) -> bool:
+        """Whether the driver supports bulk_load()."""
+        return self._driver.supports_bulk_load
+
     def begin(self):
         """Explicitly begin a new transaction in the database."""
         self._driver.begin()
 
+    def bulk_load(self, table_name: str, column_names: list, rows) -> int:
+        """Load rows into the table using the most efficient method the database offers. Only available if
+        supports_bulk_load is True.
+        :param table_name: Name of the target table.
+        :param column_names: Names of the target columns.
+        :param rows: Iterable of rows, each being a sequence of values for the columns. It's consumed lazily.
+        :return Number of loaded rows.
+        """
+        self.pending_writes = True
+        return self._driver.bulk_load(table_name, column_names, rows)
+
+    def close(self):
+        """Disconnect from the database. The connection can't be used afterwards."""
+        self.clear_cursor_cache()
+        self._driver.disconnect()
+
     def commit(self):
         """Commit any pending transactions to the database."""
         self._driver.commit()
+        self.pending_writes = False
 
     def cursor(self, array_bind_size: int=None, input_sizes: list=None):
         """Create and return a new cursor object. The created cursor must be closed after use."""
+        self.pending_writes = True
         return self._driver.cursor(array_bind_size, input_sizes)
 
+    def query_cursor(self, arraysize: int=None, prefetch_rows: int=None):
+        """Create and return a new cursor for fetching the result of a query incrementally. The created cursor must be
+        closed after use.
+        :param arraysize: Number of rows fetched from the database per round-trip. If None, the driver's default is
+            used.
+        :param prefetch_rows: Number of rows returned by the database along with the query execution, if the driver
+            supports it. If None, the driver's default is used.
+        """
+        return self._driver.query_cursor(arraysize, prefetch_rows)
+
     def get_datetime_expression(self, value, fmt):
         """Return a string to be used as a parameter placeholder for positional binding.
         :param value: String (expression) to be converted into datetime.
@@ -159,24 +319,43 @@ class DBConnection():
         """
         return self._driver.get_param_placeholder(param_id)
 
+    def get_truncate_statement(self, table_name: str) -> str:
+        """Return a statement that removes all rows from the table.
+        :param table_name: Name of the table to truncate.
+        """
+        return self._driver.get_truncate_statement(table_name)
+
     def execute(self, sql: str, params: dict=None):
         """Executes an SQL command against the database."""
-        cur = self.cursor()
-        cur.execute(sql, params if params is not None else [])
-        cur.close()
+        self.pending_writes = True
+        with self._statement_cursor(sql) as cur:
+            cur.execute(sql, params if params is not None else [])
+            # Fetch the result of a query, if any, so that the cached cursor doesn't keep it open
+            if cur.description is not None:
+                cur.fetchall()
 
     def query_value(self, sql: str, params: dict=None):
         """Returns a single value as a result of an SQL query."""
-        cur = self.cursor()
-        cur.execute(sql, params if params is not None else [])
-        v = cur.fetchone()[0]
-        cur.close()
+        with self._statement_cursor(sql) as cur:
+            cur.execute(sql, params if params is not None else [])
+            v = cur.fetchone()[0]
+            # Fetch any remaining rows, so that the cached cursor doesn't keep the query open
+            cur.fetchall()
         return v
 
+    def ping(self) -> bool:
+        """Return whether the connection to the database is alive."""
+        try:
+            self._driver.ping()
+            return True
+        except Exception:
+            return False
+
     def rollback(self):
         """Rolls back any pending transactions in the database."""
         self._driver.rollback()
+        self.pending_writes = False
 
     def version(self):
         """Returns the version of the database."""
-        return self._driver.version
+        return self._driver.version()
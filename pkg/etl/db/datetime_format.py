@@ -0,0 +1,87 @@
+"""
+Conversion of strings in Oracle-style datetime formats (e.g. 'YYYYMMDD' or 'DD.MM.YYYY HH24:MI:SS') into datetime
+values.
+"""
+import datetime
+import functools
+import re
+
+# Oracle-style datetime format elements and their strptime() equivalents, longest first
+FORMAT_MAP = [
+    ('YYYY', '%Y'),
+    ('HH24', '%H'),
+    ('HH12', '%I'),
+    ('MON',  '%b'),
+    ('AM',   '%p'),
+    ('PM',   '%p'),
+    ('YY',   '%y'),
+    ('MM',   '%m'),
+    ('DD',   '%d'),
+    ('HH',   '%I'),
+    ('MI',   '%M'),
+    ('SS',   '%S'),
+]
+
+_re_format = re.compile('|'.join(e for e, _ in FORMAT_MAP), re.IGNORECASE)
+
+
+def strptime_format(fmt: str) -> str:
+    """Translate an Oracle-style datetime format into the strptime() one.
+    :param fmt: Oracle-style datetime format.
+    """
+    elements = dict(FORMAT_MAP)
+    return _re_format.sub(lambda m: elements[m.group(0).upper()], fmt.replace('%', '%%'))
+
+
+@functools.lru_cache()
+def compile_parser(fmt: str):
+    """Compile an Oracle-style datetime format into a function converting strings in that format into datetime values.
+    Formats consisting of fixed-width numeric elements only (YYYY, MM, DD, HH24, MI, SS) and separators are parsed by
+    position; any other formats are handled by strptime().
+    :param fmt: Oracle-style datetime format, e.g. 'YYYYMMDD' or 'DD.MM.YYYY HH24:MI:SS'.
+    :return Function accepting a string and returning a datetime.datetime object. It raises ValueError if the string
+        doesn't match the format.
+    """
+    # Fixed-width numeric elements and the corresponding datetime() arguments
+    widths = {'YYYY': 4, 'MM': 2, 'DD': 2, 'HH24': 2, 'MI': 2, 'SS': 2}
+    args = ['YYYY', 'MM', 'DD', 'HH24', 'MI', 'SS']
+
+    # Locate the elements in the format
+    slices = {}
+    literals = []
+    pos = 0
+    fmt_pos = 0
+    for m in _re_format.finditer(fmt):
+        element = m.group(0).upper()
+        if element not in widths or element in slices:
+            slices = None
+            break
+        literals.extend((pos + i, c) for i, c in enumerate(fmt[fmt_pos:m.start()]))
+        pos += m.start() - fmt_pos
+        slices[element] = slice(pos, pos + widths[element])
+        pos += widths[element]
+        fmt_pos = m.end()
+
+    # Fall back to strptime() for other formats
+    if slices is None or 'YYYY' not in slices:
+        fmt_strptime = strptime_format(fmt)
+        return lambda value: datetime.datetime.strptime(value, fmt_strptime)
+
+    literals.extend((pos + i, c) for i, c in enumerate(fmt[fmt_pos:]))
+    length = pos + len(fmt) - fmt_pos
+    fields = [slices.get(arg) for arg in args]
+
+    def parse(value: str) -> datetime.datetime:
+        if len(value) != length or any(value[i] != c for i, c in literals):
+            raise ValueError('Value "{}" does not match format "{}"'.format(value, fmt))
+        numbers = []
+        for field in fields:
+            if field is None:
+                numbers.append(1 if len(numbers) < 3 else 0)
+            else:
+                digits = value[field]
+                if not digits.isdigit():
+                    raise ValueError('Value "{}" does not match format "{}"'.format(value, fmt))
+                numbers.append(int(digits))
+        return datetime.datetime(*numbers)
+    return parse
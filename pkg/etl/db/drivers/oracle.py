@@ -31,9 +31,10 @@ class Driver(BaseDriver):
         params = self.connect_string.split(':')
         if len(params) != 3:
             raise DatabaseError('Oracle driver specification must be in format "host:port:sid"')
-        # Create a new connection
+        # Create a new connection. It must be thread-safe, as pooled connections are handed from thread to thread, and
+        # array inserts may run on a background thread
         self._connection = cx_Oracle.connect(
-            self.username, self.password, cx_Oracle.makedsn(params[0], int(params[1]), params[2]))
+            self.username, self.password, cx_Oracle.makedsn(params[0], int(params[1]), params[2]), threaded=True)
 
     def disconnect(self):
         if self._connection is not None:
@@ -54,6 +55,18 @@ class Driver(BaseDriver):
             cur.setinputsizes(*input_sizes)
         return cur
 
+    def set_statement_cache_size(self, size: int):
+        self._connection.stmtcachesize = size
+
+    def query_cursor(self, arraysize: int, prefetch_rows: int):
+        cur = self._connection.cursor()
+        if arraysize is not None:
+            cur.arraysize = arraysize
+        # Prefetching is only configurable as of cx_Oracle 8
+        if prefetch_rows is not None and hasattr(cur, 'prefetchrows'):
+            cur.prefetchrows = prefetch_rows
+        return cur
+
     def datatype_map(self) -> dict:
         return {
             'BINARY':   cx_Oracle.BINARY,
@@ -69,6 +82,12 @@ class Driver(BaseDriver):
     def get_param_placeholder(self, param_id):
         return ':{}'.format(param_id)
 
+    def get_truncate_statement(self, table_name: str) -> str:
+        return 'truncate table {} drop storage'.format(table_name)
+
+    def ping(self):
+        self._connection.ping()
+
     def rollback(self):
         self._connection.rollback()
 
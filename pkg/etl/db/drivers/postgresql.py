@@ -0,0 +1,219 @@
+"""
+PostgreSQL driver implementation.
+
+Dependencies / Configuration Notes
+==================================
+- psycopg2 2.5 or later [ http://initd.org/psycopg/ ]
+
+Connection string
+-----------------
+The driver configuration must be in the format 'host:port:dbname', e.g.:
+
+    postgresql:localhost:5432:warehouse
+
+SQL statements may use Oracle-style named parameter references (':name'), which are translated into the psycopg2 ones.
+
+Bulk load
+---------
+The driver supports bulk_load(), which streams the rows into the table with COPY FROM STDIN in text format.
+
+Query cursors
+-------------
+Cursors returned by query_cursor() are server-side (named) cursors, which fetch the result in chunks of arraysize rows
+rather than all at once. They can only execute a single query. They're declared WITH HOLD, so that the result can still
+be fetched after the transaction is committed, e.g. by a handler invoked for the fetched rows on the same connection.
+"""
+
+import functools
+import itertools
+import re
+import psycopg2
+from etl.db.connection import BaseDriver, DatabaseError
+
+
+class CopyStream(object):
+    """Read-only file-like object producing rows in PostgreSQL COPY text format, to be consumed by copy_expert(). Rows
+    are converted lazily, as the data is read."""
+
+    # Characters that must be escaped in COPY text format
+    ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+    def __init__(self, rows):
+        """Constructor.
+        :param rows: Iterable of rows, each being a sequence of values.
+        """
+        self._rows = iter(rows)
+        self._buffer = ''
+        self.count = 0
+        self.error = None
+
+    @classmethod
+    def format_row(cls, row) -> str:
+        """Return the row as a line in COPY text format.
+        :param row: Sequence of values. None is output as NULL.
+        """
+        return '\t'.join('\\N' if v is None else str(v).translate(cls.ESCAPES) for v in row) + '\n'
+
+    def read(self, size: int=-1) -> str:
+        """Return up to size characters of COPY data, or an empty string once all rows have been read."""
+        try:
+            lines = [self._buffer]
+            length = len(self._buffer)
+            for row in self._rows:
+                line = self.format_row(row)
+                self.count += 1
+                lines.append(line)
+                length += len(line)
+                if 0 <= size <= length:
+                    break
+            data = ''.join(lines)
+        # Keep the error to re-raise it after COPY is aborted
+        except Exception as e:
+            self.error = e
+            raise
+        if 0 <= size < len(data):
+            self._buffer = data[size:]
+            return data[:size]
+        self._buffer = ''
+        return data
+
+
+class Cursor(object):
+    """Cursor wrapper translating Oracle-style named parameter references (':name') into the psycopg2 ones."""
+
+    _re_param = re.compile(r"('(?:[^']|'')*')|(?<![:\w]):(\w+)|%s?")
+
+    def __init__(self, cursor):
+        """Constructor.
+        :param cursor: psycopg2 cursor to wrap.
+        """
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @classmethod
+    @functools.lru_cache(maxsize=256)
+    def translate(cls, sql: str, named: bool=True) -> str:
+        """Translate parameter references in the statement, leaving string literals and casts ('::type') alone, and
+        escape any other '%' characters, as psycopg2 interprets them whenever parameters are given.
+        :param sql: SQL statement.
+        :param named: Whether the parameters are named (':name' references are translated), or positional ('%s'
+            placeholders are kept).
+        """
+        def replace(m):
+            if m.group(1) is not None:
+                return m.group(1).replace('%', '%%')
+            if m.group(2) is not None:
+                return '%({})s'.format(m.group(2)) if named else m.group(0)
+            if m.group(0) == '%s' and not named:
+                return m.group(0)
+            return m.group(0).replace('%', '%%')
+        return cls._re_param.sub(replace, sql)
+
+    def execute(self, sql: str, params=None):
+        # Parameters, even empty ones, make psycopg2 interpret the statement, so it must be translated then
+        if params is not None:
+            sql = self.translate(sql, isinstance(params, dict))
+        return self._cursor.execute(sql, params)
+
+    def executemany(self, sql: str, seq_of_params):
+        # Named parameters need translation, judging by the first parameter set
+        seq_of_params = seq_of_params if isinstance(seq_of_params, list) else list(seq_of_params)
+        if seq_of_params:
+            sql = self.translate(sql, isinstance(seq_of_params[0], dict))
+        return self._cursor.executemany(sql, seq_of_params)
+
+
+class Driver(BaseDriver):
+    """PostgreSQL driver implementation."""
+
+    supports_bulk_load = True
+
+    # Size of data chunks sent to the server by COPY, in characters
+    COPY_BUFFER_SIZE = 65536
+
+    # Number of rows fetched per round-trip by query cursors, by default
+    QUERY_ARRAYSIZE = 2000
+
+    # Sequence of query cursor numbers, to give the cursors unique names
+    _cursor_ids = itertools.count(1)
+
+    def __init__(self, connect_string: str, username: str, password: str):
+        self._connection = None
+        super().__init__(connect_string, username, password)
+
+    def connect(self):
+        # Parse and check connection string
+        params = self.connect_string.split(':')
+        if len(params) != 3:
+            raise DatabaseError('PostgreSQL driver specification must be in format "host:port:dbname"')
+        # Create a new connection
+        self._connection = psycopg2.connect(
+            host=params[0], port=int(params[1]), dbname=params[2], user=self.username, password=self.password)
+
+    def disconnect(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def begin(self):
+        # psycopg2 starts a transaction implicitly with the first statement
+        pass
+
+    def bulk_load(self, table_name: str, column_names: list, rows) -> int:
+        stream = CopyStream(rows)
+        cur = self._connection.cursor()
+        try:
+            cur.copy_expert(
+                'copy {}({}) from stdin'.format(table_name, ', '.join(column_names)), stream, self.COPY_BUFFER_SIZE)
+        except Exception:
+            # If the rows failed to convert, report that error rather than the aborted COPY
+            if stream.error is not None:
+                raise stream.error
+            raise
+        finally:
+            cur.close()
+        return stream.count
+
+    def commit(self):
+        self._connection.commit()
+
+    def cursor(self, array_bind_size: int, input_sizes: list):
+        cur = self._connection.cursor()
+        if array_bind_size is not None:
+            cur.arraysize = array_bind_size
+        return Cursor(cur)
+
+    def query_cursor(self, arraysize: int, prefetch_rows: int):
+        cur = self._connection.cursor(name='rattle_query_{}'.format(next(self._cursor_ids)), withhold=True)
+        # Iteration fetches itersize rows at a time, fetchmany() arraysize rows
+        cur.itersize = cur.arraysize = arraysize or self.QUERY_ARRAYSIZE
+        return Cursor(cur)
+
+    def datatype_map(self) -> dict:
+        return {
+            'BINARY':   psycopg2.BINARY,
+            'DATETIME': psycopg2.DATETIME,
+            'NUMBER':   psycopg2.NUMBER,
+            'ROWID':    psycopg2.ROWID,
+            'STRING':   psycopg2.STRING,
+        }
+
+    def get_datetime_expression(self, value, fmt):
+        return "To_Timestamp({}, {})".format(value, fmt)
+
+    def get_param_placeholder(self, param_id):
+        return '%s'
+
+    def get_truncate_statement(self, table_name: str) -> str:
+        return 'truncate table {}'.format(table_name)
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def version(self) -> str:
+        return str(self._connection.server_version)
@@ -0,0 +1,176 @@
+"""
+SQLite driver implementation.
+
+Dependencies / Configuration Notes
+==================================
+The driver relies on the sqlite3 module of the Python standard library, so no additional software is required.
+
+Connection string
+-----------------
+The driver configuration is the database file name, optionally followed by PRAGMA settings separated by semicolons,
+e.g.:
+
+    sqlite:/var/lib/rattle/staging.db
+    sqlite:staging.db;synchronous=OFF;cache_size=-262144
+    sqlite::memory:
+
+Username and password are ignored. The database is set up for bulk loading by default: write-ahead logging, normal
+synchronisation, temporary storage in memory and a 64 MiB page cache. Any of these can be overridden in the connection
+string.
+
+As with Oracle, a transaction is started implicitly by the first data modification statement and lasts until commit or
+rollback, so bulk inserts are only written once per transaction.
+"""
+
+import datetime
+import functools
+import sqlite3
+import sys
+from etl.db import datetime_format
+from etl.db.connection import BaseDriver, DatabaseError
+
+
+
+class Cursor(object):
+    """Cursor wrapper binding datetime values in the SQLite datetime format ('YYYY-MM-DD HH:MM:SS'). The conversion is
+    done here rather than with sqlite3.register_adapter(), which would affect every SQLite connection of the process."""
+
+    def __init__(self, cursor):
+        """Constructor.
+        :param cursor: sqlite3 cursor to wrap.
+        """
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @property
+    def arraysize(self) -> int:
+        return self._cursor.arraysize
+
+    @arraysize.setter
+    def arraysize(self, value: int):
+        self._cursor.arraysize = value
+
+    @staticmethod
+    def adapt(params):
+        """Return the parameters with datetime values converted into strings, or the parameters themselves if there are
+        no such values.
+        :param params: Sequence or dictionary of parameter values.
+        """
+        values = params.values() if isinstance(params, dict) else params
+        if not any(isinstance(value, datetime.datetime) for value in values):
+            return params
+        if isinstance(params, dict):
+            return {k: v.isoformat(' ') if isinstance(v, datetime.datetime) else v for k, v in params.items()}
+        return [v.isoformat(' ') if isinstance(v, datetime.datetime) else v for v in params]
+
+    def execute(self, sql: str, params=()):
+        return self._cursor.execute(sql, self.adapt(params))
+
+    def executemany(self, sql: str, seq_of_params):
+        return self._cursor.executemany(sql, map(self.adapt, seq_of_params))
+
+
+class Driver(BaseDriver):
+    """SQLite driver implementation."""
+
+    # PRAGMA settings applied unless overridden in the connection string
+    DEFAULT_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous':  'NORMAL',
+        'temp_store':   'MEMORY',
+        'cache_size':   '-65536',
+    }
+
+    def __init__(self, connect_string: str, username: str, password: str):
+        self._connection = None
+        super().__init__(connect_string, username, password)
+
+    def connect(self):
+        # Parse the connection string
+        file_name, *settings = self.connect_string.split(';')
+        if file_name == '':
+            raise DatabaseError('SQLite driver specification must be in format "file_name[;pragma=value...]"')
+        pragmas = dict(self.DEFAULT_PRAGMAS)
+        for setting in settings:
+            name, sep, value = setting.partition('=')
+            if sep != '=' or not name.strip().isidentifier():
+                raise DatabaseError('Invalid SQLite setting: "{}", must be in format "pragma=value"'.format(setting))
+            pragmas[name.strip()] = value.strip()
+
+        # Create a new connection. It can be shared between processes running in parallel
+        self._connection = sqlite3.connect(file_name, check_same_thread=False)
+        # Deterministic functions can be used in indexes and optimised by SQLite; the flag requires Python 3.8
+        if sys.version_info >= (3, 8):
+            self._connection.create_function('to_date', 2, self.to_date, deterministic=True)
+        else:
+            self._connection.create_function('to_date', 2, self.to_date)
+        for name, value in pragmas.items():
+            self._connection.execute('pragma {}={}'.format(name, value))
+
+    def disconnect(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def begin(self):
+        if not self._connection.in_transaction:
+            self._connection.execute('begin')
+
+    def commit(self):
+        self._connection.commit()
+
+    def cursor(self, array_bind_size: int, input_sizes: list):
+        cur = self._connection.cursor()
+        if array_bind_size is not None:
+            cur.arraysize = array_bind_size
+        return Cursor(cur)
+
+    def datatype_map(self) -> dict:
+        return {
+            'BINARY':   bytes,
+            'DATETIME': datetime.datetime,
+            'NUMBER':   float,
+            'ROWID':    int,
+            'STRING':   str,
+        }
+
+    def get_datetime_expression(self, value, fmt):
+        return "to_date({}, {})".format(value, fmt)
+
+    def get_param_placeholder(self, param_id):
+        return '?'
+
+    def get_truncate_statement(self, table_name: str) -> str:
+        return 'delete from {}'.format(table_name)
+
+    def rollback(self):
+        self._connection.rollback()
+
+    @classmethod
+    @functools.lru_cache()
+    def compile_date_parser(cls, fmt: str):
+        """Compile an Oracle-style datetime format into a function converting strings in that format into SQLite
+        datetime values ('YYYY-MM-DD HH:MM:SS').
+        :param fmt: Oracle-style datetime format, e.g. 'YYYYMMDD' or 'DD.MM.YYYY HH24:MI:SS'.
+        """
+        parse = datetime_format.compile_parser(fmt)
+        return lambda value: parse(value).isoformat(' ')
+
+    @classmethod
+    def to_date(cls, value: str, fmt: str) -> str:
+        """Convert a string in the given Oracle-style format into an SQLite datetime value ('YYYY-MM-DD HH:MM:SS').
+        Registered with the connection as the SQL function to_date().
+        :param value: String to convert.
+        :param fmt: Format the value is in, e.g. 'YYYYMMDD' or 'DD.MM.YYYY HH24:MI:SS'.
+        """
+        if value is None:
+            return None
+        return cls.compile_date_parser(fmt)(value)
+
+    def version(self) -> str:
+        return sqlite3.sqlite_version
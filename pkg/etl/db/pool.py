@@ -0,0 +1,214 @@
+"""
+Declares a pool of database connections.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from etl.db.connection import DatabaseError
+
+
+class ConnectionPool(object):
+    """Thread-safe pool of connections to a single database. Connections are checked out with acquire() and checked in
+    with release(), or borrowed for a block of code with connection().
+
+    A thread already holding a connection gets the same connection when acquiring again, so nested handlers share the
+    connection (and its transaction); it's checked in once released as many times as acquired. Idle connections are
+    handed out most recently used first, so that sequential work keeps using the same session, and connections idle for
+    too long are closed.
+    """
+
+    def __init__(
+            self, factory, min_size: int=0, max_size: int=None, max_idle_time: float=None,
+            validation_interval: float=0.0, timeout: float=None):
+        """Constructor.
+        :param factory: Function creating a new connection (DBConnection) to the database.
+        :param min_size: Number of connections to create upfront and to keep open when evicting idle ones.
+        :param max_size: Maximum number of open connections. If None, the number is unlimited.
+        :param max_idle_time: Time in seconds after which an idle connection is closed. If None, connections are kept
+            open until the pool is closed.
+        :param validation_interval: Time in seconds a connection has to be idle for to be validated with ping() before
+            it's handed out. A connection failing the validation is transparently replaced with a new one.
+        :param timeout: Maximum time in seconds to wait for a connection when all max_size connections are in use. If
+            None, wait indefinitely.
+        """
+        if max_size is not None and max_size < max(min_size, 1):
+            raise DatabaseError(
+                'Maximum pool size ({}) must be at least 1 and no less than the minimum size ({})'.format(
+                    max_size, min_size))
+        self.factory             = factory
+        self.min_size            = min_size
+        self.max_size            = max_size
+        self.max_idle_time       = max_idle_time
+        self.validation_interval = validation_interval
+        self.timeout             = timeout
+        self._cond   = threading.Condition()
+        self._idle   = []  # Idle connections as [connection, time of check-in] lists, the most recently used last
+        self._held   = {}  # Checked out connections as [connection, number of acquisitions] lists, by thread ident
+        self._size   = 0   # Number of open connections, including the ones being created
+        self._closed = False
+        self._stats  = dict.fromkeys(('created', 'checkouts', 'waits', 'reconnects', 'evicted'), 0)
+        self._stats['wait_time'] = 0.0
+
+        # Open the minimum number of connections
+        for _ in range(min_size):
+            self._size += 1
+            self._idle.append([self._create(), time.monotonic()])
+
+    def _create(self):
+        """Create a new connection, updating the pool size accordingly if it fails."""
+        try:
+            conn = self.factory()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats['created'] += 1
+        return conn
+
+    def _take_expired(self, now: float) -> list:
+        """Remove the connections idle for longer than max_idle_time from the pool, keeping at least min_size
+        connections open, and return them. Must be called with the lock held.
+        """
+        expired = []
+        if self.max_idle_time is not None:
+            while self._idle and self._size > self.min_size and now - self._idle[0][1] >= self.max_idle_time:
+                expired.append(self._idle.pop(0)[0])
+                self._size -= 1
+            self._stats['evicted'] += len(expired)
+        return expired
+
+    @staticmethod
+    def _close(connections):
+        """Close the given connections, ignoring any errors."""
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def acquire(self):
+        """Check out a connection for the current thread, waiting for one if all max_size connections are in use.
+        :return DBConnection object, which must be checked in with release() after use.
+        """
+        ident = threading.get_ident()
+        with self._cond:
+            if self._closed:
+                raise DatabaseError('Connection pool is closed')
+
+            # Hand out the connection the thread already holds, if any
+            held = self._held.get(ident)
+            if held is not None:
+                held[1] += 1
+                self._stats['checkouts'] += 1
+                return held[0]
+
+            # Wait for an idle connection if the pool is exhausted
+            now = time.monotonic()
+            expired = self._take_expired(now)
+            if not self._idle and self.max_size is not None and self._size >= self.max_size:
+                self._stats['waits'] += 1
+                deadline = None if self.timeout is None else now + self.timeout
+                while not self._idle and self._size >= self.max_size:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self._stats['wait_time'] += time.monotonic() - now
+                        raise DatabaseError('Timed out waiting for a database connection after {} s'.format(
+                            self.timeout))
+                    self._cond.wait(remaining)
+                    if self._closed:
+                        raise DatabaseError('Connection pool is closed')
+                self._stats['wait_time'] += time.monotonic() - now
+
+            # Take the most recently used idle connection, or reserve a slot for a new one
+            if self._idle:
+                conn, idle_since = self._idle.pop()
+            else:
+                conn, idle_since = None, None
+                self._size += 1
+        self._close(expired)
+
+        # Validate the connection if it's been idle long enough, and replace it if it's dead
+        if conn is not None and time.monotonic() - idle_since >= self.validation_interval and not conn.ping():
+            self._close([conn])
+            conn = None
+            with self._cond:
+                self._stats['reconnects'] += 1
+        if conn is None:
+            conn = self._create()
+
+        with self._cond:
+            self._held[ident] = [conn, 1]
+            self._stats['checkouts'] += 1
+        return conn
+
+    def release(self, conn, discard: bool=False):
+        """Check in a connection acquired by the current thread.
+        :param conn: Connection returned by acquire().
+        :param discard: Whether to close the connection instead of keeping it for reuse, e.g. because it's broken.
+        """
+        ident = threading.get_ident()
+        with self._cond:
+            held = self._held.get(ident)
+            if held is None or held[0] is not conn:
+                raise DatabaseError('The connection is not checked out by the current thread')
+            held[1] -= 1
+            if held[1] > 0:
+                return
+            del self._held[ident]
+            if discard or self._closed:
+                self._size -= 1
+                expired = [conn]
+            else:
+                now = time.monotonic()
+                self._idle.append([conn, now])
+                expired = self._take_expired(now)
+            self._cond.notify()
+        self._close(expired)
+
+    @contextmanager
+    def connection(self):
+        """Context manager checking out a connection for the duration of the block. If the block raises an exception,
+        any pending transaction is rolled back (or, failing that, the connection is discarded) so that it doesn't affect
+        the next borrower.
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+        except BaseException:
+            discard = False
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+            self.release(conn, discard)
+            raise
+        self.release(conn)
+
+    def close(self):
+        """Close all connections, including the checked out ones, and refuse any further requests."""
+        with self._cond:
+            self._closed = True
+            connections = [c for c, _ in self._idle] + [c for c, _ in self._held.values()]
+            self._idle.clear()
+            self._held.clear()
+            self._size = 0
+            self._cond.notify_all()
+        self._close(connections)
+
+    def get_stats(self) -> dict:
+        """Return the pool statistics as a dictionary with the following keys:
+            size       -- Number of open connections.
+            in_use     -- Number of checked out connections.
+            idle       -- Number of idle connections.
+            created    -- Number of connections created.
+            checkouts  -- Number of successful acquire() calls.
+            waits      -- Number of acquire() calls that had to wait for a connection.
+            wait_time  -- Total time in seconds spent waiting for connections.
+            reconnects -- Number of dead connections replaced.
+            evicted    -- Number of connections closed for being idle for too long.
+        """
+        with self._cond:
+            stats = dict(self._stats, size=self._size, in_use=len(self._held), idle=len(self._idle))
+        return stats
@@ -0,0 +1,112 @@
+"""
+Declares a cache of query results.
+"""
+import collections
+import threading
+import time
+
+
+class ResultCache(object):
+    """Thread-safe cache of query results, keyed by database name and any hashable value identifying the query, such as
+    a tuple of the SQL text and parameter values.
+
+    Entries expire after their time-to-live, and the least recently used ones are evicted once the total size of the
+    cached values exceeds the limit. Writing to a database must be followed by invalidate(), which drops all the entries
+    of that database; a result fetched before the invalidation is then discarded rather than cached, as it may be stale.
+    """
+
+    def __init__(self, max_size: int, ttl: float=None):
+        """Constructor.
+        :param max_size: Maximum total size of the cached values, in bytes (as counted by the caller).
+        :param ttl: Default time in seconds after which an entry expires. If None, entries don't expire.
+        """
+        self.max_size = max_size
+        self.ttl      = ttl
+        self._lock        = threading.Lock()
+        self._entries     = collections.OrderedDict()  # {(db_name, key): [value, size, expiry time]}, most recent last
+        self._size        = 0   # Total size of the cached values
+        self._generations = {}  # Number of invalidations, by database name
+        self._stats       = dict.fromkeys(('hits', 'misses', 'expired', 'evicted', 'invalidated'), 0)
+
+    def _remove(self, entry_key) -> list:
+        """Remove the entry from the cache and return it. Must be called with the lock held."""
+        entry = self._entries.pop(entry_key)
+        self._size -= entry[1]
+        return entry
+
+    def generation(self, db_name: str) -> int:
+        """Return the current generation of the database's entries, to be passed to put() along with the result of a
+        query started afterwards.
+        :param db_name: Name of the database.
+        """
+        with self._lock:
+            return self._generations.get(db_name, 0)
+
+    def get(self, db_name: str, key):
+        """Return the cached value, or None if there's no such entry or it has expired.
+        :param db_name: Name of the database.
+        :param key: Hashable value identifying the query.
+        """
+        with self._lock:
+            entry = self._entries.get((db_name, key))
+            if entry is not None and entry[2] is not None and entry[2] <= time.monotonic():
+                self._remove((db_name, key))
+                self._stats['expired'] += 1
+                entry = None
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end((db_name, key))
+            self._stats['hits'] += 1
+            return entry[0]
+
+    def put(self, db_name: str, key, value, size: int, generation: int, ttl: float=None):
+        """Cache the value, evicting the least recently used entries if needed. The value isn't cached if it's larger
+        than max_size, or if the database has been invalidated since the generation was obtained.
+        :param db_name: Name of the database.
+        :param key: Hashable value identifying the query.
+        :param value: Value to cache (not None).
+        :param size: Size of the value, in bytes.
+        :param generation: Value returned by generation() before the query was started.
+        :param ttl: Time in seconds after which the entry expires. If None, the cache's default is used.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            if size > self.max_size or self._generations.get(db_name, 0) != generation:
+                return
+            if (db_name, key) in self._entries:
+                self._remove((db_name, key))
+            while self._size + size > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self._stats['evicted'] += 1
+            self._entries[(db_name, key)] = [value, size, None if ttl is None else time.monotonic() + ttl]
+            self._size += size
+
+    def invalidate(self, db_name: str):
+        """Drop all the entries of the database, as well as any results of the queries still running.
+        :param db_name: Name of the database.
+        """
+        with self._lock:
+            self._generations[db_name] = self._generations.get(db_name, 0) + 1
+            for entry_key in [k for k in self._entries if k[0] == db_name]:
+                self._remove(entry_key)
+                self._stats['invalidated'] += 1
+
+    def clear(self):
+        """Drop all the entries."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def get_stats(self) -> dict:
+        """Return the cache statistics as a dictionary with the following keys:
+            entries     -- Number of cached entries.
+            size        -- Total size of the cached values, in bytes.
+            hits        -- Number of get() calls that found a value.
+            misses      -- Number of get() calls that didn't find a value (including expired ones).
+            expired     -- Number of entries dropped for having expired.
+            evicted     -- Number of entries dropped to stay within max_size.
+            invalidated -- Number of entries dropped by invalidate().
+        """
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), size=self._size)
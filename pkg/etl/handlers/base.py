@@ -3,11 +3,61 @@ Introduces the base handler class.
 """
 
 import abc
+from etl import errors
+
+
+class LineStream(object):
+    """Lazy, single-pass sequence of text lines, each one including its terminating linebreak (if any). A handler can
+    return a LineStream instead of a string as a parameter value to avoid keeping the whole text in memory; the stream
+    is then equivalent to the string obtained by concatenating all its lines.
+    """
+
+    def __init__(self, lines):
+        """Constructor.
+        :param lines: Iterable (typically a generator) yielding lines of text.
+        """
+        self._lines = lines
+
+    @property
+    def consumed(self) -> bool:
+        """Whether the stream has already been consumed."""
+        return self._lines is None
+
+    def __iter__(self):
+        """Return an iterator over the lines. Can only be called once, as the lines aren't retained."""
+        if self._lines is None:
+            raise errors.LogicError('The line stream has already been consumed.')
+        lines, self._lines = self._lines, None
+        return iter(lines)
+
+    def read(self) -> str:
+        """Consume the stream and return its entire content as a single string."""
+        return ''.join(self)
+
+
+def materialise(params: dict) -> dict:
+    """Replace all unconsumed LineStream values in the given dictionary with the strings they represent, in place.
+    Consumed streams are left intact, so that reading them still results in an error.
+    :param params: Dictionary of parameters to process.
+    :return Dictionary of the replaced values.
+    """
+    strings = {
+        key: value.read() for key, value in params.items() if isinstance(value, LineStream) and not value.consumed}
+    params.update(strings)
+    return strings
 
 
 class Handler(object, metaclass=abc.ABCMeta):
     """The base abstract handler class."""
 
+    streaming = False
+    """Whether the handler accepts LineStream parameter values. If False, any such values are converted into strings
+    before the handler is run."""
+
+    reusable = False
+    """Whether a single handler instance can be run repeatedly, i.e. the handler keeps no state between runs. If True,
+    the instance is created once per configuration node and reused for all its invocations."""
+
     @abc.abstractmethod
     def run(self, config):
         """The main worker routine of the handler. Returns a list of results, if any, otherwise None. Must be overridden
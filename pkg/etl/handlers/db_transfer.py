@@ -0,0 +1,182 @@
+import itertools
+import time
+from etl.db.array_inserter import DBArrayInserter
+from etl import errors
+from etl import logger
+from etl import profiler
+from etl import context
+from etl.handlers import base
+from etl.handlers import db_uploader
+from etl.handlers import sql_query
+
+
+class Handler(base.Handler):
+    """Allows to copy the result of an SQL query from one database into a table of another one. The rows are fetched in
+    batches and inserted with their native types, without converting them into text and back. By default, the batches
+    are inserted on a background thread, while the next ones are being fetched. If the target database driver supports
+    bulk loading, the rows are bulk loaded instead.
+
+    Relevant configuration entries:
+        source_database -- Name of the source database connection. Can refer to handler's own configuration parameters
+                           in the form '{name}'.
+        sql             -- SQL query fetching the source rows. May contain parameter references in the form ':name'.
+        params          -- Array of parameter definitions. Optional. Each element is an object consisting of:
+            name            -- Parameter name.
+            value           -- Parameter value. Can refer to handler's own configuration parameters in the form
+                               '{name}'.
+        target_database -- Name of the target database connection. Can refer to handler's own configuration parameters
+                           in the form '{name}'.
+        target_table    -- Name of the target table, possibly with schema name before it.
+        target_columns  -- Array of target column names, one per column of the query result. Optional, by default the
+                           column names of the query result are used.
+        truncate_target -- Boolean, whether or not to truncate the target table before the transfer. Optional, False by
+                           default.
+        background_insert
+                        -- Boolean, whether to insert batches of rows on a background thread, so that the next batch is
+                           fetched while the previous one is being inserted. Optional, True by default.
+        batch_size      -- Number of rows fetched and inserted at once: a positive integer, or 'auto' to tune the insert
+                           batch size by measuring the insert throughput as the transfer goes. Optional, default is
+                           1000.
+        arraysize       -- Number of rows fetched from the source database per round-trip. Optional, default is
+                           batch_size (or 1000, if batch_size is 'auto').
+        prefetch_rows   -- Number of rows returned by the source database along with the query execution (Oracle
+                           only). Optional, default is the driver's default.
+        commit_every    -- Number of rows after which the changes are committed. Optional, by default the changes are
+                           committed once at the end of the transfer.
+        progress_rows   -- Number of rows after which the progress is logged. Optional, default is 1000000.
+    """
+    reusable = True
+
+    # Number of rows fetched and inserted at once, by default
+    default_batch_size = 1000
+
+    @staticmethod
+    def get_insert_statement(db_conn, target_table: str, col_names: list) -> str:
+        """Create an insert SQL statement for the specified table and columns.
+        :param db_conn: Target connection, providing parameter placeholders.
+        :param target_table: Name of the target table.
+        :param col_names: Names of the target columns.
+        """
+        return 'insert into {}({}) values({})'.format(
+            target_table, ', '.join(col_names),
+            ', '.join(db_conn.get_param_placeholder(idx) for idx in range(1, len(col_names) + 1)))
+
+    def run(self, config):
+        """Override the abstract method of the base class."""
+        # Get attributes from config
+        source_database = config['source_database']
+        sql             = config['sql']
+        params          = config['params', None]
+        target_database = config['target_database']
+        target_table    = config['target_table']
+        target_columns  = config['target_columns', None]
+        truncate_target = bool(config['truncate_target', False])
+        background      = bool(config['background_insert', True])
+        batch_size      = db_uploader.Handler.parse_batch_size(config['batch_size', self.default_batch_size])
+        arraysize       = config['arraysize', None]
+        prefetch_rows   = config['prefetch_rows', None]
+        commit_every    = config['commit_every', None]
+        progress_rows   = int(config['progress_rows', 1000000])
+        if arraysize is None:
+            arraysize = self.default_batch_size if batch_size == 'auto' else batch_size
+        if progress_rows < 1:
+            raise errors.ConfigError('Invalid progress_rows value: {} (must be positive)'.format(progress_rows))
+        if commit_every is not None:
+            commit_every = int(commit_every)
+            if commit_every < 1:
+                raise errors.ConfigError('Invalid commit_every value: {} (must be positive)'.format(commit_every))
+        if target_columns is not None and (type(target_columns) is not list or not target_columns):
+            raise errors.ConfigError('target_columns must be a non-empty array of column names')
+
+        # Substitute params in the DB connections
+        source_database = source_database.format(**config)
+        target_database = target_database.format(**config)
+        if source_database == target_database:
+            raise errors.ConfigError(
+                'source_database and target_database must differ; use sql_statement with "insert ... select" to copy '
+                'data within a database')
+
+        # Prepare parameters, if needed
+        db_params = {}
+        if params is not None:
+            for param in params:
+                db_params[param['name']] = param['value'].format(**config)
+
+        logger.log(context.dry_run_prefix + 'Transferring data from {} to {}@{}'.format(
+            source_database, target_table, target_database))
+        start = time.perf_counter()
+
+        # Borrow a target connection from the pool; the source one is borrowed while the batches are fetched
+        stats = {'rows': 0}
+        count_rows = 0
+        batches = sql_query.Handler.fetch_batches(
+            source_database, sql, db_params, arraysize, prefetch_rows, progress_rows, arraysize, stats)
+        try:
+            with context.db_connection(target_database, writes=True) as db_conn:
+                # Map the query result columns onto the target ones
+                col_names = next(batches)
+                if target_columns is None:
+                    target_columns = col_names
+                elif len(target_columns) != len(col_names):
+                    raise errors.ConfigError(
+                        'Number of target_columns ({}) doesn\'t match the number of query result columns ({})'.format(
+                            len(target_columns), len(col_names)))
+
+                # Truncate the target table, if required
+                if truncate_target:
+                    if not context.dry_run_mode:
+                        db_conn.execute(db_conn.get_truncate_statement(target_table))
+                    logger.log(
+                        context.dry_run_prefix + 'Table {}@{} is truncated'.format(target_table, target_database))
+
+                # In dry-run mode, only fetch the data
+                if context.dry_run_mode:
+                    for rows in batches:
+                        count_rows += len(rows)
+
+                # Stream the rows to the database in bulk, in chunks of commit_every rows if required
+                elif db_conn.supports_bulk_load:
+                    rows = itertools.chain.from_iterable(batches)
+                    if commit_every is None:
+                        count_rows = db_conn.bulk_load(target_table, target_columns, rows)
+                    else:
+                        for first_row in rows:
+                            count_rows += db_conn.bulk_load(
+                                target_table, target_columns,
+                                itertools.chain([first_row], itertools.islice(rows, commit_every - 1)))
+                            db_conn.commit()
+
+                # Push the rows to the target table, committing every commit_every rows if required. Stop the inserter
+                # before the connection is released in any case
+                else:
+                    stmt = self.get_insert_statement(db_conn, target_table, target_columns)
+                    if batch_size == 'auto':
+                        inserter = DBArrayInserter(db_conn, stmt, None, False, background, adaptive=True)
+                    else:
+                        inserter = DBArrayInserter(db_conn, stmt, None, False, background, batch_size=batch_size)
+                    try:
+                        committed_rows = 0
+                        for rows in batches:
+                            for row in rows:
+                                inserter.push_row(row)
+                            count_rows += len(rows)
+                            if commit_every is not None and count_rows - committed_rows >= commit_every:
+                                inserter.flush()
+                                db_conn.commit()
+                                committed_rows = count_rows
+                        inserter.flush()
+                    finally:
+                        inserter.close()
+                    logger.log('Batch size used: {} rows'.format(inserter.batch_size))
+                    profiler.set_info('batch_size', inserter.batch_size)
+
+                # Commit the remaining rows
+                if not context.dry_run_mode:
+                    db_conn.commit()
+        finally:
+            batches.close()
+
+        # Finalise
+        profiler.add_rows(count_rows)
+        logger.info(context.dry_run_prefix + 'Transferring to {}@{} finished, copied {} rows ({:.0f} rows/s).'.format(
+            target_table, target_database, count_rows, count_rows / max(time.perf_counter() - start, 1e-9)))
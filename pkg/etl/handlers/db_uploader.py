@@ -1,16 +1,144 @@
 import csv
-
+import functools
+import itertools
+import json
+import multiprocessing
+import operator
+import os
+
+from etl.db import datetime_format
 from etl.db.connection import DBConnection
 from etl.db.array_inserter import DBArrayInserter
 from etl import errors
 from etl import logger
+from etl import profiler
 from etl import context
 from etl.handlers import base
 
 
+class Checkpoint(object):
+    """Progress record of a load, persisted in a local JSON file, allowing a failed load to be resumed after the last
+    committed source line."""
+
+    def __init__(self, file_name: str, identity: dict):
+        """Constructor.
+        :param file_name: Name of the checkpoint file.
+        :param identity: Dictionary identifying the load (source and target), which must match the one of a saved
+            checkpoint for it to be resumed.
+        """
+        self.file_name = file_name
+        self.identity  = identity
+        self.line      = 0
+        self.rows      = 0
+
+    def clear(self):
+        """Delete the checkpoint file, if any."""
+        if os.path.exists(self.file_name):
+            os.remove(self.file_name)
+
+    def load(self) -> bool:
+        """Load the checkpoint file, if any.
+        :return True if a checkpoint of the same load has been loaded, False otherwise.
+        """
+        if not os.path.exists(self.file_name):
+            return False
+        with open(self.file_name, encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('identity') != self.identity:
+            logger.warning('Checkpoint file {} belongs to a different load, ignoring it'.format(self.file_name))
+            return False
+        self.line = int(state['line'])
+        self.rows = int(state['rows'])
+        return True
+
+    def save(self, line: int, rows: int):
+        """Save the checkpoint, replacing the file atomically.
+        :param line: Number of the last committed source line.
+        :param rows: Number of target rows committed so far.
+        """
+        self.line = line
+        self.rows = rows
+        tmp_file_name = self.file_name + '.tmp'
+        with open(tmp_file_name, 'w', encoding='utf-8') as f:
+            json.dump({'identity': self.identity, 'line': line, 'rows': rows}, f)
+        os.replace(tmp_file_name, self.file_name)
+
+
+# State of a parallel load worker process, set up by _init_worker()
+_worker = None
+
+
+def _init_worker(spec: dict):
+    """Initialise a parallel load worker process: compile the column mappings and connect to the database.
+    :param spec: Dictionary describing the load, with the following keys:
+        db_params       -- DBConnection constructor arguments, or None in dry-run mode.
+        target_table    -- Name of the target table.
+        column_mappings -- Column mappings to compile.
+        fmt_fixed       -- Whether the source data is fixed-width.
+        fmt_delimited   -- Whether the source data is delimited.
+        parse_datetime  -- Whether datetime values are parsed by the handler.
+        bulk_columns    -- Target column names if the rows are bulk loaded, otherwise None.
+        statement       -- Insert statement, used unless the rows are bulk loaded.
+        col_lengths     -- List of bound column lengths for the insert statement.
+        background      -- Whether to insert the rows on a background thread.
+        batch_size      -- Number of rows inserted at once, 'auto' for adaptive sizing, or None for the default.
+    """
+    global _worker
+    _worker = dict(spec)
+    _worker['extractors'] = Handler.compile_mappings(
+        spec['column_mappings'], spec['fmt_fixed'], spec['fmt_delimited'], spec['parse_datetime'])
+    _worker['convert_batch'] = Handler.compile_batch_converter(
+        spec['column_mappings'], spec['fmt_fixed'], spec['parse_datetime'])
+    _worker['connection'] = DBConnection(*spec['db_params']) if spec['db_params'] is not None else None
+
+
+def _load_chunk(chunk: list, line_offset: int, rownum_offset: int) -> int:
+    """Convert a chunk of source rows and load them into the target table in a worker process, committing the result.
+    :param chunk: List of source rows.
+    :param line_offset: Number of source lines preceding the chunk.
+    :param rownum_offset: Number of target rows preceding the chunk.
+    :return Number of target rows loaded.
+    """
+    stats = {'src': line_offset, 'tgt': rownum_offset}
+    rows = Handler.convert_rows(
+        chunk, 0, _worker['fmt_fixed'], _worker['extractors'], stats, rownum_offset, line_offset,
+        _worker['convert_batch'])
+    db_conn = _worker['connection']
+
+    # In dry-run mode, only validate the data
+    if db_conn is None:
+        for _ in rows:
+            pass
+
+    # Stream the rows to the database in bulk
+    elif _worker['bulk_columns'] is not None:
+        db_conn.bulk_load(_worker['target_table'], _worker['bulk_columns'], rows)
+        db_conn.commit()
+
+    # Push the rows to the target table
+    else:
+        if _worker['batch_size'] == 'auto':
+            inserter = DBArrayInserter(
+                db_conn, _worker['statement'], _worker['col_lengths'], False, _worker['background'], adaptive=True)
+        else:
+            inserter = DBArrayInserter(
+                db_conn, _worker['statement'], _worker['col_lengths'], False, _worker['background'],
+                batch_size=_worker['batch_size'])
+        try:
+            for target_row in rows:
+                inserter.push_row(target_row)
+            inserter.flush()
+        finally:
+            inserter.close()
+        db_conn.commit()
+    return stats['tgt'] - rownum_offset
+
+
 class Handler(base.Handler):
     """Generic handler that allows to upload tabular data, either fixed-width or delimited, to a DB table. Input records
-    must be separated by newline character.
+    must be separated by newline character. The input data can also be a line stream, in which case it is consumed
+    lazily. If the database driver supports bulk loading and no column requires an SQL expression, the data is bulk
+    loaded rather than inserted.
 
     Relevant configuration entries:
         input_param     -- Name of the parameter used for reading input data. Optional, default is 'data'.
@@ -24,6 +152,34 @@ class Handler(base.Handler):
         target_table    -- Name of the target table, possibly with schema name before it.
         truncate_target -- Boolean, whether or not to truncate the target table before the load. Optional, False by
                            default
+        background_insert
+                        -- Boolean, whether to insert batches of rows on a background thread, so that the input data is
+                           parsed while the previous batch is being inserted. Optional, False by default.
+        batch_size      -- Number of rows inserted at once: a positive integer, or 'auto' to tune it by measuring the
+                           insert throughput as the load goes. Optional, default is 100.
+        commit_every    -- Number of rows after which the changes are committed. Optional, by default the changes are
+                           committed once at the end of the load.
+        checkpoint_file -- Name of the file to record the load progress in on every commit, so that a failed load can be
+                           resumed after the last committed source line. The file is deleted once the load succeeds. If
+                           the file exists when the load starts, and it belongs to the same load (same source_id,
+                           target database, table and data format), the lines up to the recorded one are skipped and
+                           the target table isn't truncated. Can be absolute or relative to the config file, and can
+                           refer to handler's own configuration parameters in the form '{name}'. Optional.
+        source_id       -- String identifying the source data for the checkpoint, e.g. '{file_name}'. Can refer to
+                           handler's own configuration parameters in the form '{name}'. Optional, default is empty
+                           string.
+        parallel_degree -- Number of worker processes to parse and load the data with. The input is split into chunks of
+                           parallel_chunk_size contiguous lines, each loaded and committed by a worker process over its
+                           own connection; if any chunk fails, the chunks committed before remain loaded. Can't be
+                           combined with commit_every or checkpoint_file. Optional, default is 1 (load in the calling
+                           thread).
+        parallel_chunk_size
+                        -- Number of lines in a chunk, when parallel_degree is greater than 1. Optional, default is
+                           10000.
+        datetime_parsing
+                        -- Where datetime values with source_format are parsed: 'database' (with the database's date
+                           conversion function, e.g. To_Date) or 'handler' (by the handler, which binds datetime values
+                           and keeps the recently parsed values for repetitive data). Optional, default is 'database'.
         column_mappings -- Array of objects describing column mappings, each object consisting of:
             name            -- (Display) name of the column.
             datatype        -- Datatype of the column, one of "string", "number", "integer", "datetime". Mandatory if
@@ -58,12 +214,22 @@ class Handler(base.Handler):
                                target row number (1-based) as '{rownum}'. In both cases can refer to config parameters
                                as '{param_name}'.
     """
+    reusable = True
+    streaming = True
+
+    # Number of source rows converted at once
+    convert_batch_rows = 1000
+
+    # Number of parsed datetime values kept per column, when datetime values are parsed by the handler
+    datetime_cache_size = 4096
+
     @staticmethod
-    def get_inserter(
+    def get_insert_statement(
             connection: DBConnection, target_table: str, column_mappings: dict, fmt_fixed: bool,
-            fmt_delimited: bool, config: dict) -> DBArrayInserter:
-        """Creates an insert SQL statement for the specified table and columns and returns a DBArrayInserter object for
-        it.
+            fmt_delimited: bool, config: dict, parse_datetime: bool=False) -> tuple:
+        """Validates column mappings and creates an insert SQL statement for the specified table and columns.
+        :param parse_datetime: Whether datetime values are parsed by the handler, and bound as datetime values.
+        :return Tuple (statement, list of bound column lengths).
         """
         col_names   = []
         col_values  = []
@@ -92,6 +258,8 @@ class Handler(base.Handler):
                                 col_name, length))
                 elif datatype == 'number' or datatype == 'integer':
                     length = DBConnection.NUMBER
+                elif datatype == 'datetime' and parse_datetime and 'source_format' in cm:
+                    length = DBConnection.DATETIME
                 elif datatype == 'datetime':
                     if 'source_format' in cm:
                         val = connection.get_datetime_expression(val, "'{}'".format(cm['source_format']))
@@ -129,12 +297,410 @@ class Handler(base.Handler):
         # Construct the final statement
         stmt = 'insert /*+ append */ into {}({}) values({})'.format(
             target_table, ', '.join(col_names), ', '.join(col_values))
+        return stmt, col_lengths
+
+    @staticmethod
+    def get_inserter(
+            connection: DBConnection, target_table: str, column_mappings: dict, fmt_fixed: bool, fmt_delimited: bool,
+            config: dict, background: bool=False, batch_size: [int, str]=None,
+            parse_datetime: bool=False) -> DBArrayInserter:
+        """Creates an insert SQL statement for the specified table and columns and returns a DBArrayInserter object for
+        it.
+        :param background: Whether the inserter should insert the rows on a background thread.
+        :param batch_size: Number of rows inserted at once, 'auto' for adaptive sizing, or None for the default.
+        :param parse_datetime: Whether datetime values are parsed by the handler, and bound as datetime values.
+        """
+        stmt, col_lengths = Handler.get_insert_statement(
+            connection, target_table, column_mappings, fmt_fixed, fmt_delimited, config, parse_datetime)
 
         # Construct an array inserter, if we're not in dry-run mode
         if context.dry_run_mode:
             return None
         else:
-            return DBArrayInserter(connection, stmt, col_lengths, False)
+            if batch_size == 'auto':
+                return DBArrayInserter(connection, stmt, col_lengths, False, background, adaptive=True)
+            return DBArrayInserter(connection, stmt, col_lengths, False, background, batch_size=batch_size)
+
+    @staticmethod
+    def get_bulk_columns(
+            column_mappings: list, fmt_fixed: bool, fmt_delimited: bool, parse_datetime: bool=False) -> [list, None]:
+        """Return the target column names if the rows can be bulk loaded as they are, i.e. every column is bound to a
+        source value or the row number without any target expression or datetime conversion in the database.
+        :param parse_datetime: Whether datetime values are parsed by the handler.
+        :return List of target column names, or None if the statement built by get_insert_statement() is required.
+        """
+        col_names = []
+        for cm in column_mappings:
+            target_expr = cm['target_expr', None]
+            if (fmt_fixed and 'source_pos' in cm) or (fmt_delimited and 'source_index' in cm):
+                if target_expr not in (None, '{value}') or \
+                        (cm['datatype'] == 'datetime' and 'source_format' in cm and not parse_datetime):
+                    return None
+            elif target_expr != '{rownum}':
+                return None
+            col_names.append(cm['target_column'])
+        return col_names
+
+    @staticmethod
+    def parse_batch_size(batch_size) -> [int, str, None]:
+        """Validates the batch_size configuration value.
+        :param batch_size: Number of rows, 'auto', or None.
+        :return The number of rows as an integer, 'auto', or None.
+        """
+        if batch_size is None or batch_size == 'auto':
+            return batch_size
+        try:
+            value = int(batch_size)
+        except (TypeError, ValueError):
+            value = 0
+        if value < 1 or isinstance(batch_size, bool):
+            raise errors.ConfigError(
+                'Invalid batch_size value: "{}" (must be a positive integer or "auto")'.format(batch_size))
+        return value
+
+    @staticmethod
+    def parse_source_pos(source_pos: str, col_name: str) -> tuple:
+        """Parses and validates a fixed-width column boundary specification.
+        :param source_pos: Boundary specification in the format '<left_pos>:<right_pos>'.
+        :param col_name: Name of the column, for error reporting.
+        :return Tuple of 0-based left (inclusive) and right (exclusive) slice boundaries.
+        """
+        pos = source_pos.partition(':')
+        # Validate the position format
+        if pos[0] == '' or pos[2] == '':
+            raise errors.ConfigError('Invalid position specifier "{}" for column "{}"'.format(source_pos, col_name))
+        # Validate left boundary
+        try:
+            pos_l = int(pos[0]) - 1
+        except ValueError as e:
+            raise errors.ConfigError('Left boundary specification for column "{}": {}'.format(col_name, str(e)))
+        if pos_l < 0:
+            raise errors.ConfigError('Left boundary must be positive (column "{}")'.format(col_name))
+        # Validate right boundary
+        try:
+            pos_r = int(pos[2])
+        except ValueError as e:
+            raise errors.ConfigError('Right boundary specification for column "{}": {}'.format(col_name, str(e)))
+        if pos_r <= pos_l:
+            raise errors.ConfigError(
+                'Right boundary must be greater than or equal to the left one (column "{}")'.format(col_name))
+        return pos_l, pos_r
+
+    @staticmethod
+    def compile_source_converters(cm, fmt_fixed: bool, parse_datetime: bool=False) -> tuple:
+        """Validates a column mapping that refers to a source value, and compiles the functions to trim and convert the
+        column value.
+        :param cm: Column mapping configuration.
+        :param fmt_fixed: Whether the source data is fixed-width (otherwise it's delimited).
+        :param parse_datetime: Whether to parse datetime values having source_format into datetime.datetime objects.
+        :return Tuple (item, trim_fn, convert, convert_column), where item is the slice (for fixed-width rows) or the
+            index (for delimited rows) of the value in a source row, trim_fn is the trimming function (or None),
+            convert is the function converting a trimmed non-null value (or None), and convert_column is the function
+            trimming and converting a whole list of values at once, returning a list with None for null values.
+        """
+        col_name = cm['name']
+        datatype = cm['datatype']
+        trim     = cm['source_trim', 'none']
+
+        # Prepare the value extractor: a slice for fixed-width rows, an index for delimited ones
+        if fmt_fixed:
+            pos_l, pos_r = Handler.parse_source_pos(cm['source_pos'], col_name)
+            item = slice(pos_l, pos_r)
+        else:
+            try:
+                item = int(cm['source_index'])
+            except (TypeError, ValueError) as e:
+                raise errors.ConfigError('Source index specification for column "{}": {}'.format(col_name, str(e)))
+
+        # Prepare the trimming function
+        if trim == 'none':
+            trim_fn = None
+        elif trim == 'left':
+            trim_fn = str.lstrip
+        elif trim == 'right':
+            trim_fn = str.rstrip
+        elif trim == 'both':
+            trim_fn = str.strip
+        else:
+            raise errors.ConfigError('Invalid trim value for column "{}": "{}"'.format(col_name, trim))
+
+        # Prepare the conversion function, and the one converting a whole column of non-null values at once, falling
+        # back to the former to report or truncate an offending value. Null (empty) values never reach them
+        if datatype == 'string':
+            max_len  = int(cm['length'])
+            truncate = bool(cm['truncate', False])
+
+            def convert(value):
+                # Validate value length
+                if len(value) > max_len:
+                    # No truncation - raise an error
+                    if not truncate:
+                        raise errors.DataError(
+                            'String column "{}": value length ({}) exceeds allowed maximum ({})'.format(
+                                col_name, len(value), max_len))
+                    # Otherwise truncate the value
+                    return value[:max_len]
+                return value
+
+            def convert_values(values):
+                if max(map(len, values)) <= max_len:
+                    return values
+                return list(map(convert, values))
+
+        elif datatype == 'integer':
+            def convert(value):
+                try:
+                    return int(value)
+                except ValueError as e:
+                    raise errors.DataError('Integer column "{}": {}'.format(col_name, str(e)))
+
+            def convert_values(values):
+                try:
+                    return list(map(int, values))
+                except ValueError:
+                    return list(map(convert, values))
+
+        elif datatype == 'number':
+            def convert(value):
+                try:
+                    return float(value)
+                except ValueError as e:
+                    raise errors.DataError('Float value error for column "{}": {}'.format(col_name, str(e)))
+
+            def convert_values(values):
+                try:
+                    return list(map(float, values))
+                except ValueError:
+                    return list(map(convert, values))
+
+        # Parse datetime values, remembering the recent ones, as the same dates tend to repeat throughout the data
+        elif datatype == 'datetime' and parse_datetime and 'source_format' in cm:
+            parse = functools.lru_cache(Handler.datetime_cache_size)(
+                datetime_format.compile_parser(cm['source_format']))
+
+            def convert(value):
+                try:
+                    return parse(value)
+                except ValueError as e:
+                    raise errors.DataError('Datetime column "{}": {}'.format(col_name, str(e)))
+
+            def convert_values(values):
+                try:
+                    return list(map(parse, values))
+                except ValueError:
+                    return list(map(convert, values))
+
+        elif datatype == 'datetime':
+            convert = None
+            convert_values = None
+
+        else:
+            raise errors.ConfigError('Invalid datatype for the column "{}": "{}"'.format(col_name, datatype))
+
+        def convert_column(values):
+            if trim_fn is not None:
+                values = list(map(trim_fn, values))
+            # Convert non-null values only, if there are null ones
+            if '' in values:
+                return [None if v == '' else v if convert is None else convert(v) for v in values]
+            return values if convert_values is None else convert_values(values)
+
+        return item, trim_fn, convert, convert_column
+
+    @staticmethod
+    def compile_source_column(cm, fmt_fixed: bool, parse_datetime: bool=False):
+        """Validates a column mapping that refers to a source value, and compiles it into a function that extracts,
+        trims and converts the column value from a source row.
+        :param cm: Column mapping configuration.
+        :param fmt_fixed: Whether the source data is fixed-width (otherwise it's delimited).
+        :param parse_datetime: Whether to parse datetime values having source_format into datetime.datetime objects.
+        :return Function accepting a source row and the target row number, and returning the value to bind.
+        """
+        item, trim_fn, convert, _ = Handler.compile_source_converters(cm, fmt_fixed, parse_datetime)
+
+        # Combine the above into a single function
+        def extract(src_row, rownum):
+            value = src_row[item]
+            if trim_fn is not None:
+                value = trim_fn(value)
+            # All types: handle null values
+            if value == '':
+                return None
+            return value if convert is None else convert(value)
+
+        return extract
+
+    @staticmethod
+    def compile_batch_converter(column_mappings: list, fmt_fixed: bool, parse_datetime: bool=False):
+        """Validates column mappings and compiles them into a function converting a batch of source rows column by
+        column: the values of all the rows are extracted at once, and each column is trimmed and converted as a whole.
+        :param column_mappings: List of column mapping configurations.
+        :param fmt_fixed: Whether the source data is fixed-width (otherwise it's delimited).
+        :param parse_datetime: Whether to parse datetime values having source_format into datetime.datetime objects.
+        :return Function accepting a list of source rows (lines without linebreaks for fixed-width data, lists of values
+            for delimited data) and the target row number of the first one, and returning the list of target rows. It
+            raises an error if any of the values fails to convert, but doesn't tell which one, see convert_rows().
+        """
+        items   = []
+        columns = []  # (index of the value in the extracted values, or None for the row number, column converter)
+        for cm in column_mappings:
+            # If a source value is used
+            if 'source_pos' in cm if fmt_fixed else 'source_index' in cm:
+                item, _, _, convert_column = Handler.compile_source_converters(cm, fmt_fixed, parse_datetime)
+                columns.append((len(items), convert_column))
+                items.append(item)
+
+            # Otherwise a target expression is used. If it uses row number value, bind it
+            elif '{rownum}' in cm['target_expr', '']:
+                columns.append((None, None))
+
+        # Extract a tuple of values from a source row
+        if len(items) > 1:
+            extract = operator.itemgetter(*items)
+        elif items:
+            def extract(src_row, item=items[0]):
+                return src_row[item],
+        else:
+            extract = None
+
+        def convert(src_rows: list, first_rownum: int) -> list:
+            if not columns:
+                return [[] for _ in src_rows]
+            values = list(zip(*map(extract, src_rows))) if extract is not None else []
+            return list(map(list, zip(*[
+                range(first_rownum, first_rownum + len(src_rows)) if idx is None else convert_column(values[idx])
+                for idx, convert_column in columns])))
+
+        return convert
+
+    @staticmethod
+    def compile_mappings(
+            column_mappings: list, fmt_fixed: bool, fmt_delimited: bool, parse_datetime: bool=False) -> list:
+        """Validates column mappings and compiles them into a list of functions, one per bound value, so that no
+        configuration needs to be looked up while processing the data.
+        :param column_mappings: List of column mapping configurations.
+        :param fmt_fixed: Whether the source data is fixed-width.
+        :param fmt_delimited: Whether the source data is delimited.
+        :param parse_datetime: Whether to parse datetime values having source_format into datetime.datetime objects.
+        :return List of functions accepting a source row (a string for fixed-width data, a list of values for delimited
+            data) and the 1-based target row number, and returning the value to bind.
+        """
+        extractors = []
+        for cm in column_mappings:
+            # If a source value is used
+            if (fmt_fixed and 'source_pos' in cm) or (fmt_delimited and 'source_index' in cm):
+                extractors.append(Handler.compile_source_column(cm, fmt_fixed, parse_datetime))
+
+            # Otherwise a target expression is used. If it uses row number value, bind it
+            elif '{rownum}' in cm['target_expr', '']:
+                extractors.append(lambda src_row, rownum: rownum)
+        return extractors
+
+    @staticmethod
+    def convert_rows(
+            input_data, start_line: int, fmt_fixed: bool, extractors: list, stats: dict, start_rownum: int=0,
+            start_line_offset: int=0, convert_batch=None):
+        """Generator yielding target rows converted from the source rows.
+        :param input_data: Iterable of source rows: lines for fixed-width data, lists of values for delimited data.
+        :param start_line: Number of the line to start with (1-based).
+        :param fmt_fixed: Whether the source data is fixed-width.
+        :param extractors: List of functions returned by compile_mappings().
+        :param stats: Dictionary whose 'src' and 'tgt' elements are updated with the numbers of source lines read and
+            target rows produced, respectively.
+        :param start_rownum: Number of target rows produced before, when resuming a load or loading a chunk.
+        :param start_line_offset: Number of source lines preceding the input data, when loading a chunk.
+        :param convert_batch: Function returned by compile_batch_converter(), to convert the rows in batches of
+            Handler.convert_batch_rows rows. A batch failing to convert is converted row by row to report the error.
+        """
+        count_src_lines = start_line_offset
+        count_tgt_rows = start_rownum
+        input_data = iter(input_data)
+        if convert_batch is not None:
+            # Skip up to start_line
+            for _ in itertools.islice(input_data, max(start_line - 1 - count_src_lines, 0)):
+                count_src_lines += 1
+                stats['src'] = count_src_lines
+
+            # Convert the rows in batches, chomping fixed-width lines first
+            while True:
+                src_rows = list(itertools.islice(input_data, Handler.convert_batch_rows))
+                if not src_rows:
+                    return
+                if fmt_fixed:
+                    src_rows = [line.rstrip('\r\n') for line in src_rows]
+                try:
+                    rows = convert_batch(src_rows, count_tgt_rows + 1)
+                # Convert the (already chomped) rows one by one to locate the error
+                except Exception:
+                    rows = Handler.convert_rows(src_rows, 0, False, extractors, {}, count_tgt_rows, count_src_lines)
+                for target_row in rows:
+                    count_src_lines += 1
+                    count_tgt_rows  += 1
+                    stats['src'] = count_src_lines
+                    stats['tgt'] = count_tgt_rows
+                    yield target_row
+
+        for src_row in input_data:
+            # Skip up to start_line
+            count_src_lines += 1
+            stats['src'] = count_src_lines
+            if count_src_lines < start_line:
+                continue
+
+            # Chomp fixed-width lines
+            if fmt_fixed:
+                src_row = src_row.rstrip('\r\n')
+
+            # Fetch data values. Assume all errors are coming from the data, since mappings are validated already
+            count_tgt_rows += 1
+            try:
+                target_row = [extract(src_row, count_tgt_rows) for extract in extractors]
+            except Exception as e:
+                raise errors.DataError('Input data error at line {}: {}'.format(count_src_lines, str(e)))
+            stats['tgt'] = count_tgt_rows
+            yield target_row
+
+    @staticmethod
+    def load_parallel(input_data, start_line: int, spec: dict, parallel_degree: int, chunk_size: int, stats: dict):
+        """Split the source rows into chunks of contiguous lines and load them on a pool of worker processes, each
+        converting the rows, inserting them over its own database connection and committing every chunk.
+        :param input_data: Iterable of source rows: lines for fixed-width data, lists of values for delimited data.
+        :param start_line: Number of the line to start with (1-based).
+        :param spec: Dictionary describing the load, see _init_worker().
+        :param parallel_degree: Number of worker processes.
+        :param chunk_size: Number of source lines in a chunk.
+        :param stats: Dictionary whose 'src' and 'tgt' elements are updated with the numbers of source lines read and
+            target rows loaded, respectively.
+        """
+        def read_chunks():
+            chunk = []
+            line_offset = 0
+            rownum_offset = stats['tgt']
+            for src_row in input_data:
+                # Skip up to start_line
+                stats['src'] += 1
+                if stats['src'] < start_line:
+                    line_offset += 1
+                    continue
+                chunk.append(src_row)
+                if len(chunk) >= chunk_size:
+                    yield chunk, line_offset, rownum_offset
+                    line_offset   += len(chunk)
+                    rownum_offset += len(chunk)
+                    chunk = []
+            if chunk:
+                yield chunk, line_offset, rownum_offset
+
+        # Worker processes are spawned rather than forked, so that they don't inherit open connections of this one.
+        # Every chunk is waited for by a thread of run_concurrently(), so all of them are done once it returns
+        pool = multiprocessing.get_context('spawn').Pool(parallel_degree, _init_worker, (spec,))
+        try:
+            for count in context.run_concurrently(
+                    lambda c: pool.apply_async(_load_chunk, c).get(), read_chunks(), parallel_degree):
+                stats['tgt'] += count
+        finally:
+            pool.close()
+            pool.join()
 
     def run(self, config):
         """Override the abstract method of the base class."""
@@ -159,23 +725,53 @@ class Handler(base.Handler):
         target_database = config['target_database']
         target_table    = config['target_table']
         truncate_target = bool(config['truncate_target', False])
+        background      = bool(config['background_insert', False])
+        batch_size      = self.parse_batch_size(config['batch_size', None])
+        commit_every    = config['commit_every', None]
+        checkpoint_file = config['checkpoint_file', None]
+        source_id       = config['source_id', '']
+        parallel_degree = int(config['parallel_degree', 1])
+        chunk_size      = int(config['parallel_chunk_size', 10000])
+        dt_parsing      = config['datetime_parsing', 'database']
         column_mappings = config['column_mappings']
+        if dt_parsing not in ('database', 'handler'):
+            raise errors.ConfigError(
+                'Invalid datetime_parsing value: "{}" (must be "database" or "handler")'.format(dt_parsing))
+        parse_datetime = dt_parsing == 'handler'
+        if parallel_degree < 1:
+            raise errors.ConfigError('Invalid parallel_degree value: {} (must be positive)'.format(parallel_degree))
+        if chunk_size < 1:
+            raise errors.ConfigError('Invalid parallel_chunk_size value: {} (must be positive)'.format(chunk_size))
+        if parallel_degree > 1 and (commit_every is not None or checkpoint_file is not None):
+            raise errors.ConfigError(
+                'parallel_degree can\'t be combined with commit_every or checkpoint_file, as every chunk is committed '
+                'separately')
+        if commit_every is not None:
+            commit_every = int(commit_every)
+            if commit_every < 1:
+                raise errors.ConfigError('Invalid commit_every value: {} (must be positive)'.format(commit_every))
+
+        # Validate and compile column mappings before touching the database
+        extractors    = self.compile_mappings(column_mappings, fmt_fixed, fmt_delimited, parse_datetime)
+        convert_batch = self.compile_batch_converter(column_mappings, fmt_fixed, parse_datetime)
 
         # Substitute params in the DB connection
         target_database = target_database.format(**config)
         logger.log(context.dry_run_prefix + 'Loading data to {}@{}'.format(target_table, target_database))
 
-        # Find the DB connection
-        db_conn = context.get_db_connection(target_database)
-
-        # Truncate the target table, if required
-        if truncate_target:
-            if not context.dry_run_mode:
-                db_conn.execute('truncate table {} drop storage'.format(target_table))
-            logger.log(context.dry_run_prefix + 'Table {}@{} is truncated'.format(target_table, target_database))
-
-        # Create an inserter
-        inserter = self.get_inserter(db_conn, target_table, column_mappings, fmt_fixed, fmt_delimited, config)
+        # Resume from the checkpoint, if any (not in dry-run mode, as nothing gets committed then)
+        checkpoint = None
+        if checkpoint_file is not None and not context.dry_run_mode:
+            checkpoint = Checkpoint(
+                context.get_absolute_file_name(checkpoint_file.format(**config)),
+                {'source': source_id.format(**config), 'database': target_database, 'table': target_table,
+                 'format': data_format})
+            if checkpoint.load():
+                logger.info('Resuming the load of {}@{} after line {} ({} rows committed before)'.format(
+                    target_table, target_database, checkpoint.line, checkpoint.rows))
+                start_line = max(start_line, checkpoint.line + 1)
+                truncate_target = False
+        resumed_rows = checkpoint.rows if checkpoint is not None else 0
 
         # Fixed-width file: use the input data as is
         if fmt_fixed:
@@ -188,128 +784,109 @@ class Handler(base.Handler):
                 args['quotechar'] = quotechar
             input_data = csv.reader(data, **args)
 
-        # Iterate through the data
-        count_src_lines = 0
-        count_tgt_rows = 0
-        for src_row in input_data:
-            # Skip up to start_line
-            count_src_lines += 1
-            if count_src_lines < start_line:
-                continue
-
-            # Fetch data values
-            try:
-                target_row = []
-                for cm in column_mappings:
-                    # If a source value is used
-                    if (fmt_fixed and 'source_pos' in cm) or (fmt_delimited and 'source_index' in cm):
-                        col_name = cm['name']
-                        datatype = cm['datatype']
-                        trim     = cm['source_trim', 'none']
-
-                        # Fixed-width
-                        if fmt_fixed:
-                            pos = cm['source_pos'].partition(':')
-                            # Validate the position format
-                            if pos[0] == '' or pos[2] == '':
-                                raise errors.ConfigError('Invalid position specifier "{}" for column "{}"'.format(
-                                    cm['source_pos'], col_name))
-                            # Validate left boundary
-                            try:
-                                pos_l = int(pos[0]) - 1
-                            except ValueError as e:
-                                raise errors.ConfigError('Left boundary specification for column "{}": {}'.format(
-                                    col_name, str(e)))
-                            if pos_l < 0:
-                                raise errors.ConfigError('Left boundary must be positive (column "{}")'.format(
-                                    col_name))
-                            # Validate right boundary
-                            try:
-                                pos_r = int(pos[2])
-                            except ValueError as e:
-                                raise errors.ConfigError('Right boundary specification for column "{}": {}'.format(
-                                    col_name, str(e)))
-                            if pos_r <= pos_l:
-                                raise errors.ConfigError(
-                                    'Right boundary must be greater than or equal to the left one (column "{}")'.format(
-                                        col_name))
-                            # Chomp
-                            src_row = src_row.rstrip('\r\n')
-                            # Extract column value
-                            value = src_row[pos_l:pos_r]
-
-                        # Delimited
-                        else:
-                            value = src_row[int(cm['source_index'])]
-
-                        # Apply trimming
-                        if trim == 'none':
-                            pass
-                        elif trim == 'left':
-                            value = value.lstrip()
-                        elif trim == 'right':
-                            value = value.rstrip()
-                        elif trim == 'both':
-                            value = value.strip()
-                        else:
-                            raise errors.ConfigError('Invalid trim value for column "{}": "{}"'.format(col_name, trim))
-
-                        # All types: handle null values
-                        val_len = len(value)
-                        if val_len == 0:
-                            value = None
-                        # String: validate value length
-                        elif datatype == 'string':
-                            max_len = int(cm['length'])
-                            # If the length exceeds the allowed size
-                            if val_len > max_len:
-                                # No truncation - raise an error
-                                if not bool(cm['truncate', False]):
-                                    raise errors.DataError(
-                                        'String column "{}": value length ({}) exceeds allowed maximum ({})'.format(
-                                            col_name, val_len, max_len))
-                                # Otherwise truncate the value
-                                value = value[:max_len]
-                        # Integer: convert to actual int
-                        elif datatype == 'integer':
-                            try:
-                                value = int(value)
-                            except ValueError as e:
-                                raise errors.DataError('Integer column "{}": {}'.format(col_name, str(e)))
-                        # Number: convert to actual number
-                        elif datatype == 'number':
-                            try:
-                                value = float(value)
-                            except ValueError as e:
-                                raise errors.DataError('Float value error for column "{}": {}'.format(col_name, str(e)))
-
-                        # Add the value to the target row
-                        target_row.append(value)
-
-                    # Otherwise we're using a target expression
-                    else:
-                        target_expr = cm['target_expr']
-
-                        # If it uses row number value, add it to the row
-                        if '{rownum}' in target_expr:
-                            target_row.append(count_tgt_rows + 1)
-
-            # Reraise ConfigErrors as is
-            except errors.ConfigError:
-                raise
-
-            # Assume all other errors are coming from the data
-            except Exception as e:
-                raise errors.DataError('Input data error at line {}: {}'.format(count_src_lines, str(e)))
-
-            # Push the row to the target table (unless we're in dry-run mode)
-            if not context.dry_run_mode:
-                inserter.push_row(target_row)
-            count_tgt_rows += 1
+        # Borrow a connection from the pool
+        with context.db_connection(target_database, writes=True) as db_conn:
+            # Truncate the target table, if required
+            if truncate_target:
+                if not context.dry_run_mode:
+                    db_conn.execute(db_conn.get_truncate_statement(target_table))
+                logger.log(context.dry_run_prefix + 'Table {}@{} is truncated'.format(target_table, target_database))
+
+            # Use the driver's bulk load, if possible (validating the mappings anyway), otherwise create an inserter
+            bulk_columns = None
+            if db_conn.supports_bulk_load:
+                bulk_columns = self.get_bulk_columns(column_mappings, fmt_fixed, fmt_delimited, parse_datetime)
+            inserter = None
+            if bulk_columns is not None or parallel_degree > 1:
+                stmt, col_lengths = self.get_insert_statement(
+                    db_conn, target_table, column_mappings, fmt_fixed, fmt_delimited, config, parse_datetime)
+            else:
+                inserter = self.get_inserter(
+                    db_conn, target_table, column_mappings, fmt_fixed, fmt_delimited, config, background, batch_size,
+                    parse_datetime)
+
+            # Convert the data lazily
+            stats = {'src': 0, 'tgt': resumed_rows}
+            rows = self.convert_rows(
+                input_data, start_line, fmt_fixed, extractors, stats, resumed_rows, convert_batch=convert_batch)
+
+            committed_rows = None
+
+            def commit():
+                nonlocal committed_rows
+                db_conn.commit()
+                committed_rows = stats['tgt']
+                if checkpoint is not None and stats['src'] >= checkpoint.line:
+                    checkpoint.save(stats['src'], stats['tgt'])
+
+            # Load the data on worker processes, committing the truncation first so that they don't wait for it
+            if parallel_degree > 1:
+                db_params = None
+                if not context.dry_run_mode:
+                    commit()
+                    db_params = context.get_db_connection_params(target_database)
+                self.load_parallel(
+                    input_data, start_line,
+                    {'db_params':       db_params,
+                     'target_table':    target_table,
+                     'column_mappings': column_mappings,
+                     'fmt_fixed':       fmt_fixed,
+                     'fmt_delimited':   fmt_delimited,
+                     'parse_datetime':  parse_datetime,
+                     'bulk_columns':    bulk_columns,
+                     'statement':       stmt,
+                     'col_lengths':     col_lengths,
+                     'background':      background,
+                     'batch_size':      batch_size},
+                    parallel_degree, chunk_size, stats)
+                committed_rows = stats['tgt']
+
+            # In dry-run mode, only validate the data
+            elif context.dry_run_mode:
+                for _ in rows:
+                    pass
+
+            # Stream the rows to the database in bulk, in chunks of commit_every rows if required
+            elif bulk_columns is not None:
+                if commit_every is None:
+                    db_conn.bulk_load(target_table, bulk_columns, rows)
+                else:
+                    for first_row in rows:
+                        db_conn.bulk_load(
+                            target_table, bulk_columns,
+                            itertools.chain([first_row], itertools.islice(rows, commit_every - 1)))
+                        commit()
+
+            # Push the rows to the target table, committing every commit_every rows if required. Stop the inserter
+            # before the connection is released in any case
+            else:
+                try:
+                    for target_row in rows:
+                        inserter.push_row(target_row)
+                        if commit_every is not None and stats['tgt'] - (committed_rows or resumed_rows) >= commit_every:
+                            inserter.flush()
+                            commit()
+                    inserter.flush()
+                finally:
+                    inserter.close()
+                logger.log('Batch size used: {} rows'.format(inserter.batch_size))
+                profiler.set_info('batch_size', inserter.batch_size)
+
+            # Commit the remaining rows, or the truncation only if there were none
+            if not context.dry_run_mode and committed_rows != stats['tgt']:
+                commit()
+
+        # The load is complete, so the checkpoint is no longer needed
+        if checkpoint is not None:
+            if stats['src'] < checkpoint.line:
+                raise errors.DataError(
+                    'Input data has {} lines, but the load was checkpointed after line {}; remove the checkpoint '
+                    'file {} to reload the data'.format(stats['src'], checkpoint.line, checkpoint.file_name))
+            checkpoint.clear()
 
         # Finalise
-        if not context.dry_run_mode:
-            inserter.flush()
-            db_conn.commit()
+        count_src_lines = stats['src']
+        count_tgt_rows  = stats['tgt'] - resumed_rows
+        profiler.add_rows(count_tgt_rows)
         logger.info(context.dry_run_prefix + 'Loading {}@{} finished, read {} rows, inserted {} rows.'.format(
             target_table, target_database, count_src_lines, count_tgt_rows))
@@ -15,6 +15,8 @@ class Handler(base.Handler):
         include_dirs  -- Boolean. Whether to include directories. Optional, default is True.
         output_param  -- Name of the parameter used for returning result data. Optional, default is 'data'.
     """
+    reusable = True
+
     def run(self, config) -> dict:
         """Override the abstract method of the base class."""
         # Get attributes from config
@@ -10,16 +10,37 @@ class Handler(base.Handler):
         file_name    -- Full name of the file. Can contain references to configuration parameters in the form
                         '{param_name}'.
         output_param -- Name of the parameter used for returning result data. Optional, default is 'data'.
+        stream       -- Boolean, whether to return the contents as a line stream that reads the file lazily, instead of
+                        loading the whole file into memory. Optional, default is False.
     """
+    reusable = True
+    streaming = True
+
+    @staticmethod
+    def read_lines(file_name: str):
+        """Generator yielding lines of the specified file."""
+        count_lines = 0
+        with open(file_name) as f:
+            for line in f:
+                count_lines += 1
+                yield line
+        logger.info('Streamed {} lines from {}'.format(count_lines, file_name))
+
     def run(self, config) -> dict:
         """Override the abstract method of the base class."""
         # Get attributes from config
         file_name    = config['file_name']
         output_param = config['output_param', 'data']
+        stream       = bool(config['stream', False])
 
         # Substitute config params and canonicalise
         file_name = context.get_absolute_file_name(file_name.format(**config))
 
+        # Streaming mode: the file will be read as the lines are consumed
+        if stream:
+            logger.log('Streaming lines from {}'.format(file_name))
+            return {output_param: base.LineStream(self.read_lines(file_name))}
+
         # Load the file
         with open(file_name) as f:
             data = f.read()
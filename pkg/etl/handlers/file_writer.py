@@ -13,6 +13,9 @@ class Handler(base.Handler):
         append      -- Boolean, whether to overwrite (False) or append (True) the file if it exists. Optional, default
                        is False.
     """
+    reusable = True
+    streaming = True
+
     def run(self, config):
         """Override the abstract method of the base class."""
         # Get attributes from config
@@ -26,6 +29,14 @@ class Handler(base.Handler):
 
         # Write the data into the file
         with open(output_file, 'a' if append else 'w', encoding='utf-8') as f:
-            f.write(data)
+            # Write a line stream line by line
+            if isinstance(data, base.LineStream):
+                size = 0
+                for line in data:
+                    f.write(line)
+                    size += len(line)
+            else:
+                f.write(data)
+                size = len(data)
 
-        logger.info('File {} is {} ({} bytes).'.format(output_file, 'appended' if append else 'written', len(data)))
+        logger.info('File {} is {} ({} bytes).'.format(output_file, 'appended' if append else 'written', size))
@@ -1,5 +1,6 @@
 from gzip import GzipFile
 from io import BytesIO
+from etl import errors
 from etl import logger
 from etl import context
 from etl import utils
@@ -33,6 +34,14 @@ class Handler(base.Handler):
                               Ignored if username is not given. Can contain references to configuration parameters in
                               the form '{param_name}'.
         encoding           -- Encoding to use when decoding the HTTP data. Optional, default is 'utf-8'.
+        max_concurrent_downloads -- Maximum number of files downloaded simultaneously, ahead of running their handlers.
+                              Handlers are still run one after another, in the order of 'file_defs'. Optional, default
+                              is 1 (each file is downloaded right before its handler is run). Ignored if 'file_defs' is
+                              not specified.
+        max_buffered_bytes -- Maximum total size of the files downloaded ahead and waiting for their handlers to run. No
+                              more downloads are started until it's reduced; this limit can be exceeded by the size of
+                              the downloads in progress. Optional, default is 67108864 (64 MiB). Only relevant when
+                              'max_concurrent_downloads' is greater than 1.
         file_defs          -- Optional array of file definitions. If not given, the page at 'base_url' is fetched and
                               its content is returned via parameter defined in 'output_param'. If given, each entry
                               consists of:
@@ -46,21 +55,23 @@ class Handler(base.Handler):
                 <output_param>       -- File contents.
                 <passthrough_params> -- All the parameters specified in the 'passthrough_params' list.
     """
+    reusable = True
+
     @staticmethod
-    def fetch(url: str, required: bool, verify_cert: bool, detect_compressed: bool, username: str, pwd: str, encoding: str) -> str:
-        """Fetch a file at the specified URL from the server, decompress if necessary and return its contents.
+    def download(
+            url: str, required: bool, verify_cert: bool, detect_compressed: bool, username: str, pwd: str) -> bytes:
+        """Download a file at the specified URL from the server, decompress if necessary and return its raw contents.
         :param url: URL to fetch.
         :param required: Whether to raise an exception on HTTP 404 error.
         :param verify_cert: Whether to enforce SSL certificate check.
         :param detect_compressed: Whether to detect and decompress compressed files.
         :param username: Username to use for authentication. If None, authentication is not used.
         :param pwd: Password to use for authentication. Ignored if username is None.
-        :param encoding: Encoding to use when decoding the HTTP data.
-        :return: File contents as text.
+        :return: File contents as bytes, or None if the file doesn't exist.
         """
         data = utils.http_fetch(url, required, verify_cert, username, pwd)
         if data is None:
-            logger.log('File {} doesn\'t exist')
+            logger.log('File {} doesn\'t exist'.format(url))
             return None
         else:
             size_in = len(data)
@@ -73,9 +84,24 @@ class Handler(base.Handler):
                 decompressed_file = GzipFile(fileobj=compressed_file)
                 data = decompressed_file.read()
                 logger.log('Decompressed the file, raw size is {} bytes'.format(len(data)))
+            return data
+
+    @staticmethod
+    def fetch(url: str, required: bool, verify_cert: bool, detect_compressed: bool, username: str, pwd: str, encoding: str) -> str:
+        """Fetch a file at the specified URL from the server, decompress if necessary and return its contents.
+        :param url: URL to fetch.
+        :param required: Whether to raise an exception on HTTP 404 error.
+        :param verify_cert: Whether to enforce SSL certificate check.
+        :param detect_compressed: Whether to detect and decompress compressed files.
+        :param username: Username to use for authentication. If None, authentication is not used.
+        :param pwd: Password to use for authentication. Ignored if username is None.
+        :param encoding: Encoding to use when decoding the HTTP data.
+        :return: File contents as text.
+        """
+        data = Handler.download(url, required, verify_cert, detect_compressed, username, pwd)
 
-            # Convert the binary data into text
-            return data.decode(encoding)
+        # Convert the binary data into text
+        return None if data is None else data.decode(encoding)
 
     def run(self, config):
         """Override the abstract method of the base class."""
@@ -89,6 +115,8 @@ class Handler(base.Handler):
         username           = config['username',               None]
         password           = config['password',               '']
         encoding           = config['encoding',               'utf-8']
+        max_downloads      = config['max_concurrent_downloads', 1]
+        max_buffered       = config['max_buffered_bytes',     64 * 1024 * 1024]
 
         # Substitute parameter values
         base_url = base_url.format(**config)
@@ -96,6 +124,9 @@ class Handler(base.Handler):
             username = username.format(**config)
         if password is not None:
             password = password.format(**config)
+        if type(max_downloads) is not int or max_downloads < 1:
+            raise errors.ConfigError(
+                'max_concurrent_downloads must be a positive integer, not "{}".'.format(max_downloads))
 
         # If there are no file definitions
         if file_defs is None:
@@ -112,7 +143,8 @@ class Handler(base.Handler):
             else:
                 sub_params = {k: config[k] for k in passthrough_params}
 
-            # Iterate through file definitions
+            # Resolve file definitions
+            files = []
             for file_def in file_defs:
                 # Fetch definition details
                 fd_name      = file_def['name']
@@ -120,14 +152,29 @@ class Handler(base.Handler):
                 handler_conf = file_def['handler']
 
                 # Perform config variable substitution
-                file_name = fd_name.format(**config)
+                files.append((fd_name.format(**config), fd_reqd, handler_conf))
+
+            # Download file contents, ahead of the handlers if required
+            if max_downloads == 1:
+                contents = (
+                    self.download(base_url + file_name, fd_reqd, verify_cert, detect_compressed, username, password)
+                    for file_name, fd_reqd, _ in files)
+            else:
+                contents = context.run_concurrently(
+                    lambda f: self.download(base_url + f[0], f[1], verify_cert, detect_compressed, username, password),
+                    files,
+                    max_downloads,
+                    max_queued=max_downloads,
+                    max_buffered_size=max_buffered)
 
-                # Download file content
-                file_content = self.fetch(
-                    base_url + file_name, fd_reqd, verify_cert, detect_compressed, username, password, encoding)
+            # Run the handlers, in the order of file definitions, for the files that exist
+            try:
+                for (file_name, _, handler_conf), data in zip(files, contents):
+                    if data is not None:
+                        sub_params['file_name']  = file_name
+                        sub_params[output_param] = data.decode(encoding)
+                        context.invoke_handler(handler_conf, sub_params)
 
-                # Run the handler, if the file exists
-                if file_content is not None:
-                    sub_params['file_name']  = file_name
-                    sub_params[output_param] = file_content
-                    context.invoke_handler(handler_conf, sub_params)
+            # Make sure outstanding downloads are cancelled on failure
+            finally:
+                contents.close()
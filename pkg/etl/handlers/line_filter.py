@@ -27,54 +27,104 @@ class Handler(base.Handler):
             negate              -- Boolean. Whether lines matching this rule are to be included (negate=false) or
                                    excluded (negate=true) from the output set. Optional, default is false.
 
+    If the input data is a line stream, lines that pass the filter are returned as a line stream, too, unless
+    'rejected_param' is given.
+
     :return dict containing 'data' parameter.
     """
-    def run(self, config) -> dict:
-        """Override the abstract method of the base class."""
-        # Get attributes from config
-        input_param      = config['input_param',    'data']
-        output_param     = config['output_param',   'data']
-        rejected_param   = config['rejected_param', None]
-        start_line       = int(config['start_line', 1])
-        skip_blank_lines = bool(config['skip_blank_lines', False])
-        criteria         = config['criteria', None]
+    reusable = True
+    streaming = True
 
+    @staticmethod
+    def compile_criteria(criteria, config) -> list:
+        """Validate the criteria and return them as a list of (search, is_regex, negate) tuples.
+        :param criteria: A single criterion, an array of criteria, or None.
+        :param config: Handler configuration, used for parameter substitution.
+        """
         # Convert a single criterion to a one-item list
-        if criteria is not None and type(criteria) is not list:
+        if criteria is None:
+            return []
+        if type(criteria) is not list:
             criteria = [criteria]
 
-        # Process the input lines
+        result = []
+        for criterion in criteria:
+            cr_search            = criterion['search']
+            cr_is_regex          = bool(criterion['is_regex',          False])
+            cr_substitute_params = bool(criterion['substitute_params', False])
+            cr_negate            = bool(criterion['negate',            False])
+            # Substitute params if needed
+            if cr_substitute_params:
+                cr_search = cr_search.format(**config)
+            result.append((re.compile(cr_search) if cr_is_regex else cr_search, cr_is_regex, cr_negate))
+        return result
+
+    @staticmethod
+    def classify_lines(lines, start_line: int, skip_blank_lines: bool, criteria: list, stats: dict):
+        """Generator yielding (line, do_include) tuples for the input lines that aren't skipped.
+        :param lines: Iterable of input lines.
+        :param start_line: Number of the line to start reading with (1-based).
+        :param skip_blank_lines: Whether to skip blank lines.
+        :param criteria: List of criteria returned by compile_criteria().
+        :param stats: Dictionary whose 'src' element is updated with the number of lines read.
+        """
         count_src_lines = 0
-        tgt_lines = []
-        rej_lines = []
-        for line in config.lines_list(input_param):
+        for line in lines:
             # Skip up to start_line
             count_src_lines += 1
+            stats['src'] = count_src_lines
             if count_src_lines < start_line:
                 continue
 
+            # Chomp the line
+            line = line.rstrip('\r\n')
+
             # Skip blank lines
             if skip_blank_lines and len(line) == 0:
                 continue
 
             # Process criteria, if any
             do_include = True
-            if criteria is not None:
-                for criterion in criteria:
-                    cr_search            = criterion['search']
-                    cr_is_regex          = bool(criterion['is_regex',          False])
-                    cr_substitute_params = bool(criterion['substitute_params', False])
-                    cr_negate            = bool(criterion['negate',            False])
-                    # Substitute params if needed
-                    if cr_substitute_params:
-                        cr_search = cr_search.format(**config)
-                    # Run the matching
-                    match = re.search(cr_search, line) is not None if cr_is_regex else cr_search in line
-                    # If the matching failed (it's an XOR condition effectively)
-                    if cr_negate == match:
-                        do_include = False
-                        break
+            for cr_search, cr_is_regex, cr_negate in criteria:
+                # Run the matching
+                match = cr_search.search(line) is not None if cr_is_regex else cr_search in line
+                # If the matching failed (it's an XOR condition effectively)
+                if cr_negate == match:
+                    do_include = False
+                    break
+            yield line, do_include
 
+    def run(self, config) -> dict:
+        """Override the abstract method of the base class."""
+        # Get attributes from config
+        input_param      = config['input_param',    'data']
+        output_param     = config['output_param',   'data']
+        rejected_param   = config['rejected_param', None]
+        start_line       = int(config['start_line', 1])
+        skip_blank_lines = bool(config['skip_blank_lines', False])
+        criteria         = self.compile_criteria(config['criteria', None], config)
+
+        stats = {'src': 0}
+        classified = self.classify_lines(config.lines(input_param), start_line, skip_blank_lines, criteria, stats)
+
+        # If the input is a stream and there are no rejected lines to collect, filter lazily
+        if isinstance(config[input_param], base.LineStream) and rejected_param is None:
+            def kept_lines():
+                count_tgt_lines = 0
+                for line, do_include in classified:
+                    if do_include:
+                        count_tgt_lines += 1
+                        yield line + '\n'
+                # Produce a single linebreak if nothing is kept, as the string output does
+                if count_tgt_lines == 0:
+                    yield '\n'
+                logger.log("Read {} input lines, kept {} lines".format(stats['src'], count_tgt_lines))
+            return {output_param: base.LineStream(kept_lines())}
+
+        # Process the input lines
+        tgt_lines = []
+        rej_lines = []
+        for line, do_include in classified:
             # Add an output line, if needed
             if do_include:
                 tgt_lines.append(line)
@@ -86,11 +136,11 @@ class Handler(base.Handler):
         # Log the stats and prepare the result
         result = {output_param: '\n'.join(tgt_lines) + '\n'}
         if rejected_param is None:
-            logger.log("Read {} input lines, kept {} lines".format(count_src_lines, len(tgt_lines)))
+            logger.log("Read {} input lines, kept {} lines".format(stats['src'], len(tgt_lines)))
         else:
             logger.log(
                 "Read {} input lines, kept {}, rejected {} lines".format(
-                    count_src_lines, len(tgt_lines), len(rej_lines)))
+                    stats['src'], len(tgt_lines), len(rej_lines)))
             result[rejected_param] = '\n'.join(rej_lines) + '\n'
 
         # Return the result
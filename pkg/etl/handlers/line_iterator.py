@@ -1,4 +1,6 @@
+from etl import errors
 from etl import logger
+from etl import profiler
 from etl import context
 from etl.handlers import base
 
@@ -14,11 +16,21 @@ class Handler(base.Handler):
         chomp              -- Boolean, whether to strip the terminating line-break. Optional, default is True.
         skip_blank_lines   -- Boolean, whether to skip invoking handler for blank lines (influenced by 'chomp'). Optional,
                               default is True.
+        workers            -- Number of handler invocations to run concurrently, on a pool of threads. Useful when the
+                              handler mostly waits for I/O. Every invocation gets its own copy of the parameters.
+                              Optional, default is 1 (invocations run one after another).
+        ordered            -- Boolean, only relevant when workers is greater than 1. If True, the log output of the
+                              invocations is written, and the first failure is raised, in the order of the lines;
+                              otherwise in the order the invocations finish. On failure, outstanding invocations are
+                              cancelled. Optional, default is True.
         handler            -- Handler configuration (see context.invoke_handler() for details). Handler's configuration
                               will be amended with the elements:
             <output_param>       -- Line text
             <passthrough_params> -- All the parameters specified in the 'passthrough_params' list.
     """
+    reusable = True
+    streaming = True
+
     def run(self, config):
         """Override the abstract method of the base class."""
         # Fetch the config parameters
@@ -34,16 +46,48 @@ class Handler(base.Handler):
         else:
             sub_params = {k: config[k] for k in passthrough_params}
 
-        # Read the input data
+        # Check the parallelism
+        workers = config['workers', 1]
+        ordered = bool(config['ordered', True])
+        if type(workers) is not int or workers < 1:
+            raise errors.ConfigError('workers must be a positive integer, not "{}".'.format(workers))
+        handler_conf = config['handler']
+
+        # Invoke the handler serially
+        if workers == 1:
+            for line_num, line in self.select_lines(config.lines(input_param), chomp, skip_blank_lines):
+                logger.log('Processing line #{}'.format(line_num))
+                sub_params[output_param] = line
+                context.invoke_handler(handler_conf, sub_params)
+                profiler.add_rows(1)
+
+        # Invoke the handler concurrently, with a separate copy of parameters for each line
+        else:
+            def invoke(item):
+                logger.log('Processing line #{}'.format(item[0]))
+                context.invoke_handler(handler_conf, item[1])
+
+            items = (
+                (line_num, dict(sub_params, **{output_param: line}))
+                for line_num, line in self.select_lines(config.lines(input_param), chomp, skip_blank_lines))
+            for _ in context.run_concurrently(invoke, items, workers, ordered):
+                profiler.add_rows(1)
+
+    @staticmethod
+    def select_lines(lines, chomp: bool, skip_blank_lines: bool):
+        """Generate lines the handler is to be invoked for, along with their numbers.
+        :param lines: Iterable of input lines.
+        :param chomp: Whether to strip the terminating line-break.
+        :param skip_blank_lines: Whether to skip blank lines.
+        :return Generator of tuples (line number, line).
+        """
         line_num = 0
-        for line in config.lines(input_param):
+        for line in lines:
             # Strip the linebreak if needed
             if chomp:
                 line = line.rstrip('\r\n')
 
-            # Invoke the handler
+            # Skip blank lines if needed
             if not skip_blank_lines or len(line) > 0:
                 line_num += 1
-                logger.log('Processing line #{}'.format(line_num))
-                sub_params[output_param] = line
-                context.invoke_handler(config['handler'], sub_params)
+                yield line_num, line
@@ -1,4 +1,3 @@
-import io
 from etl import logger
 from etl.handlers import base
 
@@ -16,21 +15,18 @@ class Handler(base.Handler):
         skip_blank_lines    -- Boolean, whether to skip blank lines (if True, blank lines are not counted for merging).
                                Optional, default is False. NB: detection of blank lines is influenced by 'trim_lines'.
         delimiter           -- Delimiter string to insert between concatenated strings. Optional, default is "".
+
+    If the input data is a line stream, the result is returned as a line stream, too.
     """
-    def run(self, config) -> dict:
-        """Override the abstract method of the base class."""
-        # Get attributes from config
-        input_param      = config['input_param',  'data']
-        output_param     = config['output_param', 'data']
-        src_data         = config.lines(input_param)
-        start_line       = int(config['start_line', 1])
-        merge_cnt        = int(config['num_lines_to_merge'])
-        trim_lines       = bool(config['trim_lines', False])
-        skip_blank_lines = bool(config['skip_blank_lines', False])
-        delimiter        = config['delimiter', '']
+    reusable = True
+    streaming = True
 
-        # Iterate through data lines
-        tgt_data = io.StringIO()
+    @staticmethod
+    def merge_lines(src_data, start_line: int, merge_cnt: int, trim_lines: bool, skip_blank_lines: bool,
+                    delimiter: str):
+        """Generator yielding merged lines, each terminated with a linebreak. See the class description for the meaning
+        of the parameters.
+        """
         count_src_lines = 0
         count_tgt_lines = 0
         count_merged    = 0
@@ -56,17 +52,34 @@ class Handler(base.Handler):
 
             # If merge threshold is reached
             if count_merged == merge_cnt:
-                tgt_data.write(merged_line + '\n')
+                yield merged_line + '\n'
                 count_tgt_lines += 1
                 count_merged = 0
                 merged_line = ''
 
         # Flush the possible remaining merged lines
         if count_merged > 0:
-            tgt_data.write(merged_line + '\n')
+            yield merged_line + '\n'
             count_tgt_lines += 1
 
         logger.log('Done. Input: {} lines, output: {} lines.'.format(count_src_lines, count_tgt_lines))
 
-        # Return the result
-        return {output_param: tgt_data.getvalue()}
+    def run(self, config) -> dict:
+        """Override the abstract method of the base class."""
+        # Get attributes from config
+        input_param      = config['input_param',  'data']
+        output_param     = config['output_param', 'data']
+        src_data         = config.lines(input_param)
+        start_line       = int(config['start_line', 1])
+        merge_cnt        = int(config['num_lines_to_merge'])
+        trim_lines       = bool(config['trim_lines', False])
+        skip_blank_lines = bool(config['skip_blank_lines', False])
+        delimiter        = config['delimiter', '']
+
+        # Iterate through data lines
+        tgt_data = self.merge_lines(src_data, start_line, merge_cnt, trim_lines, skip_blank_lines, delimiter)
+
+        # Return the result, lazily if the input is a stream
+        if isinstance(config[input_param], base.LineStream):
+            return {output_param: base.LineStream(tgt_data)}
+        return {output_param: ''.join(tgt_data)}
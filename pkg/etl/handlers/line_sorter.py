@@ -12,6 +12,8 @@ class Handler(base.Handler):
 
     :return dict containing 'data' parameter.
     """
+    reusable = True
+
     def run(self, config) -> dict:
         """Override the abstract method of the base class."""
         # Get attributes from config
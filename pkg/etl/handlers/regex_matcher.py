@@ -16,8 +16,35 @@ class Handler(base.Handler):
         unique       -- Boolean, specifies where the list of matches has to be deduplicated before handler invocation.
                         Optional, default is False.
 
+    If the input data is a line stream, it is matched line by line (so a match can't span lines), and the matches are
+    returned as a line stream, too.
+
     :return dict containing 'data' parameter.
     """
+    reusable = True
+    streaming = True
+
+    @staticmethod
+    def match_lines(lines, regex: str, group: int, unique: bool):
+        """Generator yielding matches found in the input lines, each terminated with a linebreak."""
+        pattern = re.compile(regex)
+        seen = set()
+        count = 0
+        for line in lines:
+            for match in pattern.finditer(line):
+                m = match.group(group)
+                # Deduplicate matches if needed, keeping the order
+                if unique:
+                    if m in seen:
+                        continue
+                    seen.add(m)
+                count += 1
+                yield m + '\n'
+        # Produce a single linebreak if nothing matches, as the string output does
+        if count == 0:
+            yield '\n'
+        logger.log("Found {}{} match(es)".format(count, ' unique' if unique else ''))
+
     def run(self, config) -> dict:
         """Override the abstract method of the base class."""
         # Get attributes from config
@@ -28,6 +55,10 @@ class Handler(base.Handler):
         group        = int(config['group_num'])
         unique       = bool(config['unique', False])
 
+        # Stream: match lazily
+        if isinstance(data, base.LineStream):
+            return {output_param: base.LineStream(self.match_lines(data, regex, group, unique))}
+
         # Collect all matches
         matches = [match.group(group) for match in re.finditer(regex, data)]
 
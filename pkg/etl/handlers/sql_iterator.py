@@ -0,0 +1,106 @@
+import itertools
+from etl import errors
+from etl import logger
+from etl import profiler
+from etl import context
+from etl.handlers import base
+from etl.handlers import sql_query
+
+
+class Handler(base.Handler):
+    """Executes an SQL query and invokes a handler on each row of the result, with the column values passed as
+    parameters. The rows are fetched in batches, as the invocations go, so only a batch of rows is kept in memory.
+
+    Relevant configuration entries:
+        database           -- Name of the database connection. Can refer to handler's own configuration parameters in
+                              the form '{name}'.
+        sql                -- SQL query. May contain parameter references in the form ':name'.
+        params             -- Array of parameter definitions. Optional. Each element is an object consisting of:
+            name               -- Parameter name.
+            value              -- Parameter value. Can refer to handler's own configuration parameters in the form
+                                  '{name}'.
+        arraysize          -- Number of rows fetched from the database at once. Optional, default is 1000.
+        prefetch_rows      -- Number of rows returned by the database along with the query execution (Oracle only).
+                              Optional, default is the driver's default.
+        progress_rows      -- Number of rows after which the fetch progress is logged. Optional, default is 1000000.
+        passthrough_params -- Array specifying names of configuration params to be passed-through to child handler(s).
+                              Optional.
+        workers            -- Number of handler invocations to run concurrently, on a pool of threads. Useful when the
+                              handler mostly waits for I/O. Every invocation gets its own copy of the parameters.
+                              Optional, default is 1 (invocations run one after another).
+        ordered            -- Boolean, only relevant when workers is greater than 1. If True, the log output of the
+                              invocations is written, and the first failure is raised, in the order of the rows;
+                              otherwise in the order the invocations finish. On failure, outstanding invocations are
+                              cancelled. Optional, default is True.
+        handler            -- Handler configuration (see context.invoke_handler() for details). Handler's configuration
+                              will be amended with the elements:
+            <column name>        -- Value of the column in the current row, as returned by the database driver (e.g. a
+                                    number or a datetime value rather than a string), for every column of the result.
+            <passthrough_params> -- All the parameters specified in the 'passthrough_params' list.
+    """
+    reusable = True
+
+    # Number of rows fetched at once, by default
+    default_arraysize = 1000
+
+    def run(self, config):
+        """Override the abstract method of the base class."""
+        # Fetch the config parameters
+        db_name            = config['database']
+        sql                = config['sql']
+        params             = config['params',             None]
+        arraysize          = int(config['arraysize',      self.default_arraysize])
+        prefetch_rows      = config['prefetch_rows',      None]
+        progress_rows      = int(config['progress_rows',  1000000])
+        passthrough_params = config['passthrough_params', None]
+        if arraysize < 1:
+            raise errors.ConfigError('Invalid arraysize value: {} (must be positive)'.format(arraysize))
+        if progress_rows < 1:
+            raise errors.ConfigError('Invalid progress_rows value: {} (must be positive)'.format(progress_rows))
+
+        # Prepare child params
+        if passthrough_params is None:
+            sub_params = {}
+        else:
+            sub_params = {k: config[k] for k in passthrough_params}
+
+        # Check the parallelism
+        workers = config['workers', 1]
+        ordered = bool(config['ordered', True])
+        if type(workers) is not int or workers < 1:
+            raise errors.ConfigError('workers must be a positive integer, not "{}".'.format(workers))
+        handler_conf = config['handler']
+
+        # Substitute params in the DB connection and prepare query parameters
+        db_name = db_name.format(**config)
+        db_params = {}
+        if params is not None:
+            for param in params:
+                db_params[param['name']] = param['value'].format(**config)
+
+        # Execute the query, fetching the rows in batches as they are consumed
+        batches = sql_query.Handler.fetch_batches(
+            db_name, sql, db_params, arraysize, prefetch_rows, progress_rows, arraysize, {'rows': 0})
+        try:
+            col_names = next(batches)
+            rows = enumerate(itertools.chain.from_iterable(batches), 1)
+
+            # Invoke the handler serially
+            if workers == 1:
+                for row_num, row in rows:
+                    logger.log('Processing row #{}'.format(row_num))
+                    sub_params.update(zip(col_names, row))
+                    context.invoke_handler(handler_conf, sub_params)
+                    profiler.add_rows(1)
+
+            # Invoke the handler concurrently, with a separate copy of parameters for each row
+            else:
+                def invoke(item):
+                    logger.log('Processing row #{}'.format(item[0]))
+                    context.invoke_handler(handler_conf, item[1])
+
+                items = ((row_num, dict(sub_params, **dict(zip(col_names, row)))) for row_num, row in rows)
+                for _ in context.run_concurrently(invoke, items, workers, ordered):
+                    profiler.add_rows(1)
+        finally:
+            batches.close()
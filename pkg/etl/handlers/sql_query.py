@@ -1,4 +1,10 @@
+import itertools
+import sys
+import time
+from importlib import import_module
+from etl import errors
 from etl import logger
+from etl import profiler
 from etl import context
 from etl.handlers import base
 
@@ -8,6 +14,15 @@ class Handler(base.Handler):
 
     Relevant configuration entries:
         output_param     -- Name of the parameter used for returning result data. Optional, default is 'data'.
+        output_file      -- Name of the file to write the result data into, instead of returning it. The records are
+                            written as they are fetched. Can be absolute or relative to the config file, and can refer
+                            to handler's own configuration parameters in the form '{name}'. Optional.
+        stream           -- Boolean, whether to return the result data as a line stream, which executes the query and
+                            fetches the records lazily, as the lines are consumed. Requires record_delimiter ending with
+                            a linebreak. Optional, default is False.
+        output_format    -- Format of the result data: 'text' (delimited text) or 'arrow' (typed columnar batches in the
+                            Arrow IPC streaming format, returned as bytes or written into output_file; requires
+                            pyarrow). Optional, default is 'text'.
         database         -- Name of the target database connection. Can refer to handler's own configuration parameters
                             in the form '{name}'.
         field_delimiter  -- String to be used as field delimiter in the output text. Optional, default is empty string.
@@ -16,31 +31,198 @@ class Handler(base.Handler):
         col_headers      -- Boolean, if True, outputs column headers as the first record, separated by field_delimiter.
                             Optional, default is False.
         quotechar        -- Quote character for field values and column names. Optional, default is None.
+        arraysize        -- Number of rows fetched from the database per round-trip. Optional, default is the driver's
+                            default.
+        prefetch_rows    -- Number of rows returned by the database along with the query execution (Oracle only).
+                            Optional, default is the driver's default.
+        progress_rows    -- Number of rows after which the progress is logged. Optional, default is 1000000.
+        cache            -- Boolean, whether to cache the result for the duration of the run, so that repeated queries
+                            with the same SQL and parameter values don't hit the database. Cached results of a database
+                            are dropped once a handler writes to it. Can't be used with stream or output_file.
+                            Optional, default is False.
+        cache_ttl        -- Time in seconds after which the cached result expires. Optional, default is the query_cache
+                            ttl setting (no expiry unless specified).
         sql              -- SQL query. May contain parameter references in the form ':name'.
         params           -- Array of parameter definitions. Optional. Each element is an object consisting of:
             name             -- Parameter name.
             value            -- Parameter value. Can refer to handler's own configuration parameters in the form
                                 '{name}'.
     """
+    reusable = True
 
     QUOTE_OPEN  = {None: '', '(': '(', '[': '[', '{': '{', '<': '<'}
     QUOTE_CLOSE = {None: '', '(': ')', '[': ']', '{': '}', '<': '>'}
 
+    OUTPUT_FORMATS = ('text', 'arrow')
+
+    columnar_batch_rows = 10000
+    """Number of rows in a columnar batch, unless arraysize is specified."""
+
+    @staticmethod
+    def fetch_records(
+            db_name: str, sql: str, db_params: dict, arraysize: int, prefetch_rows: int, progress_rows: int,
+            col_headers: bool, fld_delimiter: str, qopen: str, qclose: str, stats: dict):
+        """Generator executing the query and yielding the formatted records (without record delimiters) as they are
+        fetched. The connection is borrowed from the pool for the duration of the iteration.
+        :param stats: Dictionary whose 'rows' element is updated with the number of rows fetched.
+        """
+        with context.db_connection(db_name) as db_conn:
+            cur = db_conn.query_cursor(arraysize, prefetch_rows)
+            try:
+                cur.execute(sql, db_params)
+                records = iter(cur)
+                count_rows = 0
+                start = time.perf_counter()
+
+                # Output column headers, if needed. Fetch the first record beforehand, as server-side cursors only
+                # describe the columns once the data is fetched
+                if col_headers:
+                    first = next(records, None)
+                    yield fld_delimiter.join([qopen + d[0] + qclose for d in cur.description])
+                    records = itertools.chain([] if first is None else [first], records)
+
+                # Read the returned data
+                for record in records:
+                    yield fld_delimiter.join([qopen + str(v) + qclose for v in record])
+                    count_rows += 1
+                    stats['rows'] = count_rows
+                    if count_rows % progress_rows == 0:
+                        logger.info('Fetched {} rows from {} ({:.0f} rows/s)'.format(
+                            count_rows, db_name, count_rows / max(time.perf_counter() - start, 1e-9)))
+            finally:
+                cur.close()
+        logger.log('Done. Read {} rows from {} ({:.0f} rows/s)'.format(
+            count_rows, db_name, count_rows / max(time.perf_counter() - start, 1e-9)))
+
+    @staticmethod
+    def fetch_batches(
+            db_name: str, sql: str, db_params: dict, arraysize: int, prefetch_rows: int, progress_rows: int,
+            batch_rows: int, stats: dict):
+        """Generator executing the query and yielding the list of column names, followed by lists of rows fetched with
+        fetchmany(). The connection is borrowed from the pool for the duration of the iteration.
+        :param batch_rows: Maximum number of rows in a list.
+        :param stats: Dictionary whose 'rows' element is updated with the number of rows fetched.
+        """
+        with context.db_connection(db_name) as db_conn:
+            cur = db_conn.query_cursor(arraysize, prefetch_rows)
+            try:
+                cur.execute(sql, db_params)
+                count_rows = 0
+                start = time.perf_counter()
+
+                # Fetch the first batch beforehand, as server-side cursors only describe the columns once the data is
+                # fetched
+                rows = cur.fetchmany(batch_rows)
+                yield [d[0] for d in cur.description]
+
+                # Read the returned data
+                while rows:
+                    yield rows
+                    count_rows += len(rows)
+                    stats['rows'] = count_rows
+                    if count_rows // progress_rows > (count_rows - len(rows)) // progress_rows:
+                        logger.info('Fetched {} rows from {} ({:.0f} rows/s)'.format(
+                            count_rows, db_name, count_rows / max(time.perf_counter() - start, 1e-9)))
+                    rows = cur.fetchmany(batch_rows)
+            finally:
+                cur.close()
+        logger.log('Done. Read {} rows from {} ({:.0f} rows/s)'.format(
+            count_rows, db_name, count_rows / max(time.perf_counter() - start, 1e-9)))
+
+    @staticmethod
+    def import_pyarrow():
+        """Import and return the pyarrow module, raising ConfigError if it isn't installed."""
+        try:
+            return import_module('pyarrow')
+        except ImportError:
+            raise errors.ConfigError('output_format "arrow" requires the pyarrow package')
+
+    @classmethod
+    def write_arrow(cls, sink, batches) -> int:
+        """Write the batches produced by fetch_batches() into the sink in the Arrow IPC streaming format. Column types
+        are inferred from the first batch; columns holding only nulls there are written as strings.
+        :param sink: Writable binary file-like object or pyarrow output stream.
+        :param batches: Iterable yielding the list of column names, followed by lists of rows.
+        :return Number of batches written.
+        """
+        pa = cls.import_pyarrow()
+
+        def to_columns(rows: list, types: list) -> list:
+            """Convert the rows into Arrow arrays of the given types (None means the type is inferred)."""
+            try:
+                return [pa.array(values, type=t) for values, t in zip(zip(*rows), types)]
+            except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+                raise errors.DataError('Failed to convert batch #{} into Arrow format: {}'.format(count_batches + 1, e))
+
+        # Infer the schema from the first batch of rows
+        count_batches = 0
+        names = next(batches)
+        rows = next(batches, None)
+        columns = to_columns(rows, [None] * len(names)) if rows else [pa.nulls(0)] * len(names)
+        schema = pa.schema([
+            pa.field(name, pa.string() if pa.types.is_null(column.type) else column.type)
+            for name, column in zip(names, columns)])
+        columns = [column.cast(f.type) for column, f in zip(columns, schema)]
+
+        # Write the batches, converting the rows into columns of the schema types
+        with pa.ipc.new_stream(sink, schema) as writer:
+            while rows:
+                writer.write_batch(pa.RecordBatch.from_arrays(columns, schema=schema))
+                count_batches += 1
+                rows = next(batches, None)
+                if rows:
+                    columns = to_columns(rows, schema.types)
+        return count_batches
+
     def run(self, config):
         """Override the abstract method of the base class."""
         # Get attributes from config
         output_param  = config['output_param',     'data']
+        output_file   = config['output_file',      None]
+        stream        = bool(config['stream',      False])
+        output_format = config['output_format',    'text']
         db_name       = config['database']
         fld_delimiter = config['field_delimiter',  '']
         rec_delimiter = config['record_delimiter', '\n']
         col_headers   = config['col_headers',      False]
         quotechar     = config['quotechar',        None]
+        arraysize     = config['arraysize',        None]
+        prefetch_rows = config['prefetch_rows',    None]
+        progress_rows = int(config['progress_rows', 1000000])
         sql           = config['sql']
         params        = config['params',           None]
+        use_cache     = bool(config['cache',       False])
+        cache_ttl     = config['cache_ttl',        None]
+
+        # Validate the output options
+        if output_format not in self.OUTPUT_FORMATS:
+            raise errors.ConfigError('Invalid output_format value: "{}" (must be one of: {})'.format(
+                output_format, ', '.join(self.OUTPUT_FORMATS)))
+        if stream and output_format != 'text':
+            raise errors.ConfigError('stream is only supported with output_format "text"')
+        if stream and output_file is not None:
+            raise errors.ConfigError('stream and output_file can\'t be used together')
+        if stream and not rec_delimiter.endswith('\n'):
+            raise errors.ConfigError('stream requires record_delimiter ending with a linebreak')
+        if arraysize is not None:
+            arraysize = int(arraysize)
+            if arraysize < 1:
+                raise errors.ConfigError('Invalid arraysize value: {} (must be positive)'.format(arraysize))
+        if prefetch_rows is not None:
+            prefetch_rows = int(prefetch_rows)
+            if prefetch_rows < 0:
+                raise errors.ConfigError('Invalid prefetch_rows value: {} (must not be negative)'.format(prefetch_rows))
+        if progress_rows < 1:
+            raise errors.ConfigError('Invalid progress_rows value: {} (must be positive)'.format(progress_rows))
+        if use_cache and (stream or output_file is not None):
+            raise errors.ConfigError('cache can\'t be used with stream or output_file')
+        if cache_ttl is not None:
+            cache_ttl = float(cache_ttl)
+            if cache_ttl <= 0:
+                raise errors.ConfigError('Invalid cache_ttl value: {} (must be positive)'.format(cache_ttl))
 
-        # Substitute params in the DB connection and find it
+        # Substitute params in the DB connection
         db_name = db_name.format(**config)
-        db_conn = context.get_db_connection(db_name)
 
         # Prepare quote strings
         qopen  = self.QUOTE_OPEN [quotechar] if quotechar in self.QUOTE_OPEN  else quotechar
@@ -54,21 +236,72 @@ class Handler(base.Handler):
                 p_value = param['value']
                 db_params[p_name] = p_value.format(**config)
 
-        # Execute the query
-        cur = db_conn.cursor()
-        records = []
-        try:
-            cur.execute(sql, db_params)
+        # Serve the result from the run-scoped cache, if possible
+        cache = None
+        if use_cache:
+            cache = context.get_query_cache()
+            cache_key = (
+                sql, tuple(sorted(db_params.items())), output_format, fld_delimiter, rec_delimiter, bool(col_headers),
+                qopen, qclose)
+            cached = cache.get(db_name, cache_key)
+            if cached is not None:
+                logger.log('Done. Read {} rows from {} (cached)'.format(cached[1], db_name))
+                return {output_param: cached[0]}
+            # Any writes to the database from now on make the result stale
+            generation = cache.generation(db_name)
+
+        # Columnar output: fetch batches of rows and convert them into typed columns
+        stats = {'rows': 0}
+        if output_format == 'arrow':
+            pa = self.import_pyarrow()
+            batches = self.fetch_batches(
+                db_name, sql, db_params, arraysize, prefetch_rows, progress_rows,
+                arraysize or self.columnar_batch_rows, stats)
+            try:
+                if output_file is not None:
+                    output_file = context.get_absolute_file_name(output_file.format(**config))
+                    with open(output_file, 'wb') as f:
+                        count_batches = self.write_arrow(f, batches)
+                    logger.info('File {} is written ({} rows in {} batches).'.format(
+                        output_file, stats['rows'], count_batches))
+                    result = None
+                else:
+                    sink = pa.BufferOutputStream()
+                    self.write_arrow(sink, batches)
+                    result = {output_param: sink.getvalue().to_pybytes()}
+            finally:
+                # Release the connection even if the conversion has failed
+                batches.close()
+
+        else:
+            # Prepare to fetch the records
+            records = self.fetch_records(
+                db_name, sql, db_params, arraysize, prefetch_rows, progress_rows, col_headers, fld_delimiter, qopen,
+                qclose, stats)
+
+            # Streaming mode: the query will be executed as the lines are consumed
+            if stream:
+                logger.log('Streaming rows from {}'.format(db_name))
+                return {output_param: base.LineStream(record + rec_delimiter for record in records)}
+
+            # Execute the query and write the records into the file as they are fetched
+            if output_file is not None:
+                output_file = context.get_absolute_file_name(output_file.format(**config))
+                with open(output_file, 'w', encoding='utf-8') as f:
+                    for record in records:
+                        f.write(record)
+                        f.write(rec_delimiter)
+                logger.info('File {} is written ({} rows).'.format(output_file, stats['rows']))
+                result = None
 
-            # Output column headers, if needed
-            if col_headers:
-                records.append(fld_delimiter.join([qopen + d[0] + qclose for d in cur.description]))
+            # Execute the query and collect the records
+            else:
+                result = {output_param: rec_delimiter.join(records) + rec_delimiter}
 
-            # Read the returned data
-            for record in cur:
-                records.append(fld_delimiter.join([qopen + str(v) + qclose for v in record]))
-        finally:
-            cur.close()
+        # Cache the result
+        if cache is not None:
+            value = result[output_param]
+            cache.put(db_name, cache_key, (value, stats['rows']), sys.getsizeof(value), generation, cache_ttl)
 
-        logger.log('Done. Read {} rows from {}'.format(len(records), db_name))
-        return {output_param: rec_delimiter.join(records) + rec_delimiter}
+        profiler.add_rows(stats['rows'])
+        return result
@@ -1,12 +1,20 @@
+import csv
+import itertools
 from etl import errors
 from etl import logger
+from etl import profiler
 from etl import context
 from etl.handlers import base
+from etl.handlers import db_uploader
 
 
 class Handler(base.Handler):
     """Allows to execute an SQL statement against the database.
 
+    If param_mappings are specified, the statement(s) are executed once per line of the input data, which can also be a
+    line stream, with the parameter values taken from the line. The parameter sets are bound in batches of batch_size
+    lines, each statement being executed once per batch (array binding).
+
     Relevant configuration entries:
         database    -- Name of the target database connection. Can refer to handler's own configuration parameters in
                        the form '{name}'.
@@ -14,16 +22,48 @@ class Handler(base.Handler):
                        references in the form ':name'.
         commit_stmt -- Statement commit policy. Optional, default is 'each'. Allowed values:
             'none'      -- Do not issue any implicit commits.
-            'each'      -- Commit after each statement.
+            'each'      -- Commit after each statement (after each batch, if param_mappings are specified).
             'all'       -- Commit once after all statements.
         params      -- Array of parameter definitions. Optional. Each element is an object consisting of:
             name        -- Parameter name.
             value       -- Parameter value. Can refer to handler's own configuration parameters in the form '{name}'.
+        input_param -- Name of the parameter used for reading input data, if param_mappings are specified. Optional,
+                       default is 'data'.
+        format      -- Format of the input data, either 'fixed' (fixed-width fields) or 'delimited' (fields are
+                       delimited with 'delimiter'). Mandatory if param_mappings are specified.
+        delimiter   -- Field delimiter character. Mandatory if 'format' is 'delimited', otherwise ignored.
+        quotechar   -- Quote character. Optional if 'format' is 'delimited', otherwise ignored.
+        start_line  -- Integer, number of the line to start with (1-based). Optional, default is 1.
+        batch_size  -- Number of lines bound at once. Optional, default is 1000.
+        param_mappings
+                    -- Array of objects describing the parameters taken from the input data lines, in addition to the
+                       ones given in params. Each object consists of:
+            name            -- Parameter name.
+            datatype        -- Datatype of the value, one of "string", "number", "integer", "datetime".
+            length          -- Data length. Mandatory for parameters of datatype "string", ignored for all other
+                               datatypes.
+            truncate        -- Whether to truncate data whose length exceeds length value, rather than raise an error.
+                               Optional, default is False.
+            source_pos      -- Column boundary specification in the format '<left_pos>:<right_pos>' (1-based,
+                               inclusive). Mandatory for fixed-width data, otherwise ignored.
+            source_index    -- 0-based index of the source column in the data. Mandatory for delimited data, otherwise
+                               ignored.
+            source_trim     -- Trimming (whitespace removal) mode for source values, one of 'none', 'left', 'right',
+                               'both'. Optional, default is 'none'.
+            source_format   -- Format of the source data for the 'datetime' datatype, e.g. 'YYYYMMDD'. If given, the
+                               value is parsed by the handler and bound as datetime, otherwise it's bound as string.
+                               Optional.
     """
+    reusable = True
+    streaming = True
+
     COMMIT_NONE = 0
     COMMIT_EACH = 1
     COMMIT_ALL  = 2
 
+    # Number of parameter sets bound at once, by default
+    default_batch_size = 1000
+
     def run(self, config):
         """Override the abstract method of the base class."""
         # Get attributes from config
@@ -31,6 +71,7 @@ class Handler(base.Handler):
         sql         = config['sql']
         params      = config['params', None]
         commit_stmt = config['commit_stmt', 'each']
+        mappings    = config['param_mappings', None]
 
         if commit_stmt == 'none':
             commit_policy = self.COMMIT_NONE
@@ -41,18 +82,17 @@ class Handler(base.Handler):
         else:
             raise errors.ConfigError('Invalid value for commit_stmt: "{}"'.format(commit_stmt))
 
-        # Substitute params in the DB connection and find it
+        # Substitute params in the DB connection
         db_name = db_name.format(**config)
-        db_conn = context.get_db_connection(db_name)
-
-        # Initiate a transaction, if all statements are committed at once
-        if not context.dry_run_mode and commit_policy == self.COMMIT_ALL:
-            db_conn.begin()
 
         # Prepare statement(s). If a single statement is given, transform it into a single-element list
         if type(sql) is not list:
             sql = [sql]
 
+        # Line streams can only be consumed as the input data lines, any other use requires them as strings
+        if mappings is None:
+            base.materialise(config)
+
         # Prepare parameters, if needed
         db_params = {}
         if params is not None:
@@ -61,16 +101,118 @@ class Handler(base.Handler):
                 p_value = param['value']
                 db_params[p_name] = p_value.format(**config)
 
-        # Execute the statement(s)
-        if not context.dry_run_mode:
-            for stmt in sql:
-                db_conn.execute(stmt, db_params)
-                # Commit if needed
-                if commit_policy == self.COMMIT_EACH:
-                    db_conn.commit()
+        # Execute the statement(s) per input data line, if required
+        if mappings is not None:
+            self.run_batches(config, db_name, sql, db_params, mappings, commit_policy)
+            return
+
+        # Borrow a connection from the pool
+        with context.db_connection(db_name, writes=True) as db_conn:
+            # Initiate a transaction, if all statements are committed at once
+            if not context.dry_run_mode and commit_policy == self.COMMIT_ALL:
+                db_conn.begin()
+
+            # Execute the statement(s)
+            if not context.dry_run_mode:
+                for stmt in sql:
+                    db_conn.execute(stmt, db_params)
+                    # Commit if needed
+                    if commit_policy == self.COMMIT_EACH:
+                        db_conn.commit()
 
-        # Execute a commit, if all statements are committed at once
-        if not context.dry_run_mode and commit_policy == self.COMMIT_ALL:
-            db_conn.commit()
+            # Execute a commit, if all statements are committed at once
+            if not context.dry_run_mode and commit_policy == self.COMMIT_ALL:
+                db_conn.commit()
 
         logger.log(context.dry_run_prefix + 'Done. {} statement(s) executed on {}'.format(len(sql), db_name))
+
+    def run_batches(self, config, db_name: str, sql: list, db_params: dict, mappings: list, commit_policy: int):
+        """Execute the statements with the parameter sets taken from the input data lines, in batches.
+        :param config: Handler configuration.
+        :param db_name: Name of the database connection.
+        :param sql: List of statements to execute.
+        :param db_params: Parameters common to all the lines.
+        :param mappings: List of parameter mapping configurations.
+        :param commit_policy: One of the COMMIT_* values.
+        """
+        # Get attributes from config
+        input_param = config['input_param', 'data']
+        data_format = config['format']
+        start_line  = int(config['start_line', 1])
+        batch_size  = db_uploader.Handler.parse_batch_size(config['batch_size', self.default_batch_size])
+        fmt_fixed     = data_format == 'fixed'
+        fmt_delimited = data_format == 'delimited'
+        if not fmt_fixed and not fmt_delimited:
+            raise errors.ConfigError('Invalid format value: "{}".'.format(data_format))
+        if batch_size == 'auto':
+            raise errors.ConfigError('Invalid batch_size value: "auto" (must be a positive integer)')
+
+        # Validate and compile the mappings before touching the database. Every parameter must refer to a source value
+        for pm in mappings:
+            if ('source_pos' if fmt_fixed else 'source_index') not in pm:
+                raise errors.ConfigError('Parameter "{}" must have {} specified'.format(
+                    pm['name'], 'source_pos' if fmt_fixed else 'source_index'))
+        names         = [pm['name'] for pm in mappings]
+        extractors    = db_uploader.Handler.compile_mappings(mappings, fmt_fixed, fmt_delimited, True)
+        convert_batch = db_uploader.Handler.compile_batch_converter(mappings, fmt_fixed, True)
+
+        # Open the input data, as CSV if it's delimited
+        input_data = config.lines(input_param)
+        if fmt_delimited:
+            args = {'delimiter': config['delimiter'], 'strict': True}
+            if config['quotechar', None] is not None:
+                args['quotechar'] = config['quotechar']
+            input_data = csv.reader(input_data, **args)
+
+        # Convert the lines lazily into parameter sets, adding the common parameters
+        stats = {'src': 0, 'tgt': 0}
+        param_sets = (
+            dict(db_params, **dict(zip(names, row)))
+            for row in db_uploader.Handler.convert_rows(
+                input_data, start_line, fmt_fixed, extractors, stats, convert_batch=convert_batch))
+
+        # Borrow a connection from the pool
+        affected = [0] * len(sql)
+        with context.db_connection(db_name, writes=True) as db_conn:
+            # In dry-run mode, only validate the data
+            if context.dry_run_mode:
+                for _ in param_sets:
+                    pass
+
+            else:
+                # Initiate a transaction, if all statements are committed at once
+                if commit_policy == self.COMMIT_ALL:
+                    db_conn.begin()
+
+                # Execute every statement for each batch of parameter sets
+                cur = db_conn.cursor(array_bind_size=batch_size)
+                try:
+                    while True:
+                        batch = list(itertools.islice(param_sets, batch_size))
+                        if not batch:
+                            break
+                        for i, stmt in enumerate(sql):
+                            cur.executemany(stmt, batch)
+                            # Drivers report -1 if the count is unknown
+                            if cur.rowcount is not None and cur.rowcount >= 0 and affected[i] is not None:
+                                affected[i] += cur.rowcount
+                            else:
+                                affected[i] = None
+                            # Commit if needed
+                            if commit_policy == self.COMMIT_EACH:
+                                db_conn.commit()
+                finally:
+                    cur.close()
+
+                # Execute a commit, if all statements are committed at once
+                if commit_policy == self.COMMIT_ALL:
+                    db_conn.commit()
+
+        # Report the results
+        profiler.add_rows(stats['tgt'])
+        logger.log(context.dry_run_prefix + 'Done. {} statement(s) executed on {} for {} lines'.format(
+            len(sql), db_name, stats['tgt']))
+        if not context.dry_run_mode:
+            for i, count in enumerate(affected):
+                logger.info('Statement {} of {}: {} rows affected'.format(
+                    i + 1, len(sql), 'unknown number of' if count is None else count))
@@ -17,7 +17,39 @@ class Handler(base.Handler):
             count        -- Maximal number  of occurrences to replace. If 0, all occurrences are replaced. Optional,
                             default is 0.
             is_regex     -- Boolean. Whether 'search' is a regex to match. Optional, default is False.
+
+    If the input data is a line stream, the rules are applied line by line (so a search can't match across lines), and
+    the result is returned as a line stream, too.
     """
+    reusable = True
+    streaming = True
+
+    @staticmethod
+    def replace_lines(lines, rules: list):
+        """Generator yielding input lines with the replacement rules applied.
+        :param lines: Iterable of input lines.
+        :param rules: List of [search, replace, remaining_count, is_regex] lists, where remaining_count is None for
+            unlimited replacement. Remaining counts are updated while processing.
+        """
+        size_in  = 0
+        size_out = 0
+        for line in lines:
+            size_in += len(line)
+            for rule in rules:
+                search, replace, remaining, is_regex = rule
+                if remaining == 0:
+                    continue
+                if is_regex:
+                    line, count = search.subn(replace, line, remaining or 0)
+                else:
+                    count = line.count(search)
+                    line = line.replace(search, replace, -1 if remaining is None else remaining)
+                if remaining is not None:
+                    rule[2] = max(remaining - count, 0)
+            size_out += len(line)
+            yield line
+        logger.log('Done. Input: {} bytes, output: {} bytes.'.format(size_in, size_out))
+
     def run(self, config) -> dict:
         """Override the abstract method of the base class."""
         # Get attributes from config
@@ -25,9 +57,22 @@ class Handler(base.Handler):
         output_param = config['output_param', 'data']
         data         = config[input_param]
         rules        = config['rules']
-        size_in = len(data)
+
+        # Stream: process the data line by line
+        if isinstance(data, base.LineStream):
+            line_rules = []
+            for rule in rules:
+                count    = int(rule['count', 0])
+                is_regex = bool(rule['is_regex', False])
+                line_rules.append([
+                    re.compile(rule['search']) if is_regex else rule['search'],
+                    rule['replace'],
+                    count if count > 0 else None,
+                    is_regex])
+            return {output_param: base.LineStream(self.replace_lines(data, line_rules))}
 
         # Iterate through rules
+        size_in = len(data)
         for rule in rules:
             search   = rule['search']
             replace  = rule['replace']
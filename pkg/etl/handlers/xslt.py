@@ -14,6 +14,8 @@ class Handler(base.Handler):
 
     :return dict containing parameter whose name is given by 'output_param'.
     """
+    reusable = True
+
     def run(self, config) -> dict:
         """Override the abstract method of the base class."""
         # Get attributes from config
@@ -13,8 +13,16 @@ Configuration file
         - name          String  Mandatory. Name of the process.
         - comment       String  Optional. Description of the process. Default is empty string.
         - stop_on_error Boolean Optional. Whether to terminate processing on an unhandled exception. Default is True.
+        - depends_on    Array   Optional. Names of the processes that must finish successfully before this one starts.
+                                If any of them fails, this process is skipped and counted as failed. Default is empty
+                                array, in which case the process only has to wait for its turn (see max_parallel).
         - handler       Handler Mandatory. Handler configuration (see context.invoke_handler() for details).
 
+    * max_parallel      Number  Optional. Maximum number of processes allowed to run simultaneously. Processes are
+                                started in the order they're listed in, as soon as their dependencies are satisfied and
+                                a slot is available. Default is 1, meaning processes run one after another. Note: this
+                                setting can be overridden on the command line with the `--max-parallel` option.
+
     * databases         Array   Mandatory if any handlers requiring a database connection are used. Each element is an
                                 object describing a database connection by providing the following elements:
         - name          String  Mandatory. Unique database name, used as a reference in other places.
@@ -22,8 +30,19 @@ Configuration file
                                 Available drivers   Driver configuration format
                                 -----------------   ---------------------------
                                 oracle              host:port:sid
+                                postgresql          host:port:dbname
+                                sqlite              file_name[;pragma=value...]
         - username      String  Mandatory. DB user name.
         - password      String  Mandatory. DB user password.
+        - pool_min_size Integer Optional. Number of connections opened upfront and kept open. Default is 0.
+        - pool_max_size Integer Optional. Maximum number of open connections. Default is 8.
+        - pool_max_idle_time
+                        Number  Optional. Time in seconds after which an idle connection is closed. Default is 300.
+        - pool_validation_interval
+                        Number  Optional. Time in seconds a connection has to be idle for to be checked (and replaced if
+                                dead) before being handed out. Default is 30.
+        - pool_timeout  Number  Optional. Maximum time in seconds to wait for a connection when all are in use. By
+                                default, waits indefinitely.
 
     * log               Object  Optional. Logging configuration, consisting of the following elements:
         - file          String  Optional. Name of the log file. If omitted, all the logging will be output to the
@@ -36,7 +55,11 @@ Configuration file
                                 handler (but can be overridden by scoped parameters).
 """
 import sys
+import threading
+import concurrent.futures
+from . import errors
 from . import logger
+from . import profiler
 from . import context
 from . import config
 
@@ -44,7 +67,9 @@ from . import config
 class Loader(object):
     """A flexible data loader driven by a configuration file, that is passed in the constructor."""
 
-    def __init__(self, config_file_name: str, verbose: [bool, None], dry_run: bool, global_overrides: dict):
+    def __init__(
+            self, config_file_name: str, verbose: [bool, None], dry_run: bool, global_overrides: dict,
+            max_parallel: int=None):
         """Constructor.
         :param config_file_name: Path to the configuration file in JSON format.
         :param verbose: Whether verbose logging is to be used. If not None, overrides logging verbosity setting given in
@@ -52,11 +77,15 @@ class Loader(object):
         :param dry_run: Whether to avoid making changes to DB.
         :param global_overrides: Dictionary of global parameters that take precedence over ones defined in the 'globals'
             config object.
+        :param max_parallel: Maximum number of processes to run simultaneously. If not None, overrides the max_parallel
+            setting given in the configuration file.
         """
         self.failed_processes = []
         self.cnt_proc_total = 0
         self.cnt_proc_ok    = 0
         self.cnt_proc_fail  = 0
+        self.max_parallel   = max_parallel
+        self._stats_lock    = threading.Lock()
         # Initialise the context
         context.initialise(config_file_name, verbose, dry_run, global_overrides)
 
@@ -72,9 +101,21 @@ class Loader(object):
         self.cnt_proc_ok    = 0
         self.cnt_proc_fail  = 0
 
-        # Iterate through processes
-        for process_conf in context.get_config()['processes']:
-            self.run_process(process_conf)
+        # Fetch config parameters
+        conf         = context.get_config()
+        processes    = conf['processes']
+        max_parallel = self.max_parallel if self.max_parallel is not None else conf['max_parallel', 1]
+        if type(max_parallel) is not int or max_parallel < 1:
+            raise errors.ConfigError('max_parallel must be a positive integer, not "{}".'.format(max_parallel))
+
+        # Resolve process dependencies
+        dependencies = self.get_dependencies(processes)
+
+        # Run the processes
+        if max_parallel == 1:
+            self.run_sequential(processes, dependencies)
+        else:
+            self.run_parallel(processes, dependencies, max_parallel)
 
         # Output a summary
         logger.info(
@@ -82,41 +123,186 @@ class Loader(object):
                 self.cnt_proc_total, self.cnt_proc_ok, self.cnt_proc_fail))
         if self.failed_processes:
             logger.warning('Failed processes: ' + ', '.join(self.failed_processes))
+        context.log_include_cache_stats()
+        context.log_db_pool_stats()
+        context.log_query_cache_stats()
 
         return self.cnt_proc_fail == 0
 
+    @staticmethod
+    def get_dependencies(processes: list) -> list:
+        """Validate process dependencies and return them as a list of sets of process indices, one set per process.
+        :param processes: List of process configurations.
+        :return List of sets, each containing indices of the processes the corresponding process depends on.
+        """
+        # Collect process indices by name
+        indices = {}
+        for i, process_conf in enumerate(processes):
+            indices.setdefault(process_conf['name'], i)
+
+        # Translate dependency names into indices
+        dependencies = []
+        for process_conf in processes:
+            depends_on = process_conf['depends_on', []]
+            if not isinstance(depends_on, list):
+                raise errors.ConfigError(
+                    'Process "{}": depends_on must be an array, not "{}".'.format(process_conf['name'], depends_on))
+            deps = set()
+            for dep_name in depends_on:
+                if dep_name not in indices:
+                    raise errors.ConfigError(
+                        'Process "{}" depends on unknown process "{}".'.format(process_conf['name'], dep_name))
+                deps.add(indices[dep_name])
+            dependencies.append(deps)
+
+        # Names must be unique if there are any dependencies, otherwise references are ambiguous
+        if any(dependencies) and len(indices) < len(processes):
+            raise errors.ConfigError('Process names must be unique when depends_on is used.')
+
+        # Check for cycles: repeatedly pick processes whose dependencies are all resolved
+        resolved = set()
+        pending = set(range(len(processes)))
+        while pending:
+            ready = {i for i in pending if dependencies[i] <= resolved}
+            if not ready:
+                raise errors.ConfigError(
+                    'Circular dependency between processes: ' +
+                    ', '.join(processes[i]['name'] for i in sorted(pending)))
+            resolved |= ready
+            pending -= ready
+        return dependencies
+
+    def run_sequential(self, processes: list, dependencies: list):
+        """Run the processes one after another, in the configured order, while respecting their dependencies.
+        :param processes: List of process configurations.
+        :param dependencies: Process dependencies, as returned by get_dependencies().
+        """
+        succeeded = set()
+        finished = set()
+        pending = list(range(len(processes)))
+        while pending:
+            # Pick the first process whose dependencies are finished (there's always one as there are no cycles)
+            i = next(i for i in pending if dependencies[i] <= finished)
+            pending.remove(i)
+            finished.add(i)
+            if self.check_dependencies(processes, i, dependencies[i], succeeded) and self.run_process(processes[i]):
+                succeeded.add(i)
+
+    def run_parallel(self, processes: list, dependencies: list, max_parallel: int):
+        """Run the processes concurrently in a pool of threads, starting each one as soon as its dependencies have
+        succeeded and there's a free slot.
+        :param processes: List of process configurations.
+        :param dependencies: Process dependencies, as returned by get_dependencies().
+        :param max_parallel: Maximum number of processes to run simultaneously.
+        """
+        succeeded = set()
+        finished = set()
+        pending = list(range(len(processes)))
+        running = {}
+        stop = False
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_parallel) as executor:
+            while running or (pending and not stop):
+                # Start as many ready processes as there are free slots
+                if not stop:
+                    for i in [i for i in pending if dependencies[i] <= finished]:
+                        if len(running) >= max_parallel:
+                            break
+                        pending.remove(i)
+                        if self.check_dependencies(processes, i, dependencies[i], succeeded):
+                            running[executor.submit(self._execute_process, processes[i], True)] = i
+                        else:
+                            finished.add(i)
+
+                # Nothing's running: the remaining processes were skipped just now, look at the pending ones again
+                if not running:
+                    continue
+
+                # Wait for any of the running processes to finish
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    i = running.pop(future)
+                    finished.add(i)
+                    successful, stop_on_error = future.result()
+                    if successful:
+                        succeeded.add(i)
+                    elif stop_on_error:
+                        stop = True
+
+        # Exit if any process failed with stop_on_error
+        if stop:
+            logger.info('Error occurred, exiting.')
+            sys.exit(1)
+
+    def check_dependencies(self, processes: list, index: int, deps: set, succeeded: set) -> bool:
+        """Check whether all dependencies of a process have succeeded. If not, the process is counted as failed.
+        :param processes: List of process configurations.
+        :param index: Index of the process to check.
+        :param deps: Indices of the processes the process depends on.
+        :param succeeded: Indices of the processes that have succeeded so far.
+        :return True if the process can be run, False if it must be skipped.
+        """
+        failed_deps = deps - succeeded
+        if not failed_deps:
+            return True
+        name = processes[index]['name']
+        logger.warning('Skipping process "{}" because of failed dependencies: {}'.format(
+            name, ', '.join(processes[i]['name'] for i in sorted(failed_deps))))
+        with self._stats_lock:
+            self.cnt_proc_total += 1
+            self.cnt_proc_fail += 1
+            self.failed_processes.append(name)
+        return False
+
     def run_process(self, process_conf: config.Config) -> bool:
         """Run a single process.
         :param process_conf Dictionary describing process configuration.
         :return True if process finished successfully, False otherwise
         """
-        self.cnt_proc_total += 1
-        # Fetch config parameters
-        name          = process_conf['name']
-        comment       = process_conf['comment', '']
-        stop_on_error = process_conf['stop_on_error', True]
-        handler_conf  = process_conf['handler']
-
-        # Log
-        logger.separator()
-        logger.info('Running process "{}"{}'.format(
-            name,
-            (' (' + comment + ')' if comment != '' else '')))
-
-        # Run the handler
-        successful = False
+        successful, stop_on_error = self._execute_process(process_conf)
+        if not successful and stop_on_error:
+            logger.info('Error occurred, exiting.')
+            sys.exit(1)
+        return successful
+
+    def _execute_process(self, process_conf: config.Config, prefixed: bool=False) -> tuple:
+        """Run a single process and update the statistics.
+        :param process_conf Dictionary describing process configuration.
+        :param prefixed: Whether to start the log lines of the process with its name, so that the output of processes
+            running in parallel can be told apart.
+        :return Tuple (successful, stop_on_error)
+        """
+        name = process_conf['name']
+        if prefixed:
+            logger.set_prefix('[{}] '.format(name))
         try:
-            context.invoke_handler(handler_conf)
-            self.cnt_proc_ok += 1
-            successful = True
+            with self._stats_lock:
+                self.cnt_proc_total += 1
+            # Fetch config parameters
+            comment       = process_conf['comment', '']
+            stop_on_error = process_conf['stop_on_error', True]
+            handler_conf  = process_conf['handler']
 
-        # Catch and log any exceptions
-        except Exception as e:
-            self.cnt_proc_fail += 1
-            self.failed_processes.append(name)
-            logger.error('Exception {}: {}'.format(str(type(e)), str(e)))
-            if stop_on_error:
-                logger.info('Error occurred, exiting.')
-                sys.exit(1)
+            # Log
+            logger.separator()
+            logger.info('Running process "{}"{}'.format(
+                name,
+                (' (' + comment + ')' if comment != '' else '')))
 
-        return successful
+            # Run the handler
+            try:
+                with profiler.process(name), context.db_connection_scope():
+                    context.invoke_handler(handler_conf)
+                with self._stats_lock:
+                    self.cnt_proc_ok += 1
+                return True, stop_on_error
+
+            # Catch and log any exceptions
+            except Exception as e:
+                with self._stats_lock:
+                    self.cnt_proc_fail += 1
+                    self.failed_processes.append(name)
+                logger.error('Exception {}: {}'.format(str(type(e)), str(e)))
+                return False, stop_on_error
+        finally:
+            if prefixed:
+                logger.set_prefix(None)
@@ -6,6 +6,7 @@ severity.
 import sys
 import datetime
 import atexit
+import threading
 
 # Message severities
 DEBUG   = 0
@@ -22,6 +23,12 @@ output_width = 80
 # Log file object. If None, all the output goes to stdout/stderr.
 _log_file = None
 
+# Lock serialising output from multiple threads
+_output_lock = threading.Lock()
+
+# Thread-specific data, holding the output buffer and the line prefix of the thread, if any
+_thread_data = threading.local()
+
 
 def _teardown():
     """Cleanup procedure for the module."""
@@ -32,20 +39,33 @@ def _teardown():
 
 
 def _write_line(line: str, stderr: bool):
-    """Write a line to the log.
+    """Write a line to the log, or to the current thread's buffer if the output is being buffered.
     :param line: Line to write to the log.
     :param stderr: Whether it's a critical message (warning or error) to be output to stderr instead of regular output.
     """
-    # Add a linebreak
-    line += '\n'
-    # Output the text
+    # Add the thread's prefix and a linebreak
+    line = get_prefix() + line + '\n'
+    # If the output is buffered, postpone it
+    buffer = getattr(_thread_data, 'buffer', None)
+    if buffer is not None:
+        buffer.append((line, stderr))
+    else:
+        with _output_lock:
+            _output(line, stderr)
+
+
+def _output(text: str, stderr: bool):
+    """Output the text. Must be called with _output_lock held.
+    :param text: Text to output.
+    :param stderr: Whether to output the text to stderr instead of regular output (unless there's a log file).
+    """
     if _log_file is not None:
-        _log_file.write(line)
+        _log_file.write(text)
         _log_file.flush()
     elif not stderr:
-        sys.stdout.write(line)
+        sys.stdout.write(text)
     else:
-        sys.stderr.write(line)
+        sys.stderr.write(text)
 
 
 def error(message: str):
@@ -62,6 +82,29 @@ def info(message: str):
     log(message, INFO)
 
 
+def flush_buffer(buffer: list=None):
+    """Output buffered lines at once, so they don't interleave with the output of other threads. If the current thread
+    is itself buffering its output, the lines are appended to its buffer instead.
+    :param buffer: Buffered lines, as returned by stop_buffering(). If None, buffering of the current thread, started
+        with start_buffering(), is stopped and its own buffered lines are output.
+    """
+    if buffer is None:
+        buffer = stop_buffering()
+    if buffer:
+        own_buffer = getattr(_thread_data, 'buffer', None)
+        if own_buffer is not None:
+            own_buffer.extend(buffer)
+        else:
+            with _output_lock:
+                for line, stderr in buffer:
+                    _output(line, stderr)
+
+
+def get_prefix() -> str:
+    """Return the prefix of the log lines written by the current thread, set with set_prefix()."""
+    return getattr(_thread_data, 'prefix', None) or ''
+
+
 def log(message: str, severity: int=DEBUG):
     """Outputs the given message with the given severity.
 
@@ -111,6 +154,29 @@ def set_log_file(file_name: [str, None]):
         _log_file = open(file_name, 'w')
 
 
+def set_prefix(prefix: [str, None]):
+    """Start every log line written by the current thread with the given prefix, e.g. to tell apart the output of
+    processes running in parallel.
+    :param prefix: Prefix of the lines. If None, no prefix is used.
+    """
+    _thread_data.prefix = prefix
+
+
+def start_buffering():
+    """Start buffering the log output of the current thread until flush_buffer() is called."""
+    _thread_data.buffer = []
+
+
+def stop_buffering() -> list:
+    """Stop buffering the log output of the current thread, started with start_buffering(), and return the buffered
+    lines without outputting them.
+    :return List of buffered lines, to be passed to flush_buffer() later.
+    """
+    buffer = getattr(_thread_data, 'buffer', None)
+    _thread_data.buffer = None
+    return buffer or []
+
+
 def warning(message: str):
     """Shorthand for log(..., WARNING)
     :param message Warning message to log.
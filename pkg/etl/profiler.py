@@ -0,0 +1,220 @@
+"""
+Optional instrumentation of the load. When enabled, collects timing and throughput statistics per process and per
+handler node, and writes them out as a report in JSON or CSV format.
+
+The statistics collected for every (process, handler node) pair are:
+    invocations -- Number of times the handler node was invoked.
+    wall_time   -- Total elapsed time in seconds, including any nested handlers.
+    cpu_time    -- Total CPU time in seconds spent by the invoking thread, including any nested handlers. Before Python 3.7,
+                   which lacks per-thread CPU time, the CPU time of the whole process is measured.
+    input_size  -- Total length of the string parameters passed to the handler from the calling code or the pipeline.
+                   Line streams aren't counted, as their length isn't known upfront.
+    output_size -- Total length of the string parameters returned by the handler.
+    rows        -- Total number of rows (or lines) processed, for handlers that report it.
+    info        -- Additional handler-specific values reported with set_info(), e.g. the batch size chosen by
+                   db_uploader. Output as an object in JSON, and as 'name=value' pairs separated by ';' in CSV.
+
+Each process also gets a record for the whole process, with the handler node of '*'.
+"""
+import collections
+import csv
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Whether profiling is enabled. When False, instrumented code skips profiling altogether.
+enabled = False
+
+# Function returning the CPU time of the current thread, or of the process before Python 3.7
+_cpu_time = getattr(time, 'thread_time', time.process_time)
+
+# Names of the report columns
+COLUMNS = ('process', 'handler', 'invocations', 'wall_time', 'cpu_time', 'input_size', 'output_size', 'rows', 'info')
+
+# Statistics records keyed by (process name, node key), in the order of their creation
+_records = collections.OrderedDict()
+
+# Lock guarding the records
+_lock = threading.Lock()
+
+# Thread-specific data: name of the current process and the stack of running measurements
+_thread_data = threading.local()
+
+
+class _Record:
+    """Accumulated statistics of a single handler node within a process."""
+
+    def __init__(self, process: str, handler: str):
+        """Constructor.
+        :param process: Name of the process.
+        :param handler: Handler node label.
+        """
+        self.process     = process
+        self.handler     = handler
+        self.invocations = 0
+        self.wall_time   = 0.0
+        self.cpu_time    = 0.0
+        self.input_size  = 0
+        self.output_size = 0
+        self.rows        = 0
+        self.info        = collections.OrderedDict()
+
+    def as_dict(self) -> dict:
+        """Return the record as a dictionary of report column values."""
+        values = collections.OrderedDict((col, getattr(self, col)) for col in COLUMNS)
+        values['info'] = collections.OrderedDict(self.info)
+        return values
+
+
+def _get_stack() -> list:
+    """Return the stack of running measurements of the current thread, as lists [record key, rows]."""
+    stack = getattr(_thread_data, 'stack', None)
+    if stack is None:
+        stack = _thread_data.stack = []
+    return stack
+
+
+def _measure_start(key, label: str) -> tuple:
+    """Start a measurement and return its state, to be passed to _measure_stop()."""
+    key = (get_current_process(), key)
+    with _lock:
+        if key not in _records:
+            _records[key] = _Record(key[0], label)
+    frame = [key, 0]
+    _get_stack().append(frame)
+    return frame, time.perf_counter(), _cpu_time()
+
+
+def _measure_stop(state: tuple, input_size: int, output_size: int):
+    """Finish a measurement started with _measure_start() and add the results to the statistics."""
+    frame, wall_start, cpu_start = state
+    wall_time = time.perf_counter() - wall_start
+    cpu_time = _cpu_time() - cpu_start
+    _get_stack().pop()
+    with _lock:
+        record = _records[frame[0]]
+        record.invocations += 1
+        record.wall_time   += wall_time
+        record.cpu_time    += cpu_time
+        record.input_size  += input_size
+        record.output_size += output_size
+        record.rows        += frame[1]
+
+
+def _size(params) -> int:
+    """Return the total length of the string values in the given mapping, or 0 if it's None."""
+    if not params:
+        return 0
+    return sum(len(v) for v in params.values() if isinstance(v, str))
+
+
+def add_rows(count: int):
+    """Report the number of rows processed by the currently running handler. Does nothing if profiling is disabled.
+    :param count: Number of rows to add.
+    """
+    if enabled:
+        stack = _get_stack()
+        if stack:
+            stack[-1][1] += count
+
+
+def disable():
+    """Disable profiling. The statistics collected so far are kept."""
+    global enabled
+    enabled = False
+
+
+def enable():
+    """Enable profiling, discarding any statistics collected so far."""
+    global enabled
+    with _lock:
+        _records.clear()
+    enabled = True
+
+
+def get_current_process() -> str:
+    """Return the name of the process run by the current thread, or None if there's none."""
+    return getattr(_thread_data, 'process', None)
+
+
+def get_report() -> list:
+    """Return the collected statistics as a list of dictionaries, one per (process, handler node)."""
+    with _lock:
+        return [record.as_dict() for record in _records.values()]
+
+
+@contextmanager
+def process(name: str):
+    """Context manager that attributes the handlers run inside it to the named process, and measures the process as a
+    whole. Does nothing if profiling is disabled.
+    :param name: Name of the process.
+    """
+    if not enabled:
+        yield
+        return
+    set_current_process(name)
+    state = _measure_start(None, '*')
+    try:
+        yield
+    finally:
+        _measure_stop(state, 0, 0)
+        set_current_process(None)
+
+
+def run_handler(handler, handler_conf, key, label: str, inputs: dict):
+    """Run the handler, measuring the invocation.
+    :param handler: Handler instance.
+    :param handler_conf: Configuration to run the handler with.
+    :param key: Key identifying the handler node within the process.
+    :param label: Handler node label for the report.
+    :param inputs: Mapping of the parameters passed to the handler from the calling code or the pipeline, holding only
+        the values the handler gets (i.e. not the ones shadowed by others).
+    :return Result of the handler run.
+    """
+    state = _measure_start(key, label)
+    result = None
+    try:
+        result = handler.run(handler_conf)
+        return result
+    finally:
+        _measure_stop(state, _size(inputs), _size(result))
+
+
+def set_info(name: str, value):
+    """Report a handler-specific value for the currently running handler, replacing any value reported under the same
+    name before. Does nothing if profiling is disabled.
+    :param name: Name of the value.
+    :param value: The value, which must be serialisable into JSON.
+    """
+    if enabled:
+        stack = _get_stack()
+        if stack:
+            with _lock:
+                _records[stack[-1][0]].info[name] = value
+
+
+def set_current_process(name: [str, None]):
+    """Set the name of the process run by the current thread. Used to attribute work done by worker threads.
+    :param name: Name of the process, or None.
+    """
+    _thread_data.process = name
+
+
+def write_report(file_name: str, fmt: str=None):
+    """Write the collected statistics into a file.
+    :param file_name: Name of the file to write.
+    :param fmt: Report format, 'json' or 'csv'. If None, it's derived from the file name extension, defaulting to JSON.
+    """
+    if fmt is None:
+        fmt = 'csv' if file_name.lower().endswith('.csv') else 'json'
+    report = get_report()
+    with open(file_name, 'w', newline='') as f:
+        if fmt == 'csv':
+            writer = csv.DictWriter(f, COLUMNS)
+            writer.writeheader()
+            for values in report:
+                values['info'] = ';'.join('{}={}'.format(k, v) for k, v in values['info'].items())
+                writer.writerow(values)
+        else:
+            json.dump(report, f, indent=2)
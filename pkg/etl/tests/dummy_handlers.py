@@ -1,9 +1,39 @@
 """
 Declaration of a dummy handler used for unit tests.
 """
+from etl import profiler
 from etl.handlers import base
 
 
 class EmptyHandler(base.Handler):
     def run(self, config):
         pass
+
+
+class StreamingHandler(base.Handler):
+    streaming = True
+
+    def run(self, config):
+        pass
+
+
+class ReusableHandler(base.Handler):
+    reusable = True
+    instance_count = 0
+
+    def __init__(self):
+        ReusableHandler.instance_count += 1
+
+    def run(self, config):
+        pass
+
+
+class CountingHandler(base.Handler):
+    """Reports the length of its 'data' parameter as the number of rows and as the 'length' info value, and returns it
+    doubled."""
+
+    def run(self, config):
+        data = config['data']
+        profiler.add_rows(len(data))
+        profiler.set_info('length', len(data))
+        return {'data': data * 2}
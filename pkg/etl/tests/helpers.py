@@ -2,7 +2,12 @@
 Helper classes/functions for testing.
 """
 
+import threading
+import time
+from contextlib import contextmanager
 from copy import deepcopy
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
 from unittest.mock import MagicMock
 
 
@@ -15,3 +20,58 @@ class CopyingMock(MagicMock):
         args = deepcopy(args)
         kwargs = deepcopy(kwargs)
         return super(CopyingMock, self).__call__(*args, **kwargs)
+
+
+class NullContext(object):
+    """Context manager returning the given value and doing nothing else, e.g. to stand for context.db_connection(). It
+    can be entered any number of times. An equivalent of contextlib.nullcontext(), which isn't available before Python
+    3.7."""
+
+    def __init__(self, value=None):
+        """Constructor.
+        :param value: Value to return on entering the context.
+        """
+        self.value = value
+
+    def __enter__(self):
+        return self.value
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+@contextmanager
+def http_server(files: dict, latency: float=0):
+    """Context manager running a local HTTP server in a background thread, and returning its base URL.
+    :param files: Dictionary of file contents (bytes) keyed by file name. Other files are reported as not found.
+    :param latency: Delay in seconds before each response.
+    """
+    class RequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            data = files.get(self.path.lstrip('/'))
+            if data is None:
+                self.send_error(404)
+            else:
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    # Equivalent of http.server.ThreadingHTTPServer, which isn't available before Python 3.7
+    class Server(ThreadingMixIn, HTTPServer):
+        daemon_threads = True
+        # Allow for many simultaneous connections
+        request_queue_size = 128
+
+    server = Server(('127.0.0.1', 0), RequestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield 'http://127.0.0.1:{}/'.format(server.server_address[1])
+    finally:
+        server.shutdown()
+        server.server_close()
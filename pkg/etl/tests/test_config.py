@@ -1,6 +1,7 @@
 from nose.tools import raises
 from etl import config
 from etl import errors
+from etl.handlers import base
 
 _conf = None  # Our local configuration object to test
 
@@ -82,6 +83,12 @@ def test_existing_key_lines_list():
     assert llist[2] == 'value'
 
 
+def test_stream_lines_list():
+    """config: test reading line stream value via line list"""
+    conf = config.Config({'key_stream': base.LineStream(['line 1\n', 'line 2\n'])})
+    assert conf.lines_list('key_stream') == ['line 1', 'line 2']
+
+
 def test_nonexistent_key_with_default():
     """config: test reading a value for a nonexistent key if default is given"""
     global _conf
@@ -143,3 +150,33 @@ def test_update():
     assert type(c['e']) is config.Config
     assert c['e']['nested'] == 5
 
+
+
+def test_layered_precedence():
+    """config: test layered config lookups follow layer precedence"""
+    conf = config.LayeredConfig({'a': 1}, config.Config({'a': 2, 'b': 3}), {'c': {'d': 4}})
+    assert conf['a'] == 1
+    assert conf['b'] == 3
+    assert conf['x', 'default'] == 'default'
+    # Plain dicts must be converted into Config instances
+    assert type(conf['c']) is config.Config
+    assert conf['c']['d'] == 4
+    assert conf == {'a': 1, 'b': 3, 'c': {'d': 4}}
+
+
+@raises(errors.ConfigError)
+def test_layered_nonexistent_key():
+    """config: test reading a nonexistent key from layered config"""
+    config.LayeredConfig({'a': 1})['b']
+
+
+def test_layered_changes():
+    """config: test layered config changes only affect the first layer"""
+    base_layer = config.Config({'a': 1})
+    conf = config.LayeredConfig({}, base_layer)
+    conf['a'] = 2
+    conf_copy = conf.copy()
+    conf_copy['a'] = 3
+    assert base_layer['a'] == 1
+    assert conf['a'] == 2
+    assert conf_copy['a'] == 3
@@ -1,11 +1,21 @@
+import importlib
+import json
+import tempfile
+import threading
+import time
+import weakref
 from os import sep, path
 from contextlib import contextmanager
 from nose.tools import raises
 from unittest.mock import patch
 from unittest.mock import call
+from unittest.mock import MagicMock
 from etl import errors
 from etl import config
 from etl import context
+from etl.handlers import base
+from etl.tests import dummy_handlers
+from etl.tests import helpers
 
 
 def _get_empty_handler_conf(**additional_conf):
@@ -97,13 +107,109 @@ def test_db_connection(mock_db):
         context.get_db_connection("db")
 
         # The DB connection must be created exactly one time
-        mock_db.assert_called_once_with('a', 'b', 'c')
+        mock_db.assert_called_once_with('a', 'b', 'c', None)
 
         # Repeated requests to the same DB should not recreate the connection
         context.get_db_connection("db")
         assert mock_db.call_count == 1
 
 
+@patch('etl.context.DBConnection')
+def test_db_pool(mock_db):
+    """context: test borrowing DB connections from the pool"""
+    mock_db.side_effect = lambda *args: MagicMock(pending_writes=False)
+    with configure('db_conn_pool.json', None, False):
+        # pool_min_size connections are created upfront
+        pool = context.get_db_pool('db')
+        assert pool is context.get_db_pool('db')
+        mock_db.assert_called_once_with('a', 'b', 'c', 5)
+        assert pool.max_size == 2 and pool.timeout == 0.01
+
+        # Nested borrowing within a thread shares the connection
+        with context.db_connection('db') as conn:
+            with context.db_connection('db') as conn2:
+                assert conn2 is conn
+        assert context.get_db_pool_stats() == {'db': dict(
+            size=1, in_use=0, idle=1, created=1, checkouts=2, waits=0, wait_time=0.0, reconnects=0, evicted=0)}
+
+        # Another thread gets its own connection while this one is held
+        conns = []
+        with context.db_connection('db'):
+            thread = threading.Thread(target=lambda: conns.append(context.get_db_connection('db')))
+            thread.start()
+            thread.join()
+        assert conns[0] is not conn
+        assert mock_db.call_count == 2
+
+    # Teardown closes all connections
+    assert conn.close.called
+    assert conns[0].close.called
+
+
+@patch('etl.context.DBConnection')
+def test_db_connection_scope(mock_db):
+    """context: test connections left with uncommitted changes are kept until the end of the worker invocation"""
+    mock_db.side_effect = lambda *args: MagicMock(pending_writes=False)
+    with configure('db_conn_pool.json', None, False):
+        pool = context.get_db_pool('db')
+        pool.timeout = 5
+
+        def write(item):
+            with context.db_connection('db', writes=True) as conn:
+                conn.pending_writes = True
+            # The connection is kept by the invocation, and borrowed again by it
+            with context.db_connection('db') as conn2:
+                assert conn2 is conn
+            return conn
+
+        # More workers than connections: every invocation must return its connection once finished
+        conns = list(context.run_concurrently(write, range(6), 3))
+        assert pool.get_stats()['in_use'] == 0 and pool.get_stats()['size'] <= 2
+        assert all(conn.commit.called for conn in conns)
+
+        # A failed invocation rolls the changes back
+        def fail(item):
+            with context.db_connection('db', writes=True) as conn:
+                conn.pending_writes = True
+            conns.append(conn)
+            raise ValueError()
+        try:
+            list(context.run_concurrently(fail, [1], 1))
+        except ValueError:
+            pass
+        assert conns[-1].rollback.called
+        assert pool.get_stats()['in_use'] == 0
+
+
+@patch('etl.context.DBConnection')
+def test_query_cache(mock_db):
+    """context: test the query cache is invalidated by writing to the database"""
+    mock_db.return_value.pending_writes = False
+    with configure('query_cache.json', None, False):
+        cache = context.get_query_cache()
+        assert cache.max_size == 1000 and cache.ttl == 60
+        cache.put('db', 'q', 'value', 5, 0)
+
+        # Reading doesn't invalidate the cache
+        with context.db_connection('db'):
+            pass
+        assert cache.get('db', 'q') == 'value'
+
+        # Writing does, even if it fails
+        try:
+            with context.db_connection('db', writes=True):
+                raise ValueError()
+        except ValueError:
+            pass
+        assert cache.get('db', 'q') is None
+        assert cache.get_stats()['invalidated'] == 1
+
+        # The hit rate is logged
+        with patch('etl.context.logger') as mock_logger:
+            context.log_query_cache_stats()
+            assert '1 hits, 1 misses (50.0% hit rate)' in mock_logger.log.call_args[0][0]
+
+
 @raises(errors.ConfigError)
 def test_db_connection_incomplete():
     """context: test DB connection with incomplete spec"""
@@ -118,7 +224,7 @@ def test_db_connection_passwd_base64(mock_db):
         context.get_db_connection("dbBase64")
 
         # Verify the password is correctly Base64-decoded
-        mock_db.assert_called_once_with('Secret', 'Facility', 'TopSecret')
+        mock_db.assert_called_once_with('Secret', 'Facility', 'TopSecret', None)
 
 
 @patch('etl.context.DBConnection')
@@ -128,7 +234,7 @@ def test_db_conn_external_ok(mock_db):
         context.get_db_connection("dbExt")
 
         # The DB connection's parameters must be read from the external file, then it must be created
-        mock_db.assert_called_once_with('TheConnection', 'Mickey', 'Mouse')
+        mock_db.assert_called_once_with('TheConnection', 'Mickey', 'Mouse', None)
 
         # Repeated requests to the same DB should not recreate the connection
         context.get_db_connection("dbExt")
@@ -140,7 +246,7 @@ def test_db_conn_external_wglob(mock_db):
     """context: test external DB connection defined via a global"""
     with configure('db_conn_ext_glob.json', None, False, {'PATH_FROM_GLOBAL': 'db_conn_extdef.json'}):
         context.get_db_connection("dbExtGlob")
-        mock_db.assert_called_once_with('TheConnection', 'Mickey', 'Mouse')
+        mock_db.assert_called_once_with('TheConnection', 'Mickey', 'Mouse', None)
 
 
 @raises(FileNotFoundError)
@@ -179,7 +285,8 @@ def test_invoke_single_handler(handler_run):
 
 
 # Our mocked handler will be multiplying p2 value by 5
-@patch('etl.tests.dummy_handlers.EmptyHandler.run', side_effect=lambda conf: {'p2': conf['p2'] * 5})
+@patch('etl.tests.dummy_handlers.EmptyHandler.run', side_effect=lambda conf: {'p2': conf['p2'] * 5},
+       new_callable=helpers.CopyingMock)
 def test_invoke_chained_handlers(handler_run):
     """context: test chained handlers invocation"""
     # Run a chain of two EmptyHandlers
@@ -197,7 +304,8 @@ def test_invoke_chained_handlers(handler_run):
 
 
 # Our mocked handler will be incrementing p3
-@patch('etl.tests.dummy_handlers.EmptyHandler.run', side_effect=lambda conf: {'p3': conf['p3'] + 1})
+@patch('etl.tests.dummy_handlers.EmptyHandler.run', side_effect=lambda conf: {'p3': conf['p3'] + 1},
+       new_callable=helpers.CopyingMock)
 def test_invoke_nested_handlers(handler_run):
     """context: test nested handlers invocation"""
     # Run a number of EmptyHandlers
@@ -222,6 +330,27 @@ def test_invoke_nested_handlers(handler_run):
         ]
 
 
+def test_pipeline_releases_shadowed_values():
+    """context: test values replaced on the pipeline are released right away"""
+    class Value(object):
+        pass
+
+    pipeline = context._Pipeline()
+    layer = pipeline.maps[0]
+    value = Value()
+    value_ref = weakref.ref(value)
+    pipeline.publish({'data': value, 'a': 1})
+    view = config.LayeredConfig({}, *pipeline.maps)
+    del value
+
+    # Publishing updates the single layer in place, which views see
+    pipeline.publish({'data': 'new'})
+    assert value_ref() is None
+    assert pipeline['data'] == 'new' and pipeline['a'] == 1
+    assert pipeline.maps == [layer] and pipeline.maps[0] is layer
+    assert view['data'] == 'new'
+
+
 @patch('etl.tests.dummy_handlers.EmptyHandler.run')
 def test_param_block(handler_run):
     """context: test publishing parameter blocks on pipeline"""
@@ -322,3 +451,144 @@ def test_global_overrides(handler_run):
             'param_b': 'TEST',  # Overridden global param
             'param_c': 700      # New global param
         })
+
+
+def test_materialise_streams():
+    """context: test line streams are converted into strings for non-streaming handlers"""
+    received = []
+    with patch('etl.tests.dummy_handlers.EmptyHandler.run', side_effect=lambda conf: received.append(conf['data'])):
+        context.invoke_handler([
+            config.Config({'data': base.LineStream(['a\n', 'b\n'])}),
+            _get_empty_handler_conf(),
+            # The pipeline must now hold the string, too
+            _get_empty_handler_conf()
+        ])
+    assert received == ['a\nb\n', 'a\nb\n']
+
+
+def test_pass_streams():
+    """context: test line streams are passed as is to streaming handlers"""
+    received = []
+    stream = base.LineStream(['a\n', 'b\n'])
+    with patch('etl.tests.dummy_handlers.StreamingHandler.run', side_effect=lambda conf: received.append(conf['data'])):
+        context.invoke_handler([
+            config.Config({'data': stream}),
+            _get_empty_handler_conf(**{'class': 'StreamingHandler'})
+        ])
+    assert received == [stream]
+
+
+def test_consumed_streams_ignored():
+    """context: test consumed line streams don't prevent running non-streaming handlers"""
+    def consume(conf):
+        conf['data'].read()
+    with patch('etl.tests.dummy_handlers.StreamingHandler.run', side_effect=consume), \
+            patch('etl.tests.dummy_handlers.EmptyHandler.run') as handler_run:
+        context.invoke_handler([
+            config.Config({'data': base.LineStream(['a\n'])}),
+            _get_empty_handler_conf(**{'class': 'StreamingHandler'}),
+            _get_empty_handler_conf()
+        ])
+    assert handler_run.call_count == 1
+
+
+def test_handler_config_isolation():
+    """context: test changes a handler makes to its configuration don't leak"""
+    def modify(conf):
+        conf['p1'] = 'changed'
+        conf['new'] = 'added'
+    own_conf = _get_empty_handler_conf()
+    with patch('etl.tests.dummy_handlers.EmptyHandler.run', side_effect=modify):
+        context.invoke_handler([own_conf], {'p3': 30})
+    assert own_conf['p1'] == 10
+    assert 'new' not in own_conf
+
+
+def test_handler_class_cache():
+    """context: test handler classes are only resolved once"""
+    context._handler_classes.clear()
+    with patch('etl.context.importlib.import_module', wraps=importlib.import_module) as mock_import:
+        conf = _get_empty_handler_conf()
+        context.invoke_handler([conf, conf, _get_empty_handler_conf()])
+        mock_import.assert_called_once_with('etl.tests.dummy_handlers')
+
+
+def test_reusable_handler_instance():
+    """context: test reusable handlers are instantiated once per configuration node"""
+    dummy_handlers.ReusableHandler.instance_count = 0
+    conf_a = _get_empty_handler_conf(**{'class': 'ReusableHandler'})
+    conf_b = _get_empty_handler_conf(**{'class': 'ReusableHandler'})
+    context.invoke_handler([conf_a, conf_a, conf_b, conf_a, conf_b])
+    assert dummy_handlers.ReusableHandler.instance_count == 2
+
+    # Cached instances must be dropped along with their configuration
+    del conf_a, conf_b
+    assert not any(type(entry[1]) is dummy_handlers.ReusableHandler for entry in context._handler_instances.values())
+
+
+def test_run_concurrently_ordered():
+    """context: test running calls concurrently with ordered results"""
+    def func(i):
+        # Later items finish earlier
+        time.sleep((10 - i) / 1000)
+        return i * 2
+    assert list(context.run_concurrently(func, range(10), 4)) == [i * 2 for i in range(10)]
+    assert sorted(context.run_concurrently(func, range(10), 4, False)) == [i * 2 for i in range(10)]
+
+
+def test_run_concurrently_failure():
+    """context: test the first failure cancels outstanding calls"""
+    called = []
+
+    def func(i):
+        called.append(i)
+        if i == 3:
+            raise errors.DataError('Item {}'.format(i))
+        time.sleep(0.01)
+    try:
+        list(context.run_concurrently(func, range(100), 2))
+        assert False, 'DataError expected'
+    except errors.DataError as e:
+        assert str(e) == 'Item 3'
+    # Only a few items must have been taken up
+    assert len(called) < 10
+
+
+def test_run_concurrently_include_relative():
+    """context: test worker threads resolve relative file names against the current config file"""
+    with configure('empty.json', None, False):
+        expected = path.join(path.dirname(__file__), 'some_file')
+        assert list(context.run_concurrently(context.get_absolute_file_name, ['some_file'] * 3, 2)) == [expected] * 3
+
+
+def test_include_cache():
+    """context: test include files are parsed once"""
+    with configure('empty.json', None, False):
+        with patch('etl.context.json.load', wraps=json.load) as mock_load, \
+                patch('etl.tests.dummy_handlers.EmptyHandler.run') as handler_run:
+            context.invoke_handler(['test_conf.include.json', 'test_conf.include.json'])
+            context.invoke_handler('test_conf.include.json')
+            assert mock_load.call_count == 1
+            assert handler_run.call_count == 3
+        assert context._include_cache_stats == [2, 1]
+
+        # Clearing the cache makes the file parsed again
+        context.clear_include_cache()
+        with patch('etl.context.json.load', wraps=json.load) as mock_load, \
+                patch('etl.tests.dummy_handlers.EmptyHandler.run'):
+            context.invoke_handler('test_conf.include.json')
+            assert mock_load.call_count == 1
+        assert context._include_cache_stats == [2, 2]
+
+
+@patch('etl.tests.dummy_handlers.EmptyHandler.run')
+def test_include_cache_modified(handler_run):
+    """context: test modified include files are parsed again"""
+    with configure('empty.json', None, False), tempfile.TemporaryDirectory() as tmp_dir:
+        file_name = path.join(tmp_dir, 'include.json')
+        for p1 in (1, 22, 333):
+            with open(file_name, 'w') as f:
+                json.dump({'module': 'etl.tests.dummy_handlers', 'class': 'EmptyHandler', 'p1': p1}, f)
+            context.invoke_handler(file_name)
+            assert handler_run.call_args[0][0]['p1'] == p1
+        assert context._include_cache_stats == [0, 3]
@@ -0,0 +1,188 @@
+import threading
+from nose.tools import raises
+from unittest.mock import MagicMock
+from unittest.mock import patch
+from etl.db.array_inserter import AdaptiveBatchSize, DBArrayInserter
+
+
+class FakeCursor(object):
+    """Cursor stub recording the inserted batches, optionally failing or blocking."""
+
+    def __init__(self, fail_on: int=None):
+        self.batches = []
+        self.fail_on = fail_on
+        self.release = threading.Event()
+        self.release.set()
+        self.closed = False
+
+    def executemany(self, statement, rows):
+        self.release.wait()
+        if len(self.batches) == self.fail_on:
+            raise ValueError('Insert failed')
+        self.batches.append(list(rows))
+
+    def close(self):
+        self.closed = True
+
+
+def _get_inserter(cursor: FakeCursor, **kwargs) -> DBArrayInserter:
+    """Create and return an inserter using the given cursor."""
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+    return DBArrayInserter(conn, 'INSERT', [], **kwargs)
+
+
+def test_sync():
+    """db.array_inserter: test inserting rows in batches"""
+    cur = FakeCursor()
+    ins = _get_inserter(cur)
+    for i in range(250):
+        ins.push_row([i])
+    assert [len(b) for b in cur.batches] == [100, 100]
+    ins.flush()
+    assert [len(b) for b in cur.batches] == [100, 100, 50]
+    ins.close()
+    assert cur.closed
+
+
+def test_background():
+    """db.array_inserter: test inserting rows in batches on the writer thread"""
+    cur = FakeCursor()
+    ins = _get_inserter(cur, background=True)
+    for i in range(1050):
+        ins.push_row([i])
+    ins.flush()
+    assert [len(b) for b in cur.batches] == [100] * 10 + [50]
+    assert [r for b in cur.batches for r in b] == [[i] for i in range(1050)]
+
+    # The inserter can go on after a flush
+    ins.push_row([1050])
+    ins.flush()
+    assert cur.batches[-1] == [[1050]]
+    ins.close()
+    assert cur.closed
+
+
+def test_background_overlap():
+    """db.array_inserter: test rows are pushed while a batch is being inserted, up to the queue limit"""
+    cur = FakeCursor()
+    cur.release.clear()
+    ins = _get_inserter(cur, background=True, max_queued_batches=1)
+
+    # One batch is being inserted, one is queued, and the third is being filled
+    pushed = []
+    thread = threading.Thread(target=lambda: [(ins.push_row([i]), pushed.append(i)) for i in range(350)])
+    thread.start()
+    thread.join(0.2)
+    assert len(pushed) == 299
+    cur.release.set()
+    thread.join()
+    ins.flush()
+    assert len(cur.batches) == 4
+    ins.close()
+
+
+@raises(ValueError)
+def test_background_error_push():
+    """db.array_inserter: test an insert error is raised by the next push_row()"""
+    cur = FakeCursor(fail_on=0)
+    ins = _get_inserter(cur, background=True)
+    try:
+        for i in range(100):
+            ins.push_row([i])
+        # Wait for the writer to process the batch
+        ins._queue.join()
+        ins.push_row([100])
+    finally:
+        ins.close()
+
+
+@raises(ValueError)
+def test_background_error_flush():
+    """db.array_inserter: test an insert error is raised by flush(), and further batches are discarded"""
+    cur = FakeCursor(fail_on=1)
+    ins = _get_inserter(cur, background=True)
+    try:
+        for i in range(150):
+            ins.push_row([i])
+        ins.flush()
+        ins.push_row([150])
+    finally:
+        ins.close()
+        assert len(cur.batches) == 1
+
+
+def test_background_close():
+    """db.array_inserter: test closing the inserter discards queued batches"""
+    cur = FakeCursor()
+    cur.release.clear()
+    ins = _get_inserter(cur, background=True)
+    for i in range(250):
+        ins.push_row([i])
+    cur.release.set()
+    ins.close()
+    assert len(cur.batches) <= 1
+    assert cur.closed
+
+
+def test_adaptive_size():
+    """db.array_inserter: test tuning the batch size"""
+    sizer = AdaptiveBatchSize(500, 100, 10000)
+    sizer.samples = 1
+
+    # Partial batches are ignored
+    sizer.record(10, 1.0)
+    assert sizer.size == 500
+
+    # Keep growing while the throughput improves, then settle at the best size
+    sizer.record(500, 0.05)
+    assert sizer.size == 1000
+    sizer.record(1000, 0.05)
+    assert sizer.size == 2000
+    sizer.record(2000, 0.099)
+    assert sizer.size == 1000
+    assert sizer.settled
+    sizer.record(1000, 0.001)
+    assert sizer.size == 1000
+
+
+def test_adaptive_size_limit():
+    """db.array_inserter: test the batch size stays within the limits"""
+    sizer = AdaptiveBatchSize(500, 100, 800)
+    sizer.samples = 1
+    sizer.record(500, 0.1)
+    assert sizer.size == 800
+    sizer.record(800, 0.1)
+    assert sizer.size == 800 and sizer.settled
+
+    sizer = AdaptiveBatchSize(500, 100, 10000)
+    sizer.limit(50)
+    assert sizer.size == 100 and sizer.maximum == 100
+
+
+def test_adaptive():
+    """db.array_inserter: test tuning the batch size while inserting"""
+    # Simulate a database taking 10 ms per batch plus 10 us per row
+    clock = [0.0]
+    cur = FakeCursor()
+    cur.executemany = lambda statement, rows: clock.__setitem__(0, clock[0] + 0.01 + 0.00001 * len(rows))
+    with patch('etl.db.array_inserter.time.perf_counter', lambda: clock[0]):
+        for background in (False, True):
+            ins = _get_inserter(cur, background=background, adaptive=True)
+            assert ins.batch_size == DBArrayInserter.adaptive_initial_size
+            for i in range(200000):
+                ins.push_row([i])
+            ins.flush()
+            ins.close()
+            # Growing to 32000 only improves the throughput by 3%
+            assert ins.batch_size == 16000
+
+
+def test_adaptive_memory():
+    """db.array_inserter: test limiting the batch size by the memory taken"""
+    ins = _get_inserter(FakeCursor(), adaptive=True)
+    ins.adaptive_max_bytes = 200000
+    for i in range(500):
+        ins.push_row(['x' * 1000])
+    assert 100 <= ins.batch_size < 500
+    ins.close()
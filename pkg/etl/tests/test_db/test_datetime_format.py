@@ -0,0 +1,24 @@
+import datetime
+from nose.tools import raises
+from etl.db import datetime_format
+
+
+def test_compile_parser():
+    """db.datetime_format: test parsing values in Oracle-style formats"""
+    assert datetime_format.compile_parser('YYYYMMDD')('20150304') == datetime.datetime(2015, 3, 4)
+    assert datetime_format.compile_parser('dd.mm.yyyy hh24:mi:ss')('04.03.2015 17:05:09') == \
+        datetime.datetime(2015, 3, 4, 17, 5, 9)
+    assert datetime_format.compile_parser('Mon DD YYYY HH:MI AM')('Mar 4 2015 5:05 PM') == \
+        datetime.datetime(2015, 3, 4, 17, 5)
+    assert datetime_format.compile_parser('YYYYMMDD') is datetime_format.compile_parser('YYYYMMDD')
+
+
+def test_strptime_format():
+    """db.datetime_format: test translating formats for strptime()"""
+    assert datetime_format.strptime_format('DD.MM.YY HH12:MI:SS PM 100%') == '%d.%m.%y %I:%M:%S %p 100%%'
+
+
+@raises(ValueError)
+def test_compile_parser_mismatch():
+    """db.datetime_format: test parsing a value not matching the format"""
+    datetime_format.compile_parser('YYYY-MM-DD')('2015-03-4')
@@ -0,0 +1,186 @@
+import threading
+import time
+from nose.tools import raises
+from etl.db.connection import DatabaseError
+from etl.db.pool import ConnectionPool
+
+
+class FakeConnection(object):
+    """Connection stub recording its state."""
+
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+        self.rollbacks = 0
+
+    def close(self):
+        self.closed = True
+
+    def ping(self) -> bool:
+        return self.alive
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+def _get_pool(**kwargs) -> ConnectionPool:
+    """Create and return a pool of FakeConnection objects."""
+    return ConnectionPool(FakeConnection, **kwargs)
+
+
+def test_reuse():
+    """db.pool: test connections are reused"""
+    pool = _get_pool()
+    conn = pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+    pool.release(conn)
+    stats = pool.get_stats()
+    assert stats['created'] == 1
+    assert stats['checkouts'] == 2
+    assert stats['size'] == 1 and stats['idle'] == 1 and stats['in_use'] == 0
+
+
+def test_min_size():
+    """db.pool: test connections are created upfront"""
+    pool = _get_pool(min_size=3)
+    stats = pool.get_stats()
+    assert stats['created'] == 3
+    assert stats['idle'] == 3
+
+
+def test_same_thread():
+    """db.pool: test the same connection is handed out to the thread holding one"""
+    pool = _get_pool(max_size=1)
+    conn = pool.acquire()
+    assert pool.acquire() is conn
+    pool.release(conn)
+    assert pool.get_stats()['in_use'] == 1
+    pool.release(conn)
+    assert pool.get_stats()['in_use'] == 0
+
+
+def test_threads():
+    """db.pool: test concurrent threads get separate connections and wait when the pool is exhausted"""
+    pool = _get_pool(max_size=2)
+    barrier = threading.Barrier(2)
+    connections = []
+
+    def work():
+        with pool.connection() as conn:
+            connections.append(conn)
+            barrier.wait()
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # Both connections are used twice
+    assert len(set(map(id, connections))) == 2
+    stats = pool.get_stats()
+    assert stats['created'] == 2
+    assert stats['checkouts'] == 4
+    assert stats['waits'] >= 1
+    assert stats['wait_time'] > 0
+
+
+def test_timeout():
+    """db.pool: test timing out waiting for a connection"""
+    pool = _get_pool(max_size=1, timeout=0.01)
+    conn = pool.acquire()
+    errors = []
+
+    def work():
+        try:
+            pool.acquire()
+        except DatabaseError as e:
+            errors.append(e)
+
+    t = threading.Thread(target=work)
+    t.start()
+    t.join()
+    pool.release(conn)
+    assert len(errors) == 1
+    assert pool.get_stats()['waits'] == 1
+    assert pool.get_stats()['size'] == 1
+
+
+def test_validation():
+    """db.pool: test dead connections are transparently replaced"""
+    pool = _get_pool()
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.alive = False
+    conn2 = pool.acquire()
+    assert conn2 is not conn
+    assert conn.closed
+    assert pool.get_stats()['reconnects'] == 1
+    assert pool.get_stats()['size'] == 1
+    pool.release(conn2)
+
+    # Recently used connections aren't validated
+    pool = _get_pool(validation_interval=3600)
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.alive = False
+    assert pool.acquire() is conn
+
+
+def test_eviction():
+    """db.pool: test idle connections are evicted, keeping min_size of them"""
+    pool = _get_pool(min_size=1, max_idle_time=0)
+    barrier = threading.Barrier(3)
+
+    def work():
+        with pool.connection():
+            barrier.wait()
+
+    threads = [threading.Thread(target=work) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = pool.get_stats()
+    assert stats['created'] == 3
+    assert stats['evicted'] == 2
+    assert stats['size'] == 1
+
+
+def test_rollback_on_error():
+    """db.pool: test a failed block rolls back the transaction"""
+    pool = _get_pool()
+    try:
+        with pool.connection() as conn:
+            raise ValueError()
+    except ValueError:
+        pass
+    assert conn.rollbacks == 1
+    assert not conn.closed
+    assert pool.get_stats()['in_use'] == 0
+
+
+@raises(DatabaseError)
+def test_release_foreign():
+    """db.pool: test releasing a connection not held by the thread"""
+    _get_pool().release(FakeConnection())
+
+
+def test_close():
+    """db.pool: test closing the pool"""
+    pool = _get_pool(min_size=1)
+    idle = pool.acquire()
+    held = threading.Thread(target=pool.acquire)
+    held.start()
+    held.join()
+    pool.release(idle)
+    pool.close()
+    assert idle.closed
+    assert pool.get_stats()['size'] == 0
+    try:
+        pool.acquire()
+        assert False, 'DatabaseError expected'
+    except DatabaseError:
+        pass
@@ -0,0 +1,151 @@
+import os
+from nose import SkipTest
+from nose.tools import raises
+from unittest.mock import MagicMock
+from etl.db.connection import DBConnection, DatabaseError
+
+try:
+    from etl.db.drivers import postgresql
+except ImportError:
+    postgresql = None
+
+
+def setup_module():
+    if postgresql is None:
+        raise SkipTest('psycopg2 is not installed')
+
+
+def _get_connection() -> DBConnection:
+    """Create and return a connection to the test database given by the RATTLE_TEST_POSTGRESQL environment variable
+    ('host:port:dbname:username:password'), with a test table."""
+    spec = os.environ.get('RATTLE_TEST_POSTGRESQL')
+    if not spec:
+        raise SkipTest('RATTLE_TEST_POSTGRESQL is not set')
+    host, port, dbname, username, password = spec.split(':', 4)
+    conn = DBConnection('postgresql:{}:{}:{}'.format(host, port, dbname), username, password)
+    conn.execute('create temporary table t(id integer, name text, dt date)')
+    return conn
+
+
+def test_copy_format():
+    """db.drivers.postgresql: test formatting rows for COPY"""
+    assert postgresql.CopyStream.format_row([1, 'a', None, 2.5]) == '1\ta\t\\N\t2.5\n'
+    assert postgresql.CopyStream.format_row(['tab\there', 'new\nline', 'back\\slash', 'cr\r']) == \
+        'tab\\there\tnew\\nline\tback\\\\slash\tcr\\r\n'
+
+
+def test_copy_read():
+    """db.drivers.postgresql: test reading COPY data in chunks"""
+    rows = [[i, 'name{}'.format(i)] for i in range(100)]
+    expected = ''.join(postgresql.CopyStream.format_row(row) for row in rows)
+
+    # Read in chunks of various sizes
+    for size in (1, 7, 64, 100000):
+        stream = postgresql.CopyStream(rows)
+        chunks = []
+        while True:
+            chunk = stream.read(size)
+            if not chunk:
+                break
+            assert len(chunk) <= size
+            chunks.append(chunk)
+        assert ''.join(chunks) == expected
+        assert stream.count == 100
+
+    # Read all at once
+    stream = postgresql.CopyStream(rows)
+    assert stream.read() == expected
+    assert stream.read() == ''
+
+
+def test_copy_error():
+    """db.drivers.postgresql: test keeping the error raised by the rows"""
+    def rows():
+        yield [1]
+        raise ValueError('Bad row')
+    stream = postgresql.CopyStream(rows())
+    try:
+        stream.read()
+        assert False, 'ValueError expected'
+    except ValueError:
+        pass
+    assert isinstance(stream.error, ValueError)
+
+
+def test_translate():
+    """db.drivers.postgresql: test translating named parameter references"""
+    assert postgresql.Cursor.translate('select * from t where id = :id and name = :name') == \
+        'select * from t where id = %(id)s and name = %(name)s'
+    assert postgresql.Cursor.translate("select ':x', '5%', id::text, 10 % 3 from t where id = :x") == \
+        "select ':x', '5%%', id::text, 10 %% 3 from t where id = %(x)s"
+
+
+def test_translate_positional():
+    """db.drivers.postgresql: test escaping '%' in statements with positional parameters"""
+    assert postgresql.Cursor.translate("insert into t values(%s, '5%', :x, 10 % 3, %s)", False) == \
+        "insert into t values(%s, '5%%', :x, 10 %% 3, %s)"
+
+
+def test_execute_empty_params():
+    """db.drivers.postgresql: test statements are translated and given the parameters even when they are empty"""
+    mock_cursor = MagicMock()
+    cur = postgresql.Cursor(mock_cursor)
+    cur.execute("select * from t where name like 'abc%'", {})
+    mock_cursor.execute.assert_called_once_with("select * from t where name like 'abc%%'", {})
+    mock_cursor.reset_mock()
+    cur.execute("select * from t where name like 'abc%'", [])
+    mock_cursor.execute.assert_called_once_with("select * from t where name like 'abc%%'", [])
+    mock_cursor.reset_mock()
+    cur.execute("select * from t where name like 'abc%'")
+    mock_cursor.execute.assert_called_once_with("select * from t where name like 'abc%'", None)
+
+
+@raises(DatabaseError)
+def test_connect_invalid_spec():
+    """db.drivers.postgresql: test invalid connection string"""
+    DBConnection('postgresql:localhost:5432', '', '')
+
+
+def test_bulk_load():
+    """db.drivers.postgresql: test bulk loading rows"""
+    conn = _get_connection()
+    count = conn.bulk_load('t', ['id', 'name', 'dt'], [[1, 'a\tb', '2015-01-31'], [2, None, None]])
+    assert count == 2
+    assert conn.query_value('select count(*) from t where name is null') == 1
+    assert conn.query_value('select name from t where id = :id', {'id': 1}) == 'a\tb'
+
+
+def test_query_cursor():
+    """db.drivers.postgresql: test fetching a query result through a server-side cursor"""
+    conn = _get_connection()
+    cur = conn.query_cursor(arraysize=7)
+    cur.execute('select g, :name from generate_series(1, 20) g', {'name': 'x'})
+    assert list(cur) == [(i, 'x') for i in range(1, 21)]
+    assert cur.description[0][0] == 'g'
+    cur.close()
+    conn.rollback()
+
+
+def test_query_cursor_withhold():
+    """db.drivers.postgresql: test server-side cursors are declared WITH HOLD"""
+    driver = MagicMock(_cursor_ids=iter([1]))
+    postgresql.Driver.query_cursor(driver, 5, None)
+    driver._connection.cursor.assert_called_once_with(name='rattle_query_1', withhold=True)
+
+
+def test_query_cursor_commit():
+    """db.drivers.postgresql: test a server-side cursor survives a commit between fetches"""
+    conn = _get_connection()
+    cur = conn.query_cursor(arraysize=5)
+    cur.execute('select g from generate_series(1, 12) g')
+    rows = cur.fetchmany()
+    # A child handler sharing the connection commits its work
+    conn.execute('insert into t(id) values(1)')
+    conn.commit()
+    while True:
+        batch = cur.fetchmany()
+        if not batch:
+            break
+        rows.extend(batch)
+    assert rows == [(i,) for i in range(1, 13)]
+    cur.close()
@@ -0,0 +1,69 @@
+from unittest.mock import patch
+from etl.db.result_cache import ResultCache
+
+
+def test_get_put():
+    """db.result_cache: test caching values per database"""
+    cache = ResultCache(100)
+    assert cache.get('db', 'q') is None
+    cache.put('db', 'q', 'value', 5, cache.generation('db'))
+    assert cache.get('db', 'q') == 'value'
+    assert cache.get('db2', 'q') is None
+    stats = cache.get_stats()
+    assert stats['hits'] == 1 and stats['misses'] == 2
+    assert stats['entries'] == 1 and stats['size'] == 5
+
+
+def test_lru_eviction():
+    """db.result_cache: test the least recently used entries are evicted to stay within the size limit"""
+    cache = ResultCache(10)
+    for key in 'abc':
+        cache.put('db', key, key, 4, 0)
+    # 'a' is evicted to make room for 'c'
+    assert cache.get('db', 'a') is None
+    assert cache.get('db', 'b') == 'b'
+    # 'c' is now the least recently used one
+    cache.put('db', 'd', 'd', 4, 0)
+    assert cache.get('db', 'c') is None
+    assert cache.get('db', 'b') == 'b'
+    assert cache.get_stats()['evicted'] == 2
+
+    # Values larger than the limit aren't cached at all
+    cache.put('db', 'e', 'e', 11, 0)
+    assert cache.get('db', 'e') is None
+    assert cache.get('db', 'd') == 'd'
+
+
+def test_ttl():
+    """db.result_cache: test entries expire after their time-to-live"""
+    cache = ResultCache(100, ttl=10)
+    with patch('etl.db.result_cache.time.monotonic', return_value=1000.0) as mock_time:
+        cache.put('db', 'default', 1, 1, 0)
+        cache.put('db', 'short', 2, 1, 0, ttl=1)
+        mock_time.return_value = 1005.0
+        assert cache.get('db', 'short') is None
+        assert cache.get('db', 'default') == 1
+        mock_time.return_value = 1010.0
+        assert cache.get('db', 'default') is None
+    stats = cache.get_stats()
+    assert stats['expired'] == 2 and stats['entries'] == 0 and stats['size'] == 0
+
+
+def test_invalidate():
+    """db.result_cache: test invalidating the entries of a database"""
+    cache = ResultCache(100)
+    cache.put('db', 'q', 1, 1, 0)
+    cache.put('db2', 'q', 2, 1, 0)
+
+    # A query started before the invalidation must not be cached
+    generation = cache.generation('db')
+    cache.invalidate('db')
+    cache.put('db', 'q2', 3, 1, generation)
+    assert cache.get('db', 'q') is None
+    assert cache.get('db', 'q2') is None
+    assert cache.get('db2', 'q') == 2
+
+    # The ones started afterwards are cached again
+    cache.put('db', 'q', 4, 1, cache.generation('db'))
+    assert cache.get('db', 'q') == 4
+    assert cache.get_stats()['invalidated'] == 1
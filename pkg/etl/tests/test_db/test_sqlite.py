@@ -0,0 +1,370 @@
+import contextlib
+import datetime
+import json
+import os
+import sqlite3
+import tempfile
+from nose import SkipTest
+from nose.tools import raises
+from unittest.mock import patch
+from etl import config
+from etl import context
+from etl.db.array_inserter import DBArrayInserter
+from etl.db.connection import DBConnection, DatabaseError
+from etl.db.drivers import sqlite
+from etl.handlers import db_transfer
+from etl.handlers import db_uploader
+from etl.handlers import sql_iterator
+from etl.handlers import sql_query
+from etl.handlers import sql_statement
+from etl.tests import helpers
+
+
+def _get_connection(settings: str='') -> DBConnection:
+    """Create and return a connection to a new in-memory database with a test table."""
+    conn = DBConnection('sqlite::memory:' + settings, '', '')
+    conn.execute('create table t(id integer, name text, dt text)')
+    return conn
+
+
+def test_connect():
+    """db.drivers.sqlite: test connecting and applying default settings"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conn = DBConnection('sqlite:' + os.path.join(tmp_dir, 'test.db'), '', '')
+        assert conn.query_value('pragma journal_mode') == 'wal'
+        assert conn.query_value('pragma synchronous') == 1  # NORMAL
+        assert conn.version().count('.') == 2
+        del conn
+
+
+def test_connect_settings():
+    """db.drivers.sqlite: test overriding settings in the connection string"""
+    conn = _get_connection(';synchronous=OFF; cache_size = -1024')
+    assert conn.query_value('pragma synchronous') == 0
+    assert conn.query_value('pragma cache_size') == -1024
+
+
+@raises(DatabaseError)
+def test_connect_invalid_setting():
+    """db.drivers.sqlite: test invalid setting in the connection string"""
+    DBConnection('sqlite::memory:;synchronous', '', '')
+
+
+def test_cursor_cache():
+    """db.drivers.sqlite: test cursors are reused per SQL text and the least recently used ones are closed"""
+    conn = DBConnection('sqlite::memory:', '', '', cursor_cache_size=2)
+    conn.execute('create table t(id integer, name text, dt text)')
+    for i in range(3):
+        conn.execute('insert into t(id) values(:id)', {'id': i})
+    assert conn.query_value('select count(*) from t') == 3
+    assert conn.query_value('select count(*) from t') == 3
+    assert conn.get_cursor_cache_stats() == {'size': 2, 'hits': 3, 'misses': 3, 'evicted': 1}
+
+    # A failing statement's cursor isn't cached
+    with contextlib.suppress(Exception):
+        conn.execute('insert into nonexistent values(1)')
+    assert conn.get_cursor_cache_stats()['size'] == 2
+    conn.close()
+    assert conn.get_cursor_cache_stats()['size'] == 0
+
+
+def test_cursor_cache_ddl_after_select():
+    """db.drivers.sqlite: test a query run with execute() doesn't keep the table locked by a cached cursor"""
+    conn = _get_connection()
+    conn.execute('insert into t(id) values(1)')
+    conn.execute('insert into t(id) values(2)')
+    conn.execute('select id from t')
+    conn.execute('drop table t')
+    assert conn.query_value("select count(*) from sqlite_master where name = 't'") == 0
+
+
+def test_pending_writes():
+    """db.drivers.sqlite: test tracking uncommitted changes"""
+    conn = DBConnection('sqlite::memory:', '', '', cursor_cache_size=0)
+    assert conn.query_value('select 1') == 1
+    assert not conn.pending_writes
+    conn.execute('create table t(id integer)')
+    assert conn.pending_writes
+    conn.commit()
+    assert not conn.pending_writes
+    conn.execute('insert into t(id) values(1)')
+    conn.rollback()
+    assert not conn.pending_writes
+
+
+def test_bind_datetime():
+    """db.drivers.sqlite: test binding datetime values without a process-wide sqlite3 adapter"""
+    conn = _get_connection()
+    value = datetime.datetime(2016, 12, 31, 23, 59, 58)
+    conn.execute('insert into t(id, dt) values(:id, :dt)', {'id': 1, 'dt': value})
+    cur = conn.cursor()
+    cur.executemany('insert into t(id, dt) values(?, ?)', [(2, value), (3, None)])
+    cur.close()
+    assert conn.query_value('select group_concat(dt) from t') == '2016-12-31 23:59:58,2016-12-31 23:59:58'
+    # Other SQLite connections of the process aren't affected
+    assert all(getattr(adapt, '__module__', None) != sqlite.__name__ for adapt in sqlite3.adapters.values())
+    cur = conn.query_cursor(arraysize=2)
+    cur.execute('select id from t order by id')
+    assert cur.fetchmany() == [(1,), (2,)]
+    cur.close()
+
+
+def test_cursor_cache_disabled():
+    """db.drivers.sqlite: test disabling the cursor cache"""
+    conn = DBConnection('sqlite::memory:', '', '', cursor_cache_size=0)
+    assert conn.query_value('select 1') == 1
+    assert conn.query_value('select 1') == 1
+    assert conn.get_cursor_cache_stats() == {'size': 0, 'hits': 0, 'misses': 0, 'evicted': 0}
+
+
+def test_array_insert_transaction():
+    """db.drivers.sqlite: test array inserts are done in a single transaction, until committed or rolled back"""
+    conn = _get_connection()
+    inserter = DBArrayInserter(conn, 'insert into t(id, name) values(?, ?)', [conn.NUMBER, 10])
+    for i in range(250):
+        inserter.push_row([i, 'Name ' + str(i)])
+    inserter.flush()
+    assert conn.query_value('select count(*) from t') == 250
+    conn.rollback()
+    assert conn.query_value('select count(*) from t') == 0
+
+    # Begin is a no-op inside a transaction
+    conn.begin()
+    conn.execute('insert into t(id) values(:id)', {'id': 1})
+    conn.begin()
+    conn.commit()
+    conn.rollback()
+    assert conn.query_value('select count(*) from t') == 1
+
+
+def test_to_date():
+    """db.drivers.sqlite: test Oracle-style date conversion"""
+    assert sqlite.Driver.to_date('20150304', 'YYYYMMDD') == '2015-03-04 00:00:00'
+    assert sqlite.Driver.to_date('04.03.15 17:05:09', 'dd.mm.yy hh24:mi:ss') == '2015-03-04 17:05:09'
+    assert sqlite.Driver.to_date('Mar 4 2015 5:05 PM', 'Mon DD YYYY HH:MI AM') == '2015-03-04 17:05:00'
+    assert sqlite.Driver.to_date(None, 'YYYYMMDD') is None
+
+    # Also in SQL
+    conn = _get_connection()
+    sql = 'select ' + conn.get_datetime_expression("'2016-12-31'", "'YYYY-MM-DD'")
+    assert conn.query_value(sql) == '2016-12-31 00:00:00'
+
+
+def test_handlers():
+    """db.drivers.sqlite: test database handlers end to end"""
+    conn = _get_connection()
+    with patch('etl.context.db_connection', return_value=helpers.NullContext(conn)):
+        # Load the data
+        db_uploader.Handler().run(config.Config({
+            'format':          'delimited',
+            'delimiter':       ',',
+            'data':            '1,one,20150101\n2,two,20150102\n',
+            'target_database': 'db',
+            'target_table':    't',
+            'truncate_target': True,
+            'column_mappings': [
+                config.Config({'name': 'id',   'datatype': 'integer',  'source_index': 0, 'target_column': 'id'}),
+                config.Config({'name': 'name', 'datatype': 'string',   'source_index': 1, 'target_column': 'name',
+                               'length': 10}),
+                config.Config({'name': 'dt',   'datatype': 'datetime', 'source_index': 2, 'target_column': 'dt',
+                               'source_format': 'YYYYMMDD'}),
+            ]
+        }))
+
+        # Modify it
+        sql_statement.Handler().run(config.Config({
+            'database': 'db',
+            'sql':      'update t set name = upper(name) where id = :id',
+            'params':   [config.Config({'name': 'id', 'value': '2'})]
+        }))
+
+        # Query it
+        result = sql_query.Handler().run(config.Config({
+            'database':        'db',
+            'field_delimiter': '|',
+            'sql':             'select id, name, dt from t order by id'
+        }))
+    assert result['data'] == '1|one|2015-01-01 00:00:00\n2|TWO|2015-01-02 00:00:00\n'
+
+
+def test_statement_param_mappings():
+    """db.drivers.sqlite: test executing a statement per input line, in batches"""
+    conn = _get_connection()
+    for i in range(5):
+        conn.execute('insert into t(id, name) values(:id, :name)', {'id': i, 'name': 'n{}'.format(i)})
+    with patch('etl.context.db_connection', return_value=helpers.NullContext(conn)), \
+            patch('etl.handlers.sql_statement.logger') as mock_logger:
+        sql_statement.Handler().run(config.Config({
+            'database':       'db',
+            'sql':            'update t set name = :name, dt = :dt where id = :id',
+            'params':         [config.Config({'name': 'dt', 'value': 'x'})],
+            'data':           '1;one\n3;three\n4;four\n9;nine\n',
+            'format':         'delimited',
+            'delimiter':      ';',
+            'batch_size':     2,
+            'param_mappings': [
+                config.Config({'name': 'id',   'datatype': 'integer', 'source_index': 0}),
+                config.Config({'name': 'name', 'datatype': 'string',  'source_index': 1, 'length': 10}),
+            ],
+        }))
+        mock_logger.info.assert_called_once_with('Statement 1 of 1: 3 rows affected')
+    cur = conn.cursor()
+    cur.execute('select id, name, dt from t order by id')
+    assert cur.fetchall() == [
+        (0, 'n0', None), (1, 'one', 'x'), (2, 'n2', None), (3, 'three', 'x'), (4, 'four', 'x')]
+
+
+def test_transfer():
+    """db.drivers.sqlite: test transferring rows between databases with native types"""
+    source = _get_connection()
+    for i in range(25):
+        source.execute('insert into t(id, name) values(:id, :name)', {'id': i, 'name': 'n{}'.format(i)})
+    target = _get_connection()
+    target.execute('create table t2(num integer, label text, ts text)')
+    conns = {'src': source, 'tgt': target}
+    with patch('etl.context.db_connection', side_effect=lambda name, **kwargs: helpers.NullContext(conns[name])):
+        db_transfer.Handler().run(config.Config({
+            'source_database': 'src',
+            'sql':             'select id, name, dt from t where id >= :min_id order by id',
+            'params':          [config.Config({'name': 'min_id', 'value': '5'})],
+            'target_database': 'tgt',
+            'target_table':    't2',
+            'target_columns':  ['num', 'label', 'ts'],
+            'batch_size':      4,
+            'commit_every':    10,
+        }))
+    cur = target.cursor()
+    cur.execute('select num, label, ts from t2 order by num')
+    assert cur.fetchall() == [(i, 'n{}'.format(i), None) for i in range(5, 25)]
+
+
+def test_iterator():
+    """db.drivers.sqlite: test invoking a handler per query result row with native values"""
+    conn = _get_connection()
+    for i in range(5):
+        conn.execute('insert into t(id, name) values(:id, :name)', {'id': i, 'name': 'n{}'.format(i)})
+    with patch('etl.context.db_connection', return_value=helpers.NullContext(conn)), \
+            patch('etl.context.invoke_handler', new_callable=helpers.CopyingMock) as mock_invoke:
+        sql_iterator.Handler().run(config.Config({
+            'database':  'db',
+            'sql':       'select id, name, dt from t where id > :min_id order by id',
+            'params':    [config.Config({'name': 'min_id', 'value': '1'})],
+            'arraysize': 2,
+            'handler':   {},
+        }))
+    assert [c[0][1] for c in mock_invoke.call_args_list] == [
+        {'id': i, 'name': 'n{}'.format(i), 'dt': None} for i in range(2, 5)]
+
+
+def test_query_stream():
+    """db.drivers.sqlite: test streaming a query result with the given arraysize"""
+    conn = _get_connection()
+    for i in range(25):
+        conn.execute('insert into t(id, name) values(:id, :name)', {'id': i, 'name': 'n{}'.format(i)})
+    cur = conn.query_cursor(arraysize=10)
+    assert cur.arraysize == 10
+    cur.close()
+    with patch('etl.context.db_connection', return_value=helpers.NullContext(conn)):
+        result = sql_query.Handler().run(config.Config({
+            'database':        'db',
+            'field_delimiter': ',',
+            'col_headers':     True,
+            'stream':          True,
+            'arraysize':       10,
+            'sql':             'select id, name from t order by id',
+        }))
+        lines = list(result['data'])
+    assert lines == ['id,name\n'] + ['{0},n{0}\n'.format(i) for i in range(25)]
+
+
+def test_query_arrow():
+    """db.drivers.sqlite: test fetching a query result in the Arrow format"""
+    try:
+        import pyarrow
+    except ImportError:
+        raise SkipTest('pyarrow is not installed')
+    conn = _get_connection()
+    for i in range(25):
+        conn.execute('insert into t(id, name) values(:id, :name)', {'id': i, 'name': 'n{}'.format(i)})
+    with patch('etl.context.db_connection', return_value=helpers.NullContext(conn)):
+        result = sql_query.Handler().run(config.Config({
+            'database':      'db',
+            'output_format': 'arrow',
+            'arraysize':     10,
+            'sql':           'select id, name, dt from t order by id',
+        }))
+    batches = list(pyarrow.ipc.open_stream(result['data']))
+    assert [b.num_rows for b in batches] == [10, 10, 5]
+    table = pyarrow.Table.from_batches(batches)
+    assert table.schema.types == [pyarrow.int64(), pyarrow.string(), pyarrow.string()]
+    assert table.column('id').to_pylist() == list(range(25))
+    assert table.column('dt').null_count == 25
+
+
+def test_datetime_parsing():
+    """db.drivers.sqlite: test loading datetime values parsed by db_uploader"""
+    conn = _get_connection()
+    with patch('etl.context.db_connection', return_value=helpers.NullContext(conn)):
+        db_uploader.Handler().run(config.Config({
+            'format':           'fixed',
+            'data':             '1 04.03.2015\n2           \n',
+            'target_database':  'db',
+            'target_table':     't',
+            'datetime_parsing': 'handler',
+            'column_mappings': [
+                config.Config({'name': 'id', 'datatype': 'integer',  'source_pos': '1:1',  'target_column': 'id'}),
+                config.Config({'name': 'dt', 'datatype': 'datetime', 'source_pos': '3:12', 'target_column': 'dt',
+                               'source_format': 'DD.MM.YYYY', 'source_trim': 'both'}),
+            ]
+        }))
+    assert conn.query_value("select group_concat(id || '=' || ifnull(dt, '-'), ',') from t") == \
+        '1=2015-03-04 00:00:00,2=-'
+
+
+def test_parallel_load():
+    """db.drivers.sqlite: test loading data on worker processes end to end"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_file_name = os.path.join(tmp_dir, 'test.db')
+        conn = DBConnection('sqlite:' + db_file_name, '', '')
+        conn.execute('create table t(id integer, name text, dt text)')
+        conn.execute('insert into t(id) values(0)')
+        conn.commit()
+
+        # Set up a configuration defining the database
+        config_file_name = os.path.join(tmp_dir, 'test.json')
+        with open(config_file_name, 'w') as f:
+            json.dump({'databases': [{'name': 'db', 'connection': 'sqlite:' + db_file_name, 'username': '',
+                                      'password': ''}]}, f)
+        context.initialise(config_file_name, False, False, {})
+        try:
+            db_uploader.Handler().run(config.Config({
+                'format':              'delimited',
+                'delimiter':           ',',
+                'data':                'HEADER\n' + ''.join('{},"name\n{}"\n'.format(i, i) for i in range(1, 26)),
+                'start_line':          2,
+                'target_database':     'db',
+                'target_table':        't',
+                'truncate_target':     True,
+                'parallel_degree':     2,
+                'parallel_chunk_size': 10,
+                'column_mappings': [
+                    config.Config({'name': 'id', 'datatype': 'integer', 'source_index': 0, 'target_column': 'id'}),
+                    config.Config({'name': 'name', 'datatype': 'string', 'source_index': 1, 'target_column': 'name',
+                                   'length': 10}),
+                    config.Config({'name': 'rn', 'target_column': 'dt', 'target_expr': '{rownum}'}),
+                ]
+            }))
+        finally:
+            context.teardown()
+
+        # Rows of all chunks are committed and numbered in the source order, quoted line breaks kept intact
+        assert conn.query_value('select count(*) from t where id = cast(dt as integer)') == 25
+        assert conn.query_value("select count(*) from t where name = 'name' || char(10) || id") == 25
+        assert conn.query_value('select count(*) from t') == 25
+        del conn
+
+
+@raises(ValueError)
+def test_to_date_mismatch():
+    """db.drivers.sqlite: test date conversion of a value not matching the format"""
+    sqlite.Driver.to_date('2015-0304', 'YYYY-MM-DD')
@@ -1,4 +1,5 @@
 from nose.tools import raises
+from etl import errors
 from etl.handlers import base
 
 
@@ -6,3 +7,33 @@ from etl.handlers import base
 def test_class_is_abstract():
     """handlers.base: verify that the base handler class is abstract"""
     base.Handler()
+
+
+def test_line_stream():
+    """handlers.base: test line stream can be consumed once"""
+    stream = base.LineStream(line for line in ['a\n', 'b\n'])
+    assert stream.read() == 'a\nb\n'
+
+
+@raises(errors.LogicError)
+def test_line_stream_consumed():
+    """handlers.base: test consuming line stream twice"""
+    stream = base.LineStream(['a\n'])
+    list(stream)
+    list(stream)
+
+
+def test_materialise():
+    """handlers.base: test materialising line streams in parameters"""
+    params = {'a': base.LineStream(['x\n', 'y']), 'b': 42}
+    base.materialise(params)
+    assert params == {'a': 'x\ny', 'b': 42}
+
+
+def test_materialise_consumed():
+    """handlers.base: test materialising skips consumed line streams"""
+    stream = base.LineStream(['x\n'])
+    stream.read()
+    params = {'a': stream}
+    assert base.materialise(params) == {}
+    assert params['a'] is stream
@@ -0,0 +1,96 @@
+from unittest.mock import patch
+from unittest.mock import call
+from unittest.mock import MagicMock
+from nose.tools import raises
+from etl import config
+from etl import errors
+from etl.handlers import db_transfer
+
+
+@patch('etl.handlers.db_transfer.sql_query.Handler.fetch_batches')
+@patch('etl.handlers.db_transfer.DBArrayInserter')
+@patch('etl.handlers.db_transfer.context')
+def _invoke_with(conf, batches, mock_context, mock_inserter, mock_fetch, dry_run=False, bulk=False) -> tuple:
+    """Run the handler with the specified config, in a mocked context, fetching the given batches (the first one being
+    the list of column names). Return the mocked target DB, inserter class and fetch_batches() objects."""
+    # Create a fake target DB connection
+    mockdb = MagicMock()
+    mockdb.supports_bulk_load = bulk
+    mockdb.get_param_placeholder.side_effect = lambda idx: ':' + str(idx)
+    mockdb.bulk_load.side_effect = lambda table, cols, rows: len(list(rows))
+
+    # Set up our fake context
+    mock_context.dry_run_mode   = dry_run
+    mock_context.dry_run_prefix = ''
+    mock_context.db_connection.return_value.__enter__.return_value = mockdb
+    mock_fetch.return_value = (b for b in batches)
+
+    # Run the handler
+    db_transfer.Handler().run(config.Config(
+        {'source_database': 'srcdb', 'target_database': 'tgtdb', 'target_table': 'tab', 'sql': 'QUERY'}, **conf))
+
+    # Verify the target DB was requested
+    mock_context.db_connection.assert_called_once_with('tgtdb', writes=True)
+    return mockdb, mock_inserter, mock_fetch
+
+
+def test_insert():
+    """handlers.db_transfer: test transferring rows with an array inserter"""
+    batches = [['A', 'B'], [(1, 'x'), (2, None)], [(3, 'z')]]
+    db, inserter, fetch = _invoke_with({'batch_size': 2}, batches)
+    fetch.assert_called_once_with('srcdb', 'QUERY', {}, 2, None, 1000000, 2, {'rows': 0})
+    inserter.assert_called_once_with(db, 'insert into tab(A, B) values(:1, :2)', None, False, True, batch_size=2)
+    assert inserter.return_value.push_row.call_args_list == [call((1, 'x')), call((2, None)), call((3, 'z'))]
+    assert inserter.return_value.flush.call_count == 1
+    assert inserter.return_value.close.called
+    assert db.commit.call_count == 1
+    assert not db.execute.called
+
+
+def test_target_columns():
+    """handlers.db_transfer: test mapping the result columns onto target columns, truncating the target"""
+    batches = [['A', 'B'], [(1, 'x')]]
+    db, inserter, _ = _invoke_with(
+        {'target_columns': ['C1', 'C2'], 'truncate_target': True, 'background_insert': False, 'batch_size': 'auto'},
+        batches)
+    db.execute.assert_called_once_with(db.get_truncate_statement.return_value)
+    inserter.assert_called_once_with(db, 'insert into tab(C1, C2) values(:1, :2)', None, False, False, adaptive=True)
+
+
+@raises(errors.ConfigError)
+def test_target_columns_mismatch():
+    """handlers.db_transfer: test target_columns not matching the result columns"""
+    _invoke_with({'target_columns': ['C1']}, [['A', 'B'], [(1, 'x')]])
+
+
+@raises(errors.ConfigError)
+def test_same_database():
+    """handlers.db_transfer: test transferring within the same database"""
+    _invoke_with({'target_database': 'srcdb'}, [['A'], [(1,)]])
+
+
+def test_commit_every():
+    """handlers.db_transfer: test committing every commit_every rows"""
+    batches = [['A'], [(1,), (2,)], [(3,), (4,)], [(5,)]]
+    db, inserter, _ = _invoke_with({'batch_size': 2, 'commit_every': 3}, batches)
+    # Committed after the 4th row, and at the end
+    assert inserter.return_value.flush.call_count == 2
+    assert db.commit.call_count == 2
+
+
+def test_bulk_load():
+    """handlers.db_transfer: test bulk loading rows in chunks of commit_every rows"""
+    batches = [['A'], [(1,), (2,)], [(3,)]]
+    db, inserter, _ = _invoke_with({'commit_every': 2}, batches, bulk=True)
+    assert not inserter.called
+    assert db.bulk_load.call_count == 2
+    assert db.bulk_load.call_args[0][:2] == ('tab', ['A'])
+    assert db.commit.call_count == 3
+
+
+def test_dry_run():
+    """handlers.db_transfer: test dry-run mode only fetches the rows"""
+    db, inserter, _ = _invoke_with({'truncate_target': True}, [['A'], [(1,), (2,)]], dry_run=True)
+    assert not inserter.called
+    assert not db.execute.called
+    assert not db.commit.called
@@ -1,9 +1,14 @@
+import datetime
+import json
+import os
+import tempfile
 from unittest.mock import patch
 from unittest.mock import call
 from unittest.mock import MagicMock
 from nose.tools import raises
 from etl import errors
 from etl import config
+from etl.handlers import base
 from etl.handlers import db_uploader
 
 
@@ -56,6 +61,8 @@ def _invoke_with(base_conf, extra_conf, mappings, dry_run, mock_context, mock_in
     # Create a fake DB connection
     mockdb = MagicMock()
     mockdb.get_param_placeholder.return_value = '.'  # Required to allow building SQL statements
+    mockdb.get_datetime_expression.return_value = '.'
+    mockdb.supports_bulk_load = False
 
     # Create a fake DBArrayInserter
     mockins = MagicMock()
@@ -65,7 +72,7 @@ def _invoke_with(base_conf, extra_conf, mappings, dry_run, mock_context, mock_in
     # Set up our fake context
     mock_context.dry_run_mode = dry_run
     mock_context.dry_run_prefix = ''
-    mock_context.get_db_connection.return_value = mockdb
+    mock_context.db_connection.return_value.__enter__.return_value = mockdb
 
     # Prepare config
     conf = config.Config(
@@ -81,9 +88,11 @@ def _invoke_with(base_conf, extra_conf, mappings, dry_run, mock_context, mock_in
     db_uploader.Handler().run(conf)
 
     # Verify our DB was requested
-    mock_context.get_db_connection.assert_called_with('mockdb')
+    mock_context.db_connection.assert_called_with('mockdb', writes=True)
     # Verify commit has [not] been done
     assert mockdb.commit.call_count == 0 if dry_run else 1
+    # Verify the inserter has been closed
+    assert mockins.close.called != dry_run
     return mockins
 
 
@@ -188,3 +197,389 @@ def test_dry_run():
     """handlers.db_uploader: test dry run mode"""
     mock_ins = _invoke_with(_conf_delimited, {}, _mappings_delimited, True)
     assert not mock_ins.push_row.called
+
+
+def test_fixed_trim():
+    """handlers.db_uploader: test trimming fixed-width values"""
+    mock_ins = _invoke_with(
+        _conf_fixed,
+        {'data': ' ab  cd  ef  gh \n'},
+        [
+            {'name': 'c1', 'datatype': 'string', 'source_pos': '1:4',   'target_column': 'C1', 'length': 4},
+            {'name': 'c2', 'datatype': 'string', 'source_pos': '5:8',   'target_column': 'C2', 'length': 4,
+             'source_trim': 'left'},
+            {'name': 'c3', 'datatype': 'string', 'source_pos': '9:12',  'target_column': 'C3', 'length': 4,
+             'source_trim': 'right'},
+            {'name': 'c4', 'datatype': 'string', 'source_pos': '13:16', 'target_column': 'C4', 'length': 4,
+             'source_trim': 'both'},
+        ],
+        False)
+
+    # Check push_row() calls
+    assert mock_ins.push_row.call_args_list == [call([' ab ', 'cd ', ' ef', 'gh'])]
+
+
+def test_null_values():
+    """handlers.db_uploader: test empty values are loaded as nulls"""
+    mock_ins = _invoke_with(_conf_delimited, {'data': ',,,,'}, _mappings_delimited, False)
+
+    # Check push_row() calls
+    assert mock_ins.push_row.call_args_list == [call([None, None, None, None, None])]
+
+
+@raises(errors.ConfigError)
+def test_invalid_source_pos():
+    """handlers.db_uploader: test invalid source_pos is rejected even without data"""
+    _invoke_with(
+        _conf_fixed,
+        {'data': ''},
+        [{'name': 'col_a', 'datatype': 'string', 'source_pos': '6:x', 'target_column': 'A', 'length': 1}],
+        False)
+
+
+@raises(errors.ConfigError)
+def test_invalid_source_index():
+    """handlers.db_uploader: test non-numeric source_index is rejected"""
+    _invoke_with(
+        _conf_delimited,
+        {},
+        [{'name': 'col_a', 'datatype': 'string', 'source_index': 'x', 'target_column': 'A', 'length': 1}],
+        False)
+
+
+@raises(errors.ConfigError)
+def test_invalid_trim():
+    """handlers.db_uploader: test invalid source_trim value"""
+    _invoke_with(
+        _conf_delimited,
+        {},
+        [{'name': 'col_a', 'datatype': 'string', 'source_index': 0, 'target_column': 'A', 'length': 1,
+          'source_trim': 'middle'}],
+        False)
+
+
+@raises(errors.DataError)
+def test_integer_error():
+    """handlers.db_uploader: test invalid integer value"""
+    _invoke_with(_conf_delimited, {'data': 'a,booboo,X,2.14,20141231'}, _mappings_delimited, False)
+
+
+def test_fixed_batches():
+    """handlers.db_uploader: test converting fixed-width lines in batches matches converting them one by one"""
+    mappings = [
+        config.Config(m) for m in _mappings_fixed + [
+            {'name': 'col_f', 'datatype': 'string', 'source_pos': '1:8', 'target_column': 'F', 'length': 2,
+             'truncate': True, 'source_trim': 'left'},
+            {'name': 'col_g', 'target_column': 'G', 'target_expr': '{rownum}'},
+        ]]
+    lines = ['HEADER\n'] + (_data_fixed + '\n     x  blabla\n' + _data_fixed + '\r\n').splitlines(True) * 3
+    extractors = db_uploader.Handler.compile_mappings(mappings, True, False)
+    convert_batch = db_uploader.Handler.compile_batch_converter(mappings, True)
+    with patch.object(db_uploader.Handler, 'convert_batch_rows', 4):
+        stats = {'src': 0, 'tgt': 0}
+        rows = list(db_uploader.Handler.convert_rows(lines, 2, True, extractors, stats, 0, 0, convert_batch))
+        expected = list(db_uploader.Handler.convert_rows(lines, 2, True, extractors, {}))
+    assert rows == expected
+    assert rows[2] == ['x', 'blabla', None, None, None, 'x ', 3]
+    assert stats == {'src': 16, 'tgt': 15}
+
+    # An error is reported at the offending line
+    try:
+        lines.append('     a  booboo X\n')
+        list(db_uploader.Handler.convert_rows(lines, 1, True, extractors, {}, 0, 0, convert_batch))
+        assert False, 'DataError expected'
+    except errors.DataError as e:
+        assert 'at line 17:' in str(e)
+
+
+def test_delimited_batches():
+    """handlers.db_uploader: test converting delimited rows in batches matches converting them one by one"""
+    mappings = [config.Config(m) for m in _mappings_delimited]
+    src_rows = [line.split(',') for line in (_data_delimited + '\nx,,,,\n' + _data_delimited).splitlines()] * 3
+    extractors = db_uploader.Handler.compile_mappings(mappings, False, True)
+    convert_batch = db_uploader.Handler.compile_batch_converter(mappings, False)
+    with patch.object(db_uploader.Handler, 'convert_batch_rows', 4):
+        rows = list(db_uploader.Handler.convert_rows(src_rows, 1, False, extractors, {}, 0, 0, convert_batch))
+        expected = list(db_uploader.Handler.convert_rows(src_rows, 1, False, extractors, {}))
+        assert rows == expected
+        assert rows[2] == ['x', None, None, None, None]
+
+        # An error is reported at the offending line, also for a missing value
+        for src_row in (['a', 'booboo', '1', 'X', '20141231'], ['a', 'booboo']):
+            try:
+                list(db_uploader.Handler.convert_rows(
+                    src_rows + [src_row], 1, False, extractors, {}, 0, 0, convert_batch))
+                assert False, 'DataError expected'
+            except errors.DataError as e:
+                assert 'at line 16:' in str(e)
+
+
+def test_datetime_parsing():
+    """handlers.db_uploader: test parsing datetime values in the handler"""
+    mappings = [
+        {'name': 'col_a', 'datatype': 'string',   'source_index': 0, 'target_column': 'A', 'length': 1},
+        {'name': 'col_e', 'datatype': 'datetime', 'source_index': 4, 'target_column': 'E',
+         'source_format': 'YYYYMMDD'},
+    ]
+    data = _data_delimited + '\nx,,,,\n' + _data_delimited
+    for extra_conf, expected in (
+            ({}, ['20141231', '20150101']),
+            ({'datetime_parsing': 'handler'}, [datetime.datetime(2014, 12, 31), datetime.datetime(2015, 1, 1)])):
+        mock_ins = _invoke_with(_conf_delimited, dict(extra_conf, data=data), mappings, False)
+        assert mock_ins.push_row.call_args_list == [
+            call(['a', expected[0]]), call(['d', expected[1]]), call(['x', None]),
+            call(['a', expected[0]]), call(['d', expected[1]])]
+
+    # The statement binds the value as is
+    mockdb = MagicMock()
+    mockdb.get_param_placeholder.return_value = '?'
+    mockdb.get_datetime_expression.side_effect = lambda value, fmt: 'To_Date({}, {})'.format(value, fmt)
+    mappings = [config.Config(m) for m in mappings]
+    for parse_datetime, values in ((False, "?, To_Date(?, 'YYYYMMDD')"), (True, '?, ?')):
+        stmt, _ = db_uploader.Handler.get_insert_statement(mockdb, 'TBL', mappings, False, True, {}, parse_datetime)
+        assert stmt.endswith('values({})'.format(values))
+    assert db_uploader.Handler.get_bulk_columns(mappings, False, True) is None
+    assert db_uploader.Handler.get_bulk_columns(mappings, False, True, True) == ['A', 'E']
+
+    # An invalid value is reported with the column name and the line
+    try:
+        _invoke_with(
+            _conf_delimited, {'data': data + '\na,,,,2015-01-01', 'datetime_parsing': 'handler'}, mappings, False)
+        assert False, 'DataError expected'
+    except errors.DataError as e:
+        assert str(e).startswith('Input data error at line 6: Datetime column "col_e": Value "2015-01-01" does not')
+
+
+@raises(errors.ConfigError)
+def test_datetime_parsing_invalid():
+    """handlers.db_uploader: test invalid datetime_parsing value"""
+    _invoke_with(_conf_delimited, {'datetime_parsing': 'server'}, _mappings_delimited, False)
+
+
+def test_stream():
+    """handlers.db_uploader: test loading a line stream"""
+    mock_ins = _invoke_with(
+        _conf_fixed, {'data': base.LineStream(_data_fixed.splitlines(True))}, _mappings_fixed, False)
+
+    # Check push_row() calls
+    assert mock_ins.push_row.call_args_list == _expected_calls
+
+
+@patch('etl.handlers.db_uploader.DBArrayInserter')
+@patch('etl.handlers.db_uploader.context')
+def test_background_insert(mock_context, mock_inserter):
+    """handlers.db_uploader: test creating an inserter working in background, with a given batch size"""
+    mockdb = MagicMock()
+    mockdb.get_param_placeholder.return_value = '.'
+    mock_context.dry_run_mode = False
+    mappings = [config.Config(m) for m in _mappings_delimited]
+    db_uploader.Handler.get_inserter(mockdb, 'TBL', mappings, False, True, {}, True)
+    assert mock_inserter.call_args[0][4] is True
+
+    # Batch size, fixed and adaptive
+    db_uploader.Handler.get_inserter(mockdb, 'TBL', mappings, False, True, {}, False, 5000)
+    assert mock_inserter.call_args[1] == {'batch_size': 5000}
+    db_uploader.Handler.get_inserter(mockdb, 'TBL', mappings, False, True, {}, False, 'auto')
+    assert mock_inserter.call_args[1] == {'adaptive': True}
+
+
+
+@patch('etl.handlers.db_uploader.DBArrayInserter')
+@patch('etl.handlers.db_uploader.context')
+def _invoke_bulk_with(extra_conf, mappings, mock_context, mock_inserter):
+    """Run the handler with specified config against a DB connection supporting bulk load.
+    :return Tuple (fake DB connection, fake inserter, list of bulk loaded rows).
+    """
+    # Create a fake DB connection, collecting the bulk loaded rows
+    loaded = []
+    mockdb = MagicMock()
+    mockdb.get_param_placeholder.return_value = '.'
+    mockdb.get_datetime_expression.return_value = '.'
+    mockdb.supports_bulk_load = True
+    mockdb.bulk_load.side_effect = lambda table_name, column_names, rows: loaded.extend(rows)
+
+    # Set up our fake context
+    mock_context.dry_run_mode = False
+    mock_context.dry_run_prefix = ''
+    mock_context.db_connection.return_value.__enter__.return_value = mockdb
+
+    # Run the handler
+    conf = config.Config(
+        {
+            'target_database': 'mockdb',
+            'target_table':    'TBL',
+            'column_mappings': [config.Config(m) for m in mappings]
+        },
+        **_conf_delimited)
+    conf.update(**extra_conf)
+    db_uploader.Handler().run(conf)
+    assert mockdb.commit.call_count == 1
+    return mockdb, mock_inserter.return_value, loaded
+
+
+def test_bulk_load():
+    """handlers.db_uploader: test loading via the driver's bulk load"""
+    mockdb, mock_ins, loaded = _invoke_bulk_with(
+        {'data': 'A,x\nB,y\nC,z'},
+        [
+            {'name': 'col_1', 'datatype': 'string', 'source_index': 0, 'target_column': 'COL1', 'length': 1},
+            {'name': 'col_2', 'datatype': 'string', 'source_index': 1, 'target_column': 'COL2', 'length': 1,
+             'target_expr': '{value}'},
+            {'name': 'col_3', 'target_column': 'COL3', 'target_expr': '{rownum}'},
+        ])
+
+    # Check the rows went to bulk_load() rather than an inserter
+    assert mockdb.bulk_load.call_args[0][:2] == ('TBL', ['COL1', 'COL2', 'COL3'])
+    assert loaded == [['A', 'x', 1], ['B', 'y', 2], ['C', 'z', 3]]
+    assert not mock_ins.push_row.called
+
+
+def test_bulk_load_fallback():
+    """handlers.db_uploader: test falling back to inserts when mappings require SQL expressions"""
+    for mapping in [
+            {'name': 'col_2', 'datatype': 'string', 'source_index': 1, 'target_column': 'COL2', 'length': 8,
+             'target_expr': 'Upper({value})'},
+            {'name': 'col_2', 'datatype': 'datetime', 'source_index': 1, 'target_column': 'COL2',
+             'source_format': 'YYYYMMDD'},
+            {'name': 'col_2', 'target_column': 'COL2', 'target_expr': 'SomeVar+{rownum}'}]:
+        mockdb, mock_ins, loaded = _invoke_bulk_with(
+            {'data': 'A,20150101'},
+            [{'name': 'col_1', 'datatype': 'string', 'source_index': 0, 'target_column': 'COL1', 'length': 1},
+             mapping])
+        assert not mockdb.bulk_load.called
+        assert mock_ins.push_row.call_count == 1
+
+
+def test_batch_size():
+    """handlers.db_uploader: test parsing batch_size values"""
+    assert db_uploader.Handler.parse_batch_size(None) is None
+    assert db_uploader.Handler.parse_batch_size('auto') == 'auto'
+    assert db_uploader.Handler.parse_batch_size('5000') == 5000
+    for value in (0, -1, 'x', True, 1.5j):
+        try:
+            db_uploader.Handler.parse_batch_size(value)
+            assert False, 'ConfigError expected for {}'.format(value)
+        except errors.ConfigError:
+            pass
+
+
+@patch('etl.handlers.db_uploader.DBArrayInserter')
+@patch('etl.handlers.db_uploader.context')
+def _invoke_committing(extra_conf, bulk, mock_context, mock_inserter):
+    """Run the handler loading delimited data with a row number column, committing periodically.
+    :return Tuple (fake DB connection, list of committed rows, list of pushed or bulk loaded rows).
+    """
+    # Create a fake DB connection and inserter, recording the rows committed at every commit
+    loaded = []
+    committed = []
+    mockdb = MagicMock()
+    mockdb.get_param_placeholder.return_value = '.'
+    mockdb.supports_bulk_load = bulk
+    mockdb.bulk_load.side_effect = lambda table_name, column_names, rows: loaded.extend(rows)
+    mockdb.commit.side_effect = lambda: committed.append(len(loaded))
+    mock_inserter.return_value.push_row.side_effect = loaded.append
+
+    # Set up our fake context
+    mock_context.dry_run_mode = False
+    mock_context.dry_run_prefix = ''
+    mock_context.db_connection.return_value.__enter__.return_value = mockdb
+    mock_context.get_absolute_file_name.side_effect = lambda file_name: file_name
+
+    # Run the handler
+    conf = config.Config(
+        {
+            'target_database': 'mockdb',
+            'target_table':    'TBL',
+            'truncate_target': True,
+            'column_mappings': [
+                config.Config({'name': 'col_1', 'datatype': 'integer', 'source_index': 0, 'target_column': 'COL1'}),
+                config.Config({'name': 'col_2', 'target_column': 'COL2', 'target_expr': '{rownum}'}),
+            ]
+        },
+        **_conf_delimited)
+    conf.update(**extra_conf)
+    try:
+        db_uploader.Handler().run(conf)
+    finally:
+        mockdb.loaded = loaded
+        mockdb.committed = committed
+    return mockdb
+
+
+def test_commit_every():
+    """handlers.db_uploader: test committing every commit_every rows"""
+    for bulk in (False, True):
+        db = _invoke_committing({'data': '1\n2\n3\n4\n5', 'commit_every': 2}, bulk)
+        assert db.loaded == [[1, 1], [2, 2], [3, 3], [4, 4], [5, 5]]
+        assert db.committed == [2, 4, 5]
+
+
+@raises(errors.ConfigError)
+def test_commit_every_invalid():
+    """handlers.db_uploader: test invalid commit_every value"""
+    _invoke_committing({'data': '1', 'commit_every': 0}, False)
+
+
+@raises(errors.ConfigError)
+def test_parallel_degree_invalid():
+    """handlers.db_uploader: test invalid parallel_degree value"""
+    _invoke_committing({'data': '1', 'parallel_degree': 0}, False)
+
+
+@raises(errors.ConfigError)
+def test_parallel_commit_every():
+    """handlers.db_uploader: test parallel_degree can't be combined with commit_every"""
+    _invoke_committing({'data': '1', 'parallel_degree': 2, 'commit_every': 1}, False)
+
+
+def test_checkpoint():
+    """handlers.db_uploader: test resuming a failed load from the checkpoint"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_name = os.path.join(tmp_dir, '{source}.checkpoint')
+        checkpoint_file = os.path.join(tmp_dir, 'abc.checkpoint')
+        for bulk in (False, True):
+            conf = {
+                'commit_every':    2,
+                'checkpoint_file': file_name,
+                'source':          'abc',
+                'source_id':       'file_{source}',
+                'start_line':      2,
+            }
+
+            # The load fails at line 6, after the rows from lines 2..5 have been committed
+            try:
+                _invoke_committing(dict(conf, data='HEADER\n1\n2\n3\n4\nX\n6'), bulk)
+                assert False, 'DataError expected'
+            except errors.DataError:
+                pass
+            with open(checkpoint_file) as f:
+                state = json.load(f)
+            assert (state['line'], state['rows']) == (5, 4)
+
+            # The rerun skips the committed lines and doesn't truncate the table
+            db = _invoke_committing(dict(conf, data='HEADER\n1\n2\n3\n4\n5\n6\n7'), bulk)
+            assert db.loaded == [[5, 5], [6, 6], [7, 7]]
+            assert not db.execute.called
+            assert not os.path.exists(checkpoint_file)
+
+            # A checkpoint of a different source is ignored
+            try:
+                _invoke_committing(dict(conf, data='HEADER\n1\n2\n3\n4\nX\n6'), bulk)
+            except errors.DataError:
+                pass
+            db = _invoke_committing(dict(conf, data='HEADER\n7', source_id='other'), bulk)
+            assert db.loaded == [[7, 1]]
+            assert db.execute.called
+            assert not os.path.exists(checkpoint_file)
+
+
+@raises(errors.DataError)
+def test_checkpoint_short_input():
+    """handlers.db_uploader: test resuming with the input data shorter than the checkpoint"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conf = {'commit_every': 1, 'checkpoint_file': os.path.join(tmp_dir, 'load.checkpoint')}
+        try:
+            _invoke_committing(dict(conf, data='1\n2\nX'), False)
+        except errors.DataError:
+            pass
+        _invoke_committing(dict(conf, data='1'), False)
@@ -1,6 +1,7 @@
 from os import sep
 from nose.tools import raises
 from etl import config
+from etl.handlers import base
 from etl.handlers import file_reader
 
 
@@ -25,3 +26,12 @@ def test_nonexistent():
     h.run(config.Config({
         'file_name': sep + '.NONEXISTENT.'
     }))
+
+
+def test_stream():
+    """handlers.file_reader: test reading a file as a line stream"""
+    h = file_reader.Handler()
+    result = h.run(config.Config({'file_name': __file__, 'stream': True}))
+    assert isinstance(result['data'], base.LineStream)
+    with open(__file__) as f:
+        assert result['data'].read() == f.read()
@@ -1,6 +1,7 @@
 import os
 from tempfile import mkstemp
 from etl import config
+from etl.handlers import base
 from etl.handlers import file_writer
 
 
@@ -60,3 +61,19 @@ def test_append():
     # Check file contents
     with open(_temp_file_name) as f:
         assert f.read() == _MESSAGE_A + _MESSAGE_B
+
+
+def test_stream():
+    """handlers.file_writer: test writing a line stream"""
+    global _temp_file_name
+
+    # Instantiate and run the handler
+    h = file_writer.Handler()
+    h.run(config.Config({
+        'data':        base.LineStream(['line 1\n', 'line 2\n']),
+        'output_file': _temp_file_name
+    }))
+
+    # Check file contents
+    with open(_temp_file_name) as f:
+        assert f.read() == 'line 1\nline 2\n'
@@ -1,5 +1,10 @@
+import threading
+import time
+from unittest.mock import call
 from unittest.mock import patch
+from nose.tools import raises
 from etl import config
+from etl.errors import ConfigError, HttpError
 from etl.handlers import http_loader
 from etl.tests import helpers
 
@@ -210,3 +215,61 @@ def test_filedefs_nonexistent_ok():
     mocks[0].assert_called_once_with(_http_base_url + 'fake', False, True, None, '')
     # Check handler invocation never happened
     assert not mocks[1].called
+
+
+def test_concurrent_downloads():
+    """handlers.http_loader: test concurrent downloads"""
+    lock = threading.Lock()
+    stats = {'running': 0, 'max_running': 0}
+
+    def fetch(url, *args):
+        with lock:
+            stats['running'] += 1
+            stats['max_running'] = max(stats['running'], stats['max_running'])
+        time.sleep(0.02)
+        with lock:
+            stats['running'] -= 1
+        return url.encode()
+
+    with patch('etl.handlers.http_loader.utils.http_fetch', side_effect=fetch), \
+            patch('etl.handlers.http_loader.context.invoke_handler', new_callable=helpers.CopyingMock) as mocked_invoke:
+        http_loader.Handler().run(config.Config({
+            'base_url': _http_base_url,
+            'max_concurrent_downloads': 3,
+            'file_defs': [config.Config({'name': 'file_{}'.format(i), 'handler': {}}) for i in range(9)]
+        }))
+
+    # Downloads must overlap, but not exceed the limit
+    assert 1 < stats['max_running'] <= 3
+    # Handlers must be invoked in the order of file definitions
+    assert mocked_invoke.call_args_list == [
+        call({}, {'file_name': 'file_{}'.format(i), 'data': _http_base_url + 'file_{}'.format(i)}) for i in range(9)]
+
+
+def test_concurrent_downloads_http_server():
+    """handlers.http_loader: test concurrent downloads from an HTTP server"""
+    files = {'file_{}'.format(i): 'content {}'.format(i).encode() for i in range(5)}
+    file_defs = [config.Config({'name': 'file_{}'.format(i), 'required': False, 'handler': {}}) for i in range(7)]
+    file_defs.append(config.Config({'name': 'file_required', 'handler': {}}))
+    with helpers.http_server(files, 0.01) as base_url, \
+            patch('etl.handlers.http_loader.context.invoke_handler', new_callable=helpers.CopyingMock) as mocked_invoke:
+        try:
+            http_loader.Handler().run(config.Config({
+                'base_url': base_url,
+                'max_concurrent_downloads': 4,
+                'file_defs': file_defs
+            }))
+            assert False, 'HttpError expected'
+        except HttpError:
+            pass
+
+    # Missing files that aren't required must be skipped; the required one must raise an error after all preceding
+    # handlers have run
+    assert mocked_invoke.call_args_list == [
+        call({}, {'file_name': 'file_{}'.format(i), 'data': 'content {}'.format(i)}) for i in range(5)]
+
+
+@raises(ConfigError)
+def test_concurrent_downloads_invalid():
+    """handlers.http_loader: test invalid max_concurrent_downloads value"""
+    http_loader.Handler().run(config.Config({'base_url': _http_base_url, 'max_concurrent_downloads': 0}))
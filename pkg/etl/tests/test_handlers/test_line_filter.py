@@ -1,4 +1,5 @@
 from etl import config
+from etl.handlers import base
 from etl.handlers import line_filter
 
 
@@ -127,3 +128,21 @@ def test_rejected_lines():
 
     # Check the rejected lines
     assert result['TRASH'] == 'abc0\ndef0\n\n'
+
+
+def test_stream():
+    """handlers.line_filter: test filtering a line stream"""
+    result = line_filter.Handler().run(config.Config({
+        'data':     base.LineStream(line + '\n' for line in INPUT_DATA.splitlines()),
+        'criteria': config.Config({'search': '1'})
+    }))
+    assert isinstance(result['data'], base.LineStream)
+    assert result['data'].read() == 'ghi1\njkl1\n'
+
+
+def test_empty_input():
+    """handlers.line_filter: test filtering an empty input, as a string and as a stream"""
+    result = line_filter.Handler().run(config.Config({'data': ''}))
+    assert result['data'] == '\n'
+    result = line_filter.Handler().run(config.Config({'data': base.LineStream(iter([]))}))
+    assert result['data'].read() == '\n'
@@ -1,6 +1,8 @@
 from unittest.mock import patch
 from unittest.mock import call
+from nose.tools import raises
 from etl import config
+from etl.errors import ConfigError, DataError
 from etl.handlers import line_iterator
 from etl.tests import helpers
 
@@ -80,3 +82,29 @@ def test_passthrough_params():
         call({}, {'one_line': 'line_2', 'a': 14, 'b': 'stuff', 'c': True}),
         call({}, {'one_line': 'line_4', 'a': 14, 'b': 'stuff', 'c': True})
     ]
+
+
+def test_workers():
+    """handlers.line_iterator: test concurrent invocation"""
+    mk = _invoke_with({'workers': 3, 'passthrough_params': ['a'], 'a': 14})
+    assert mk.call_count == 3
+    print(mk.call_args_list)
+    # Every invocation must get its own parameters
+    assert sorted(mk.call_args_list, key=lambda c: c[0][1]['one_line']) == [
+        call({}, {'one_line': 'line_1', 'a': 14}),
+        call({}, {'one_line': 'line_2', 'a': 14}),
+        call({}, {'one_line': 'line_4', 'a': 14})
+    ]
+
+
+@raises(DataError)
+@patch('etl.handlers.line_iterator.context.invoke_handler', side_effect=DataError('Boom!'))
+def test_workers_failure(mocked_invoke):
+    """handlers.line_iterator: test failure of concurrent invocation"""
+    line_iterator.Handler().run(config.Config(_config, workers=2))
+
+
+@raises(ConfigError)
+def test_workers_invalid():
+    """handlers.line_iterator: test invalid workers value"""
+    line_iterator.Handler().run(config.Config(_config, workers=0))
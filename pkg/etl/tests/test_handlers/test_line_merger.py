@@ -1,4 +1,5 @@
 from etl import config
+from etl.handlers import base
 from etl.handlers import line_merger
 
 
@@ -69,3 +70,15 @@ def test_delimiter():
         '  line_3:)line_4\n'  \
         ':)line_6  \n'        \
         'line_7\n'
+
+
+def test_stream():
+    """handlers.line_merger: test merging a line stream"""
+    stream = base.LineStream(_config['in'].splitlines(True))
+    result = line_merger.Handler().run(config.Config(_config, **{'in': stream}))
+    assert isinstance(result['out'], base.LineStream)
+    assert result['out'].read() == \
+        'line_1line_2\n'    \
+        '  line_3line_4\n'  \
+        'line_6  \n'        \
+        'line_7\n'
@@ -1,4 +1,5 @@
 from etl import config
+from etl.handlers import base
 from etl.handlers import regex_matcher
 
 
@@ -56,3 +57,19 @@ def test_unique():
         '92\n'  \
         '28\n'
 
+
+def test_stream_unique():
+    """handlers.regex_matcher: test matching a line stream with unique"""
+    result = regex_matcher.Handler().run(
+        config.Config(_config, unique=True, **{'in': base.LineStream(_config['in'].splitlines(True))}))
+    assert isinstance(result['out'], base.LineStream)
+    assert result['out'].read() == '457\n45\n82\n234\n832\n54\n280\n287\n528\n542\n854\n92\n28\n'
+
+
+def test_no_match():
+    """handlers.regex_matcher: test no matches, as a string and as a stream"""
+    result = regex_matcher.Handler().run(config.Config(_config, regex=r'(q\d)'))
+    assert result['out'] == '\n'
+    result = regex_matcher.Handler().run(
+        config.Config(_config, regex=r'(q\d)', **{'in': base.LineStream(_config['in'].splitlines(True))}))
+    assert result['out'].read() == '\n'
@@ -0,0 +1,87 @@
+import datetime
+from unittest.mock import patch
+from unittest.mock import call
+from nose.tools import raises
+from etl import config
+from etl.errors import ConfigError, DataError
+from etl.handlers import sql_iterator
+from etl.tests import helpers
+
+
+# The default configuration
+_config = {
+    'database': 'db_{env}',
+    'env':      'test',
+    'sql':      'QUERY',
+    'handler':  {}
+}
+
+# Batches returned by the query: the column names, followed by lists of rows
+_batches = [
+    ['ID', 'NAME', 'CREATED'],
+    [(1, 'one', datetime.date(2020, 1, 1)), (2, 'two', None)],
+    [(3, 'three', datetime.date(2020, 1, 3))],
+]
+
+
+# NB: We're patching with CopyingMock here as we need to check child handler invocations by value rather than by
+# reference, as MagicMock does (coz dicts that are arguments to invoke_handler() are mutable).
+@patch('etl.handlers.sql_iterator.sql_query.Handler.fetch_batches')
+@patch('etl.handlers.sql_iterator.context.invoke_handler', new_callable=helpers.CopyingMock)
+def _invoke_with(extra_conf, mocked_invoke, mocked_fetch):
+    """Invoke the handler with patched context.invoke_handler() and query execution, and return the mocks."""
+    mocked_fetch.return_value = (b for b in _batches)
+    sql_iterator.Handler().run(config.Config(_config, **extra_conf))
+    return mocked_invoke, mocked_fetch
+
+
+def test_defaults():
+    """handlers.sql_iterator: test default invocation"""
+    mk, fetch = _invoke_with({})
+    fetch.assert_called_once_with('db_test', 'QUERY', {}, 1000, None, 1000000, 1000, {'rows': 0})
+    # Column values are passed as they are
+    assert mk.call_args_list == [
+        call({}, {'ID': 1, 'NAME': 'one', 'CREATED': datetime.date(2020, 1, 1)}),
+        call({}, {'ID': 2, 'NAME': 'two', 'CREATED': None}),
+        call({}, {'ID': 3, 'NAME': 'three', 'CREATED': datetime.date(2020, 1, 3)})
+    ]
+
+
+def test_params():
+    """handlers.sql_iterator: test query parameters, arraysize and passthrough params"""
+    mk, fetch = _invoke_with({
+        'params':             [{'name': 'p', 'value': 'x{env}'}],
+        'arraysize':          2,
+        'passthrough_params': ['env']})
+    fetch.assert_called_once_with('db_test', 'QUERY', {'p': 'xtest'}, 2, None, 1000000, 2, {'rows': 0})
+    assert mk.call_args_list[0] == call(
+        {}, {'env': 'test', 'ID': 1, 'NAME': 'one', 'CREATED': datetime.date(2020, 1, 1)})
+
+
+def test_workers():
+    """handlers.sql_iterator: test concurrent invocation"""
+    mk, _ = _invoke_with({'workers': 3, 'passthrough_params': ['env']})
+    assert mk.call_count == 3
+    # Every invocation must get its own parameters
+    assert sorted(c[0][1]['ID'] for c in mk.call_args_list) == [1, 2, 3]
+    assert all(c[0][1]['env'] == 'test' and len(c[0][1]) == 4 for c in mk.call_args_list)
+
+
+@raises(DataError)
+@patch('etl.handlers.sql_iterator.sql_query.Handler.fetch_batches', return_value=(b for b in _batches))
+@patch('etl.handlers.sql_iterator.context.invoke_handler', side_effect=DataError('Boom!'))
+def test_failure(mocked_invoke, mocked_fetch):
+    """handlers.sql_iterator: test failure of an invocation"""
+    sql_iterator.Handler().run(config.Config(_config))
+
+
+@raises(ConfigError)
+def test_workers_invalid():
+    """handlers.sql_iterator: test invalid workers value"""
+    sql_iterator.Handler().run(config.Config(_config, workers=0))
+
+
+@raises(ConfigError)
+def test_arraysize_invalid():
+    """handlers.sql_iterator: test invalid arraysize value"""
+    sql_iterator.Handler().run(config.Config(_config, arraysize=0))
@@ -1,32 +1,51 @@
+import os
+import tempfile
 from unittest.mock import patch
 from unittest.mock import MagicMock
+from nose import SkipTest
+from nose.tools import raises
 from etl import config
+from etl import errors
+from etl.handlers import base
+from etl.db.result_cache import ResultCache
 from etl.handlers import sql_query
 
 
+def _pyarrow():
+    """Return the pyarrow module, skipping the test if it isn't installed."""
+    try:
+        return __import__('pyarrow')
+    except ImportError:
+        raise SkipTest('pyarrow is not installed')
+
+
 @patch('etl.handlers.sql_query.context')
-def _invoke_with(sql, conf, mock_context):
+def _invoke_with(sql, conf, mock_context, consume=False, batches=None):
     """Run the handler with the specified config, in a mocked context. Return a tuple consisting of the handler's result
-    and the mocked DB cursor object."""
+    and the mocked DB cursor object. batches, if given, is a list of the row lists returned by fetchmany() calls."""
     # Create a fake DB connection and a cursor
     mock_db = MagicMock()
-    mock_db.cursor.return_value = mock_cursor = MagicMock()
+    mock_db.query_cursor.return_value = mock_cursor = MagicMock()
 
     # Mock iterator result and column headers of the cursor
     mock_cursor.__iter__.return_value = [['abc', 'def', 10, True], ['ghi', 'jkl', 42, False]]
+    mock_cursor.fetchmany.side_effect = batches or [mock_cursor.__iter__.return_value, []]
     mock_cursor.description = [['str1'], ['str2'], ['int'], ['bool']]
 
     # Set up our fake context
-    mock_context.get_db_connection.return_value = mock_db
+    mock_context.db_connection.return_value.__enter__.return_value = mock_db
+    mock_context.get_absolute_file_name.side_effect = lambda file_name: file_name
 
-    # Run the handler
+    # Run the handler, consuming the returned line stream, if required
     result = sql_query.Handler().run(config.Config({'database': 'mockdb', 'sql': sql}, **conf))
+    if consume:
+        result = {k: v.read() if isinstance(v, base.LineStream) else v for k, v in result.items()}
 
     # Verify our DB was requested
-    mock_context.get_db_connection.assert_called_once_with('mockdb')
+    mock_context.db_connection.assert_called_once_with('mockdb')
 
     # Check the cursor was requested and closed after use
-    mock_db.cursor.assert_called_once_with()
+    mock_db.query_cursor.assert_called_once_with(conf.get('arraysize'), conf.get('prefetch_rows'))
     mock_cursor.close.assert_called_once_with()
     return result, mock_cursor
 
@@ -108,3 +127,159 @@ def test_params():
     )
     # Check query was executed
     cur.execute.assert_called_once_with('TEST_QUERY_8', {'X': '123', 'Y': '_text_'})
+
+
+def test_arraysize():
+    """handlers.sql_query: test fetching with the given arraysize and prefetch_rows"""
+    result, cur = _invoke_with('TEST_QUERY_9', {'arraysize': 5000, 'prefetch_rows': 0})
+    assert result['data'] == 'abcdef10True\nghijkl42False\n'
+
+
+def test_stream():
+    """handlers.sql_query: test returning the result as a line stream"""
+    with patch('etl.handlers.sql_query.logger') as mock_logger:
+        # The query is only executed once the stream is consumed
+        result, cur = _invoke_with(
+            'TEST_QUERY_10', {'stream': True, 'col_headers': True, 'field_delimiter': '|', 'progress_rows': 1},
+            consume=True)
+        assert result['data'] == 'str1|str2|int|bool\nabc|def|10|True\nghi|jkl|42|False\n'
+        cur.execute.assert_called_once_with('TEST_QUERY_10', {})
+
+        # The progress is logged every progress_rows rows
+        messages = [c[0][0] for c in mock_logger.info.call_args_list]
+        assert [m.partition(' (')[0] for m in messages] == ['Fetched 1 rows from mockdb', 'Fetched 2 rows from mockdb']
+
+
+def test_stream_lazy():
+    """handlers.sql_query: test the line stream doesn't touch the database until consumed"""
+    with patch('etl.handlers.sql_query.context') as mock_context:
+        result = sql_query.Handler().run(config.Config({'database': 'mockdb', 'sql': 'TEST', 'stream': True}))
+        assert isinstance(result['data'], base.LineStream)
+        assert not mock_context.db_connection.called
+
+
+def test_output_file():
+    """handlers.sql_query: test writing the result into a file"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_name = os.path.join(tmp_dir, 'out.txt')
+        result, cur = _invoke_with('TEST_QUERY_11', {'output_file': file_name, 'record_delimiter': ';'})
+        assert result is None
+        with open(file_name) as f:
+            assert f.read() == 'abcdef10True;ghijkl42False;'
+
+
+@raises(errors.ConfigError)
+def test_stream_record_delimiter():
+    """handlers.sql_query: test streaming requires record delimiter ending with a linebreak"""
+    sql_query.Handler().run(config.Config({'database': 'db', 'sql': 'TEST', 'stream': True, 'record_delimiter': ';'}))
+
+
+@raises(errors.ConfigError)
+def test_invalid_arraysize():
+    """handlers.sql_query: test invalid arraysize value"""
+    sql_query.Handler().run(config.Config({'database': 'db', 'sql': 'TEST', 'arraysize': 0}))
+
+
+def test_arrow():
+    """handlers.sql_query: test returning the result in the Arrow format"""
+    pa = _pyarrow()
+    result, cur = _invoke_with('TEST_QUERY_12', {'output_format': 'arrow'})
+    cur.fetchmany.assert_called_with(sql_query.Handler.columnar_batch_rows)
+    table = pa.ipc.open_stream(result['data']).read_all()
+    assert table.schema.types == [pa.string(), pa.string(), pa.int64(), pa.bool_()]
+    assert table.to_pydict() == {'str1': ['abc', 'ghi'], 'str2': ['def', 'jkl'], 'int': [10, 42], 'bool': [True, False]}
+
+
+def test_arrow_output_file():
+    """handlers.sql_query: test writing the result into a file in the Arrow format, batch by batch"""
+    pa = _pyarrow()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_name = os.path.join(tmp_dir, 'out.arrow')
+        result, cur = _invoke_with(
+            'TEST_QUERY_13',
+            {
+                'output_format': 'arrow',
+                'output_file':   file_name,
+                'arraysize':     2,
+            },
+            batches=[[['a', None, 1, True], ['b', None, 2, None]], [['c', 'x', 3, False]], []])
+        assert result is None
+        cur.fetchmany.assert_called_with(2)
+        with pa.OSFile(file_name) as f:
+            batches = list(pa.ipc.open_stream(f))
+        assert [b.num_rows for b in batches] == [2, 1]
+        # The column holding nulls only in the first batch is a string one
+        assert pa.Table.from_batches(batches).to_pydict() == {
+            'str1': ['a', 'b', 'c'], 'str2': [None, None, 'x'], 'int': [1, 2, 3], 'bool': [True, None, False]}
+
+
+def test_arrow_empty():
+    """handlers.sql_query: test returning an empty result in the Arrow format"""
+    pa = _pyarrow()
+    result, cur = _invoke_with('TEST_QUERY_14', {'output_format': 'arrow'}, batches=[[]])
+    table = pa.ipc.open_stream(result['data']).read_all()
+    assert table.num_rows == 0
+    assert table.schema.names == ['str1', 'str2', 'int', 'bool']
+
+
+@raises(errors.DataError)
+def test_arrow_type_mismatch():
+    """handlers.sql_query: test values not matching the column types inferred from the first batch"""
+    _pyarrow()
+    _invoke_with(
+        'TEST_QUERY_15',
+        {'output_format': 'arrow'},
+        batches=[[['a', 'b', 1, True]], [['c', 'd', 'NaN', False]], []])
+
+
+@raises(errors.ConfigError)
+def test_arrow_no_pyarrow():
+    """handlers.sql_query: test the Arrow format requires pyarrow"""
+    with patch('etl.handlers.sql_query.import_module', side_effect=ImportError):
+        sql_query.Handler().run(config.Config({'database': 'db', 'sql': 'TEST', 'output_format': 'arrow'}))
+
+
+@raises(errors.ConfigError)
+def test_arrow_stream():
+    """handlers.sql_query: test streaming isn't supported in the Arrow format"""
+    sql_query.Handler().run(config.Config({'database': 'db', 'sql': 'TEST', 'output_format': 'arrow', 'stream': True}))
+
+
+@raises(errors.ConfigError)
+def test_invalid_output_format():
+    """handlers.sql_query: test invalid output format"""
+    sql_query.Handler().run(config.Config({'database': 'db', 'sql': 'TEST', 'output_format': 'csv'}))
+
+
+def test_cache():
+    """handlers.sql_query: test caching the result"""
+    cache = ResultCache(1000)
+    with patch('etl.handlers.sql_query.context') as mock_context:
+        mock_context.get_query_cache.return_value = cache
+        mock_db = mock_context.db_connection.return_value.__enter__.return_value
+        mock_db.query_cursor.return_value.__iter__.side_effect = lambda: iter([['abc', 1], [None, 2]])
+
+        def run(value: str):
+            return sql_query.Handler().run(config.Config({
+                'database': 'db',
+                'sql':      'TEST',
+                'cache':    True,
+                'params':   [{'name': 'P', 'value': value}],
+            }))
+
+        # Only the first query with the same SQL and parameter values hits the database
+        for value in ('x', 'x', 'y', 'x'):
+            assert run(value) == {'data': 'abc1\nNone2\n'}
+        assert mock_db.query_cursor.call_count == 2
+
+        # Writing to the database drops the cached results
+        cache.invalidate('db')
+        run('x')
+        assert mock_db.query_cursor.call_count == 3
+        assert cache.get_stats()['hits'] == 2
+
+
+@raises(errors.ConfigError)
+def test_cache_stream():
+    """handlers.sql_query: test caching isn't supported for line streams"""
+    sql_query.Handler().run(config.Config({'database': 'db', 'sql': 'TEST', 'cache': True, 'stream': True}))
@@ -1,7 +1,11 @@
+import datetime
 from unittest.mock import patch
 from unittest.mock import call
 from unittest.mock import MagicMock
+from nose.tools import raises
 from etl import config
+from etl import errors
+from etl.handlers import base
 from etl.handlers import sql_statement
 
 
@@ -14,13 +18,13 @@ def _invoke_with(conf, dry_run, mock_context) -> MagicMock:
     # Set up our fake context
     mock_context.dry_run_mode      = dry_run
     mock_context.dry_run_prefix    = ''
-    mock_context.get_db_connection = MagicMock(return_value=mockdb)
+    mock_context.db_connection.return_value.__enter__.return_value = mockdb
 
     # Run the handler
     sql_statement.Handler().run(config.Config({'database': 'mockdb'}, **conf))
 
     # Verify our DB was requested
-    mock_context.get_db_connection.assert_called_once_with('mockdb')
+    mock_context.db_connection.assert_called_once_with('mockdb', writes=True)
     return mockdb
 
 
@@ -95,3 +99,111 @@ def test_dry_run_mode():
     # No executions or commits must occur
     assert not db.execute.called
     assert not db.commit.called
+
+
+_param_mappings = [
+    {'name': 'name', 'datatype': 'string',  'source_index': 0, 'length': 5, 'source_trim': 'both'},
+    {'name': 'qty',  'datatype': 'integer', 'source_index': 1},
+]
+
+
+def _invoke_batches(conf, dry_run=False) -> MagicMock:
+    """Run the handler with param_mappings and delimited data, in a mocked context. Return the mocked DB object."""
+    with patch('etl.handlers.sql_statement.context') as mock_context:
+        mockdb = MagicMock()
+        mockdb.cursor.return_value.rowcount = 1
+        mock_context.dry_run_mode   = dry_run
+        mock_context.dry_run_prefix = ''
+        mock_context.db_connection.return_value.__enter__.return_value = mockdb
+        sql_statement.Handler().run(config.Config(
+            {
+                'database':       'mockdb',
+                'data':           ' a ,1\nb,2\nc,\n',
+                'format':         'delimited',
+                'delimiter':      ',',
+                'param_mappings': [config.Config(m) for m in _param_mappings],
+            },
+            **conf))
+        mock_context.db_connection.assert_called_once_with('mockdb', writes=True)
+    return mockdb
+
+
+def test_param_mappings():
+    """handlers.sql_statement: test executing statements per input line, in batches"""
+    db = _invoke_batches({
+        'sql':        ['STATEMENT_1', 'STATEMENT_2'],
+        'params':     [{'name': 'p', 'value': 'x{key1}'}],
+        'key1':       'val_1',
+        'batch_size': 2,
+    })
+    cur = db.cursor.return_value
+    db.cursor.assert_called_once_with(array_bind_size=2)
+    batch_1 = [{'p': 'xval_1', 'name': 'a', 'qty': 1}, {'p': 'xval_1', 'name': 'b', 'qty': 2}]
+    batch_2 = [{'p': 'xval_1', 'name': 'c', 'qty': None}]
+    assert cur.executemany.call_args_list == [
+        call('STATEMENT_1', batch_1),
+        call('STATEMENT_2', batch_1),
+        call('STATEMENT_1', batch_2),
+        call('STATEMENT_2', batch_2),
+    ]
+    assert not db.execute.called
+    assert cur.close.called
+    # Default config assumes commit after each statement
+    assert db.commit.call_count == 4
+
+
+def test_param_mappings_commit_all():
+    """handlers.sql_statement: test executing statements per input line with commit set to 'all'"""
+    db = _invoke_batches({'sql': 'STATEMENT_1', 'commit_stmt': 'all', 'start_line': 2})
+    db.cursor.return_value.executemany.assert_called_once_with(
+        'STATEMENT_1', [{'name': 'b', 'qty': 2}, {'name': 'c', 'qty': None}])
+    assert db.begin.call_count  == 1
+    assert db.commit.call_count == 1
+
+
+def test_param_mappings_fixed():
+    """handlers.sql_statement: test executing statements per fixed-width input line, parsing datetime values"""
+    with patch('etl.handlers.sql_statement.context') as mock_context:
+        mockdb = MagicMock()
+        mockdb.cursor.return_value.rowcount = -1
+        mock_context.dry_run_mode   = False
+        mock_context.dry_run_prefix = ''
+        mock_context.db_connection.return_value.__enter__.return_value = mockdb
+        sql_statement.Handler().run(config.Config({
+            'database':       'mockdb',
+            'sql':            'STATEMENT_1',
+            'data':           base.LineStream(iter(['00120150304\n', '002        \n'])),
+            'format':         'fixed',
+            'param_mappings': [
+                config.Config({'name': 'id', 'datatype': 'integer',  'source_pos': '1:3'}),
+                config.Config({
+                    'name': 'dt', 'datatype': 'datetime', 'source_pos': '4:11', 'source_format': 'YYYYMMDD',
+                    'source_trim': 'right'}),
+            ],
+        }))
+    mockdb.cursor.return_value.executemany.assert_called_once_with(
+        'STATEMENT_1', [{'id': 1, 'dt': datetime.datetime(2015, 3, 4)}, {'id': 2, 'dt': None}])
+
+
+def test_param_mappings_dry_run():
+    """handlers.sql_statement: test dry run mode with param_mappings"""
+    db = _invoke_batches({'sql': 'STATEMENT_1'}, dry_run=True)
+    assert not db.cursor.called
+    assert not db.commit.called
+
+
+@raises(errors.DataError)
+def test_param_mappings_invalid_data():
+    """handlers.sql_statement: test invalid input data with param_mappings"""
+    _invoke_batches({'sql': 'STATEMENT_1', 'data': 'a,1\nb,x\n'})
+
+
+@raises(errors.ConfigError)
+def test_param_mappings_no_source():
+    """handlers.sql_statement: test parameter mapping without a source value"""
+    sql_statement.Handler().run(config.Config({
+        'database':       'mockdb',
+        'sql':            'STATEMENT_1',
+        'format':         'fixed',
+        'param_mappings': [config.Config(m) for m in _param_mappings],
+    }))
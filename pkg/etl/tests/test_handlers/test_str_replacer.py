@@ -1,4 +1,5 @@
 from etl import config
+from etl.handlers import base
 from etl.handlers import str_replacer
 
 
@@ -69,3 +70,18 @@ def test_regex_replace_limit():
         ]))
     print(result)
     assert result['out'] == 'soem tetx\nwhihc ew will ues\nto test our\nstring replacer'
+
+
+def test_stream_replace_limit():
+    """handlers.str_replacer: test replacing in a line stream with a limit"""
+    result = str_replacer.Handler().run(config.Config(
+        _config,
+        **{
+            'in': base.LineStream(_config['in'].splitlines(True)),
+            'rules': [
+                config.Config({'search': 'e', 'replace': 'E', 'count': 3}),
+                config.Config({'search': r'(\w)(\w)\b', 'replace': r'\2\1', 'is_regex': True, 'count': 6})
+            ]
+        }))
+    assert isinstance(result['out'], base.LineStream)
+    assert result['out'].read() == 'soEm tEtx\nwhihc Ew will ues\nto test our\nstring replacer'
@@ -1,9 +1,11 @@
+import threading
 from io import StringIO
 from unittest.mock import patch
 from unittest.mock import MagicMock
 from nose.tools import raises
 from etl import config
 from etl import loader
+from etl.errors import ConfigError
 
 
 _config_file = StringIO()
@@ -81,3 +83,127 @@ def test_loader_error_stop(mock_context, mock_logger):
     # Instantiate and run the loader
     ldr = _get_loader_instance()
     ldr.run()
+
+
+def _get_mock_processes_config(processes: list, **kwargs) -> config.Config:
+    """Create and return mock configuration of multiple processes, given as (name, depends_on, stop_on_error) tuples."""
+    return MagicMock(
+        return_value=config.Config(
+            processes=[
+                config.Config({
+                    'name':          name,
+                    'handler':       name,
+                    'depends_on':    depends_on,
+                    'stop_on_error': stop_on_error
+                })
+                for name, depends_on, stop_on_error in processes
+            ],
+            **kwargs))
+
+
+@patch('etl.loader.context')
+def test_loader_dependency_order(mock_context):
+    """loader: test that Loader runs processes after their dependencies"""
+    mock_context.get_config = _get_mock_processes_config([
+        ('a', ['b'], True),
+        ('b', [],    True),
+        ('c', ['a'], True),
+    ])
+
+    # Run the loader
+    ldr = _get_loader_instance()
+    assert ldr.run()
+    assert [c[0][0] for c in mock_context.invoke_handler.call_args_list] == ['b', 'a', 'c']
+
+
+@patch('etl.loader.logger')
+@patch('etl.loader.context')
+def test_loader_dependency_failed(mock_context, mock_logger):
+    """loader: test that Loader skips processes whose dependencies failed"""
+    mock_context.get_config = _get_mock_processes_config([
+        ('a', [],    False),
+        ('b', ['a'], True),
+        ('c', [],    True),
+    ])
+    mock_context.invoke_handler = MagicMock(side_effect=lambda name: 1 / (name != 'a'))
+
+    # Run the loader: 'b' must be skipped, 'c' must run
+    ldr = _get_loader_instance()
+    assert not ldr.run()
+    assert [c[0][0] for c in mock_context.invoke_handler.call_args_list] == ['a', 'c']
+    assert ldr.cnt_proc_total == 3
+    assert ldr.cnt_proc_ok    == 1
+    assert ldr.cnt_proc_fail  == 2
+    assert ldr.failed_processes == ['a', 'b']
+
+
+@raises(ConfigError)
+@patch('etl.loader.context')
+def test_loader_dependency_unknown(mock_context):
+    """loader: test that Loader rejects dependencies on unknown processes"""
+    mock_context.get_config = _get_mock_processes_config([('a', ['x'], True)])
+    _get_loader_instance().run()
+
+
+@raises(ConfigError)
+@patch('etl.loader.context')
+def test_loader_dependency_cycle(mock_context):
+    """loader: test that Loader rejects circular dependencies"""
+    mock_context.get_config = _get_mock_processes_config([
+        ('a', ['c'], True),
+        ('b', ['a'], True),
+        ('c', ['b'], True),
+    ])
+    _get_loader_instance().run()
+
+
+@patch('etl.loader.context')
+def test_loader_parallel(mock_context):
+    """loader: test that Loader runs processes in parallel"""
+    mock_context.get_config = _get_mock_processes_config(
+        [(name, [], True) for name in 'abcd'] + [('e', list('abcd'), True)],
+        max_parallel=4)
+
+    # All four independent processes must be running simultaneously to pass the barrier
+    barrier = threading.Barrier(4, timeout=5)
+    finished = []
+
+    def run(name):
+        if name != 'e':
+            barrier.wait()
+        finished.append(name)
+    mock_context.invoke_handler = MagicMock(side_effect=run)
+
+    # Run the loader
+    ldr = _get_loader_instance()
+    assert ldr.run()
+    assert ldr.cnt_proc_ok == 5
+    assert finished[-1] == 'e'
+
+
+@patch('sys.stdout', new_callable=StringIO)
+@patch('etl.loader.context')
+def test_loader_parallel_log_prefix(mock_context, mock_stdout):
+    """loader: test that the log lines of processes running in parallel are prefixed with the process name"""
+    mock_context.get_config = _get_mock_processes_config([('a', [], True), ('b', [], True)], max_parallel=2)
+    mock_context.invoke_handler = MagicMock(side_effect=lambda name: loader.logger.info('Working on ' + name))
+
+    # Run the loader
+    assert _get_loader_instance().run()
+    lines = mock_stdout.getvalue().splitlines()
+    for name in 'ab':
+        prefix = '[{}] '.format(name)
+        assert any(l.startswith(prefix) and l.endswith('Running process "{}"'.format(name)) for l in lines)
+        assert any(l.startswith(prefix) and l.endswith('Working on ' + name) for l in lines)
+
+
+@raises(SystemExit)
+@patch('etl.loader.logger')
+@patch('etl.loader.context')
+def test_loader_parallel_error_stop(mock_context, mock_logger):
+    """loader: test that parallel Loader exits on process errors"""
+    mock_context.get_config = _get_mock_processes_config([('a', [], True), ('b', [], True)])
+    mock_context.invoke_handler = MagicMock(side_effect=Exception('Boom!'))
+
+    # Run the loader, with max_parallel overridden
+    loader.Loader(_config_file, None, False, {}, 2).run()
@@ -1,6 +1,7 @@
 import os
 import tempfile
 import io
+import threading
 from etl import logger
 from unittest.mock import patch
 
@@ -95,3 +96,39 @@ def test_separator(mock_stdout):
     """logger: test writing separator"""
     logger.separator()
     assert '=' * logger.output_width in mock_stdout.getvalue()
+
+
+@patch('sys.stdout', new_callable=io.StringIO)
+def test_buffering(mock_stdout):
+    """logger: test buffering output of a thread"""
+    logger.minimum_severity = logger.INFO
+    logger.start_buffering()
+    logger.info(TEST_MSG)
+    logger.separator()
+    # Nothing must be output until the buffer is flushed
+    assert mock_stdout.getvalue() == ''
+    logger.flush_buffer()
+    lines = mock_stdout.getvalue().splitlines()
+    assert len(lines) == 2 and TEST_MSG in lines[0] and lines[1] == '=' * logger.output_width
+    # Buffering must be off afterwards
+    logger.info(TEST_MSG)
+    assert len(mock_stdout.getvalue().splitlines()) == 3
+
+
+@patch('sys.stdout', new_callable=io.StringIO)
+def test_prefix(mock_stdout):
+    """logger: test prefixing the output of a thread"""
+    logger.minimum_severity = logger.INFO
+    logger.set_prefix('[proc] ')
+    try:
+        logger.info(TEST_MSG)
+        # The prefix is thread-specific
+        thread = threading.Thread(target=logger.info, args=(TEST_MSG,))
+        thread.start()
+        thread.join()
+    finally:
+        logger.set_prefix(None)
+    logger.info(TEST_MSG)
+    lines = mock_stdout.getvalue().splitlines()
+    assert len(lines) == 3 and lines[0].startswith('[proc] ') and TEST_MSG in lines[0]
+    assert not lines[1].startswith('[') and not lines[2].startswith('[')
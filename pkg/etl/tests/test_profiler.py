@@ -0,0 +1,68 @@
+import csv
+import json
+import os
+import tempfile
+from unittest.mock import patch
+from etl import config
+from etl import context
+from etl import profiler
+
+
+def _get_counting_handler_conf(**additional_conf) -> config.Config:
+    """Return configuration for CountingHandler."""
+    return config.Config({'module': 'etl.tests.dummy_handlers', 'class': 'CountingHandler'}, **additional_conf)
+
+
+def _profile_pipeline() -> list:
+    """Run a profiled pipeline of two CountingHandlers within a process, and return the report."""
+    profiler.enable()
+    try:
+        with profiler.process('proc'):
+            context.invoke_handler(
+                [_get_counting_handler_conf(), _get_counting_handler_conf(comment='second')], {'data': 'abc'})
+    finally:
+        profiler.disable()
+    return profiler.get_report()
+
+
+def test_disabled():
+    """profiler: test handlers aren't measured when profiling is disabled"""
+    with patch('etl.profiler.run_handler') as mock_run:
+        with profiler.process('proc'):
+            context.invoke_handler(_get_counting_handler_conf(data='abc'))
+        mock_run.assert_not_called()
+
+
+def test_report():
+    """profiler: test collecting statistics"""
+    report = _profile_pipeline()
+    print(report)
+    assert [(r['process'], r['handler'], r['invocations']) for r in report] == [
+        ('proc', '*',                                                 1),
+        ('proc', 'etl.tests.dummy_handlers.CountingHandler',          1),
+        ('proc', 'etl.tests.dummy_handlers.CountingHandler (second)', 1),
+    ]
+    # The first handler gets the external 'abc', the second one gets the first one's output, which shadows it
+    assert [(r['input_size'], r['output_size'], r['rows']) for r in report[1:]] == [(3, 6, 3), (6, 12, 6)]
+    assert [r['info'] for r in report] == [{}, {'length': 3}, {'length': 6}]
+    assert all(r['wall_time'] >= 0 and r['cpu_time'] >= 0 for r in report)
+    assert report[0]['wall_time'] >= report[1]['wall_time'] + report[2]['wall_time']
+
+
+def test_write_report():
+    """profiler: test writing the report in JSON and CSV formats"""
+    report = _profile_pipeline()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # JSON
+        file_name = os.path.join(tmp_dir, 'report.json')
+        profiler.write_report(file_name)
+        with open(file_name) as f:
+            assert json.load(f) == report
+
+        # CSV, format derived from the extension
+        file_name = os.path.join(tmp_dir, 'report.csv')
+        profiler.write_report(file_name)
+        with open(file_name, newline='') as f:
+            rows = list(csv.DictReader(f))
+        assert [(r['handler'], r['rows']) for r in rows] == [(r['handler'], str(r['rows'])) for r in report]
+        assert [r['info'] for r in rows] == ['', 'length=3', 'length=6']